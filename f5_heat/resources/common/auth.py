@@ -0,0 +1,125 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Token authentication to BIG-IP® devices.
+
+BIG-IP authenticates every request made with HTTP basic auth against its
+user database. With token authentication the plugins log in once, send the
+token with every request and log in again only when it expires or is
+rejected. Tokens are shared through the shared device cache when one is
+configured.
+'''
+
+import json
+import threading
+import time
+
+from requests.auth import AuthBase
+from requests.auth import HTTPBasicAuth
+
+from shared_cache import credentials_key
+
+
+TOKEN_HEADER = 'X-F5-Auth-Token'
+
+# Log in again this many seconds before a token expires.
+TOKEN_EXPIRY_MARGIN = 60
+
+DEFAULT_TOKEN_TIMEOUT = 1200
+
+
+class TokenAuth(AuthBase):
+    '''requests authentication with a BIG-IP® login token.'''
+
+    def __init__(self, session, base_uri, hostname, username, password,
+                 timeout, shared_cache=None):
+        self._session = session
+        self._login_uri = base_uri + 'shared/authn/login'
+        self._username = username
+        self._password = password
+        self._timeout = timeout
+        self._cache = shared_cache
+        self._key = credentials_key(hostname, username, password)
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def _login(self):
+        response = self._session.post(
+            self._login_uri,
+            data=json.dumps({
+                'username': self._username,
+                'password': self._password,
+                'loginProviderName': 'tmos'
+            }),
+            auth=HTTPBasicAuth(self._username, self._password),
+            timeout=self._timeout,
+            # Explicit, as requests lets REQUESTS_CA_BUNDLE override the
+            # verify setting of the session.
+            verify=self._session.verify
+        )
+        response.raise_for_status()
+        token = response.json()['token']
+        lifetime = token.get('timeout', DEFAULT_TOKEN_TIMEOUT)
+        self._token = token['token']
+        self._expires_at = time.time() + lifetime - TOKEN_EXPIRY_MARGIN
+        if self._cache is not None:
+            self._cache.set_token(self._key, self._token, self._expires_at)
+
+    def token(self):
+        '''Return a valid token, logging in only if no process has one.'''
+
+        with self._lock:
+            if self._token is None or time.time() >= self._expires_at:
+                cached = None
+                if self._cache is not None:
+                    cached = self._cache.get_token(self._key)
+                if cached is None:
+                    self._login()
+                else:
+                    self._token, self._expires_at = cached
+            return self._token
+
+    def invalidate(self, token):
+        '''Forget a token the device rejected.'''
+
+        with self._lock:
+            if self._token == token:
+                self._token = None
+        if self._cache is not None:
+            self._cache.delete_token(self._key, token)
+
+    def _handle_401(self, response, **kwargs):
+        # Session.send dispatches this hook; the retry is sent straight
+        # through the adapter, so it is only ever retried once.
+        if response.status_code != 401:
+            return response
+
+        response.content
+        response.close()
+        self.invalidate(response.request.headers.get(TOKEN_HEADER))
+        retry = response.request.copy()
+        retry.headers[TOKEN_HEADER] = self.token()
+        retried = response.connection.send(retry, **kwargs)
+        retried.history.append(response)
+        retried.request = retry
+        return retried
+
+    def __call__(self, request):
+        request.headers[TOKEN_HEADER] = self.token()
+        request.register_hook('response', self._handle_401)
+        return request
@@ -0,0 +1,74 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from distutils.version import LooseVersion
+import time
+
+
+DEFAULT_CAPABILITIES_TTL = 3600
+
+# Features the plugins care about, with the TMOS version that introduced them.
+FEATURES = (
+    ('transactions', '11.5.0'),
+    ('token_auth', '11.6.0'),
+    ('iapp_template_requires_modules', '11.6.0'),
+    ('pool_member_fqdn', '12.0.0')
+)
+
+
+class DeviceCapabilities(object):
+    '''What a BIG-IP® device supports, as discovered at a point in time.'''
+
+    def __init__(self, tmos_version, modules, discovered_at=None):
+        self.tmos_version = tmos_version
+        self.modules = frozenset(module.lower() for module in modules)
+        version = LooseVersion(tmos_version)
+        self.features = frozenset(
+            name for name, minimum in FEATURES
+            if version >= LooseVersion(minimum)
+        )
+        if discovered_at is None:
+            discovered_at = time.time()
+        self.discovered_at = discovered_at
+
+    @classmethod
+    def from_provision(cls, tmos_version, payload):
+        '''Build capabilities from a /mgmt/tm/sys/provision collection.
+
+        :param tmos_version: string TMOS version of the device
+        :param payload: decoded JSON body of the provision collection
+        :returns: DeviceCapabilities
+        '''
+
+        modules = [
+            item['name'] for item in payload.get('items', [])
+            if item.get('level', 'none') != 'none'
+        ]
+        return cls(tmos_version, modules)
+
+    def supports(self, feature):
+        '''Whether the device's TMOS version provides a named feature.'''
+
+        return feature in self.features
+
+    def has_modules(self, modules):
+        '''Whether every one of the given modules is provisioned.'''
+
+        return set(module.lower() for module in modules) <= self.modules
+
+    def expired(self, ttl):
+        return time.time() - self.discovered_at > ttl
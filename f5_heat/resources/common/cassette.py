@@ -0,0 +1,294 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Record the traffic to BIG-IP® devices, and replay it without them.
+
+When ``[f5_heat] cassette_mode`` is ``record``, every request a
+:class:`~f5_bigip_connection.DeviceAdapter` sends is written, with the
+response or error it got and how long that took, to the cassette at
+``cassette_path``. When it is ``replay``, no request reaches a device:
+each is answered from the cassette, after the time the device originally
+took, scaled by ``cassette_timing_scale``.
+
+A cassette is gzipped JSON, one interaction per line. Each line is
+appended as a gzip member of its own under an exclusive lock on the file,
+so the workers of a heat-engine can record to the same cassette. It keeps
+a digest of each request body rather than the body, so it holds no
+passwords, but it does keep response bodies, login tokens among them.
+
+Requests are matched by device, method, path and body digest. Identical
+requests are answered with their recorded responses in order, and the last
+one again once those run out, so a replay that polls more often than the
+recording did still completes.
+'''
+
+import collections
+import datetime
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+import eventlet
+from requests import exceptions
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from six.moves.urllib import parse as urlparse
+
+from config import CONF
+from config import GROUP
+import locks
+
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+# Response headers the plugins act on; the others are not kept.
+KEPT_HEADERS = ('Content-Type', 'Retry-After')
+
+# Errors a request may end in that are replayed as the same error.
+_ERRORS = dict(
+    (error.__name__, error) for error in (
+        exceptions.ConnectTimeout,
+        exceptions.ReadTimeout,
+        exceptions.Timeout,
+        exceptions.SSLError,
+        exceptions.ProxyError,
+        exceptions.ConnectionError
+    )
+)
+
+_CASSETTES = {}
+_CASSETTES_LOCK = threading.Lock()
+
+
+class CassetteMissError(Exception):
+    '''A request was replayed that the cassette holds no response for.'''
+
+
+def _digest(body):
+    if not body:
+        return ''
+    if not isinstance(body, bytes):
+        body = body.encode('utf-8')
+    return hashlib.sha1(body).hexdigest()[:16]
+
+
+def _path(url):
+    parts = urlparse.urlsplit(url)
+    return parts.path + ('?' + parts.query if parts.query else '')
+
+
+def _key(device, request):
+    return (device, request.method, _path(request.url),
+            _digest(request.body))
+
+
+def _member(data):
+    # A complete gzip member; a file of them reads as one gzip stream.
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class Cassette(object):
+    '''Interactions with devices, recorded to or replayed from a file.
+
+    :param path: path of the cassette file
+    :param mode: RECORD or REPLAY
+    :param timing_scale: replayed responses take the recorded time
+                         multiplied by this; 0 replays them at once
+    '''
+
+    def __init__(self, path, mode, timing_scale=1.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError('Unknown cassette mode: {0}'.format(mode))
+        self.path = path
+        self.mode = mode
+        self.timing_scale = timing_scale
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+        self._recorded = collections.defaultdict(collections.deque)
+        if mode == REPLAY:
+            self._load()
+
+    def _load(self):
+        with gzip.open(self.path, 'rb') as cassette:
+            for line in cassette:
+                interaction = json.loads(line.decode('utf-8'))
+                key = (interaction['device'], interaction['method'],
+                       interaction['path'], interaction['digest'])
+                self._recorded[key].append(interaction)
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._recorded.values())
+
+    def track(self, device):
+        '''The part of the cassette for the traffic to one device.
+
+        :param device: hostname the device is known by
+        :returns: Track
+        '''
+
+        return Track(self, device)
+
+    def record(self, device, request, elapsed, response=None, error=None):
+        '''Append one interaction to the cassette file.'''
+
+        interaction = collections.OrderedDict(zip(
+            ('device', 'method', 'path', 'digest'), _key(device, request)
+        ))
+        interaction['elapsed'] = round(elapsed, 4)
+        if error is not None:
+            interaction['error'] = next(
+                error_type.__name__ for error_type in type(error).__mro__
+                if error_type.__name__ in _ERRORS
+            )
+        else:
+            interaction['status'] = response.status_code
+            interaction['headers'] = dict(
+                (name, response.headers[name]) for name in KEPT_HEADERS
+                if name in response.headers
+            )
+            interaction['body'] = response.content.decode('latin-1')
+        line = json.dumps(interaction, separators=(',', ':')) + '\n'
+        member = _member(line.encode('utf-8'))
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker shares the file, and so the lock, with
+                # its parent; it takes a lock of its own.
+                if self._file is not None:
+                    self._file.close()
+                self._file = open(self.path, 'ab')
+                self._pid = os.getpid()
+            cassette_file = self._file
+        # Waits for other processes recording to the file without holding
+        # up this one; nothing yields between the write and the unlock, so
+        # its own greenthreads do not interleave.
+        locks.flock(cassette_file, fcntl.LOCK_EX)
+        try:
+            cassette_file.write(member)
+            # Every interaction survives the engine stopping abruptly.
+            cassette_file.flush()
+        finally:
+            fcntl.flock(cassette_file, fcntl.LOCK_UN)
+
+    def play(self, device, request):
+        '''The recorded interaction answering a request.
+
+        :raises: CassetteMissError if the cassette has none
+        '''
+
+        with self._lock:
+            queue = self._recorded.get(_key(device, request))
+            if not queue:
+                raise CassetteMissError(
+                    'No recorded response to {0} {1} on {2}.'.format(
+                        request.method, _path(request.url), device
+                    )
+                )
+            if len(queue) > 1:
+                return queue.popleft()
+            return queue[0]
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._pid = None
+
+
+class Track(object):
+    '''Records or replays the requests to one device.'''
+
+    def __init__(self, cassette, device):
+        self.cassette = cassette
+        self.device = device
+
+    def send(self, transport, request, **kwargs):
+        '''Send a request through transport, or replay its response.
+
+        :param transport: sends a request and returns its response, as
+                          HTTPAdapter.send does
+        :returns: Response, elapsed by the time the device took
+        '''
+
+        if self.cassette.mode == REPLAY:
+            return self._replay(request)
+
+        started = time.time()
+        try:
+            response = transport(request, **kwargs)
+        except tuple(_ERRORS.values()) as error:
+            self.cassette.record(self.device, request,
+                                 time.time() - started, error=error)
+            raise
+        elapsed = time.time() - started
+        self.cassette.record(self.device, request, elapsed,
+                             response=response)
+        response.elapsed = datetime.timedelta(seconds=elapsed)
+        return response
+
+    def _replay(self, request):
+        interaction = self.cassette.play(self.device, request)
+        delay = interaction['elapsed'] * self.cassette.timing_scale
+        if delay > 0:
+            eventlet.sleep(delay)
+        if 'error' in interaction:
+            raise _ERRORS[interaction['error']](
+                'Replayed {0}'.format(interaction['error']), request=request
+            )
+        response = Response()
+        response.status_code = interaction['status']
+        response.headers = CaseInsensitiveDict(interaction['headers'])
+        response._content = interaction['body'].encode('latin-1')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.elapsed = datetime.timedelta(seconds=interaction['elapsed'])
+        return response
+
+
+def get_cassette():
+    '''Return the cassette configured in [f5_heat], or None if unset.'''
+
+    options = CONF[GROUP]
+    if not options.cassette_mode or not options.cassette_path:
+        return None
+    with _CASSETTES_LOCK:
+        cassette = _CASSETTES.get(options.cassette_path)
+        if cassette is None:
+            cassette = _CASSETTES[options.cassette_path] = Cassette(
+                options.cassette_path,
+                options.cassette_mode,
+                options.cassette_timing_scale
+            )
+    return cassette
+
+
+def clear_cassettes():
+    '''Close and forget every cassette.'''
+
+    with _CASSETTES_LOCK:
+        for cassette in _CASSETTES.values():
+            cassette.close()
+        _CASSETTES.clear()
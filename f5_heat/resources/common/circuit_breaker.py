@@ -0,0 +1,176 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Fail fast on BIG-IP® devices that are down.
+
+Without a breaker, every resource of every stack that depends on an
+unreachable device waits out its own connect timeout. A device's
+:class:`CircuitBreaker` opens after consecutive failures, after which
+requests to the device fail immediately. Once the reset timeout has passed,
+a single request is let through as a probe; its success closes the breaker
+and its failure keeps it open for another reset timeout.
+
+Breakers are kept per device hostname for the life of the engine process,
+so every connection to the device shares one.
+'''
+
+import threading
+import time
+
+from oslo_log import log as logging
+from requests.exceptions import ConnectionError
+
+import metrics
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+# Values of the f5_device_circuit_state gauge.
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+class CircuitOpenError(ConnectionError):
+    '''Raised instead of sending a request to a device known to be down.'''
+
+
+class CircuitBreaker(object):
+    '''Tracks consecutive failures of one device.'''
+
+    def __init__(self, device, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.device = device
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        # Called with the lock held.
+        if state != self.state:
+            LOG.warning(
+                'Circuit breaker for BIG-IP %(device)s is now %(state)s',
+                {'device': self.device, 'state': state}
+            )
+            self.state = state
+        metrics.set_gauge(
+            'f5_device_circuit_state',
+            _STATE_VALUES[state],
+            device=self.device
+        )
+
+    def _error(self):
+        return CircuitOpenError(
+            'BIG-IP {0} is unavailable after {1} consecutive failures; '
+            'retrying after {2} seconds.'.format(
+                self.device, self.failures, self.reset_timeout
+            )
+        )
+
+    def check(self):
+        '''Fail fast if requests to the device would be refused.
+
+        Unlike before_request, this never claims the half-open probe.
+
+        :raises: CircuitOpenError
+        '''
+
+        with self._lock:
+            if self.state == HALF_OPEN or (
+                    self.state == OPEN and
+                    time.time() - self._opened_at < self.reset_timeout):
+                raise self._error()
+
+    def trial_due(self):
+        '''Whether the device is down but due a request to probe it.'''
+
+        with self._lock:
+            return (self.state == OPEN and
+                    time.time() - self._opened_at >= self.reset_timeout)
+
+    def before_request(self):
+        '''Admit a request to the device, or refuse it.
+
+        :returns: True if the request is the half-open probe
+        :raises: CircuitOpenError
+        '''
+
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            if (self.state == OPEN and
+                    time.time() - self._opened_at >= self.reset_timeout):
+                self._set_state(HALF_OPEN)
+                return True
+        metrics.increment('f5_device_circuit_rejected_total',
+                          device=self.device)
+        raise self._error()
+
+    def record_success(self):
+        '''The device answered a request.'''
+
+        with self._lock:
+            self.failures = 0
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        '''A request could not reach the device or timed out.'''
+
+        with self._lock:
+            self.failures += 1
+            if (self.state == HALF_OPEN or
+                    self.failures >= self.failure_threshold):
+                self._opened_at = time.time()
+                self._set_state(OPEN)
+
+    def abandon(self):
+        '''A request ended without saying anything about the device.
+
+        If it was the half-open probe, the next request probes instead.
+        '''
+
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._set_state(OPEN)
+
+
+def get_breaker(device):
+    '''Return the process-wide circuit breaker for a device.'''
+
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(device)
+        if breaker is None:
+            breaker = _BREAKERS[device] = CircuitBreaker(device)
+    return breaker
+
+
+def clear_breakers():
+    '''Forget the state of every device.'''
+
+    with _BREAKERS_LOCK:
+        _BREAKERS.clear()
@@ -0,0 +1,180 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Concurrent and cooperative device operations on eventlet greenthreads.
+
+heat-engine runs every resource handler in a greenthread, so bulk device
+work (pool members, fan-out across the devices of a cluster) is run here as
+greenthreads as well. Each one yields to the hub while its request is on the
+wire, and a per-device limiter bounds how many requests are in flight to a
+single BIG-IP® at once. Limiters are kept per device hostname, so the bound
+holds across every connection to the device.
+
+Work that never touches the network does not yield on its own. Long loops
+should iterate through :func:`cooperative`, and large JSON or template
+parsing should go through :func:`offload`, so that one large stack does not
+stall every other stack served by the same engine worker.
+'''
+
+import json
+import threading
+
+import eventlet
+from eventlet import greenpool
+from eventlet import semaphore
+from eventlet import tpool
+
+import profiling
+import request_context
+import tracing
+
+
+DEFAULT_POOL_SIZE = 64
+
+# Items processed between yields to other greenthreads in a long loop.
+YIELD_INTERVAL = 100
+
+# Inputs of at least this many characters are parsed in a native thread.
+OFFLOAD_THRESHOLD = 64 * 1024
+
+_LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def cooperative(iterable, interval=YIELD_INTERVAL):
+    '''Iterate, yielding to other greenthreads every interval items.'''
+
+    for count, item in enumerate(iterable, 1):
+        yield item
+        if count % interval == 0:
+            eventlet.sleep(0)
+
+
+def offload(func, *args, **kwargs):
+    '''Run CPU-bound func in eventlet's native thread pool.
+
+    The calling greenthread waits for the result while the hub keeps
+    running the others.
+    '''
+
+    return tpool.execute(func, *args, **kwargs)
+
+
+def json_loads(text):
+    '''Decode JSON, off the hub when the text is large.'''
+
+    if len(text) >= OFFLOAD_THRESHOLD:
+        return offload(json.loads, text)
+    return json.loads(text)
+
+
+def json_dumps(obj, large=False):
+    '''Encode JSON, off the hub when the caller knows obj is large.'''
+
+    if large:
+        return offload(json.dumps, obj)
+    return json.dumps(obj)
+
+
+def get_limiter(device, size):
+    '''Return the process-wide limiter of bulk operations on a device.
+
+    A limiter of another size replaces the previous one, for the bulk
+    operations started from then on, so a changed max_concurrency takes
+    effect without a restart.
+
+    :returns: semaphore allowing size operations at once
+    '''
+
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(device)
+        if limiter is None or limiter[0] != size:
+            limiter = _LIMITERS[device] = (size, semaphore.Semaphore(size))
+    return limiter[1]
+
+
+def clear_limiters():
+    '''Forget the limiter of every device.'''
+
+    with _LIMITERS_LOCK:
+        _LIMITERS.clear()
+
+
+class DeviceExecutor(object):
+    '''Run device operations concurrently, optionally bounded per device.
+
+    If the greenthread waiting on the executor is killed, as heat-engine
+    does when a stack action is cancelled or times out, the operations it
+    started are killed too.
+    '''
+
+    def __init__(self, size=DEFAULT_POOL_SIZE):
+        self._pool = greenpool.GreenPool(size)
+        self._threads = []
+
+    @staticmethod
+    def _limited(context, span, session, limiter, func, args, kwargs):
+        with request_context.bind(context), tracing.bind(span), \
+                profiling.include(session):
+            if limiter is None:
+                return func(*args, **kwargs)
+            with limiter:
+                return func(*args, **kwargs)
+
+    def submit(self, limiter, func, *args, **kwargs):
+        '''Start func in a greenthread, in the caller's context and span.
+
+        It is profiled along with the caller, if the caller is profiled.
+
+        :param limiter: semaphore bounding concurrency, or None
+        :returns: eventlet GreenThread
+        '''
+
+        thread = self._pool.spawn(
+            self._limited,
+            request_context.current(),
+            tracing.current(),
+            profiling.current(),
+            limiter,
+            func,
+            args,
+            kwargs
+        )
+        self._threads.append(thread)
+        return thread
+
+    def map(self, func, iterable, limiter=None):
+        '''Call func on every item concurrently and wait for all of them.
+
+        The first exception raised by any call cancels the remaining calls
+        and is re-raised.
+
+        :returns: list of results, in the order of iterable
+        '''
+
+        threads = [self.submit(limiter, func, item) for item in iterable]
+        try:
+            return [thread.wait() for thread in threads]
+        finally:
+            self.cancel()
+
+    def cancel(self):
+        '''Kill every operation that has not yet finished.'''
+
+        threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.kill()
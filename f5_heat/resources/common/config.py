@@ -0,0 +1,178 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''heat-engine options for the F5® plugins, in the [f5_heat] group.
+
+These apply to every stack served by an engine host, unlike the properties
+of an F5::BigIP::Device, which apply to one device in one template.
+'''
+
+from oslo_config import cfg
+from oslo_config import types
+
+
+CONF = cfg.CONF
+
+GROUP = 'f5_heat'
+
+f5_heat_opts = [
+    cfg.Opt(
+        'tenant_weights',
+        type=types.Dict(types.Float(min=0.01)),
+        default={},
+        help='Share of a busy BIG-IP each stack of a tenant gets relative '
+             'to the stacks of other tenants, as <project id>:<weight> '
+             'pairs. Tenants not listed have weight 1.'
+    ),
+    cfg.StrOpt(
+        'lock_path',
+        help='Directory of the lock files heat-engine processes on this host '
+             'use to coordinate changes to BIG-IP devices. Changes to a '
+             'partition are serialized across processes, while reads '
+             'proceed in parallel. Leave unset to disable locking.'
+    ),
+    cfg.StrOpt(
+        'cache_path',
+        help='Path of an SQLite database in which heat-engine processes on '
+             'this host share BIG-IP authentication tokens, versions and '
+             'capabilities, so that workers and restarted engines need not '
+             'log in and discover devices again. Leave unset to disable '
+             'the shared cache.'
+    ),
+    cfg.StrOpt(
+        'cassette_mode',
+        choices=['record', 'replay'],
+        help='Set to record to write every request made to a BIG-IP, with '
+             'its response and timing, to the cassette at cassette_path. '
+             'Set to replay to answer every request from that cassette '
+             'instead of a device, to rerun the traffic of a stack '
+             'offline. Leave unset to talk to devices normally.'
+    ),
+    cfg.StrOpt(
+        'cassette_path',
+        help='Path of the gzipped cassette file recorded to or replayed '
+             'from when cassette_mode is set.'
+    ),
+    cfg.FloatOpt(
+        'cassette_timing_scale',
+        default=1.0,
+        min=0.0,
+        help='When replaying, each response takes the time the device '
+             'took to answer it multiplied by this. 0 replays at once.'
+    ),
+    cfg.BoolOpt(
+        'metrics_enabled',
+        default=False,
+        help='Time every resource handler, and count the requests, bytes, '
+             'logins and retries each sends to BIG-IP devices by method '
+             'and endpoint.'
+    ),
+    cfg.StrOpt(
+        'metrics_file',
+        help='Path of a file the metrics are written to in the Prometheus '
+             'text format, for the node exporter textfile collector. '
+             '{pid} is replaced by the id of the engine process, since '
+             'each keeps its own metrics.'
+    ),
+    cfg.BoolOpt(
+        'metrics_notifications',
+        default=False,
+        help='Also send the metrics as f5_heat.metrics notifications.'
+    ),
+    cfg.IntOpt(
+        'metrics_interval',
+        default=60,
+        min=1,
+        help='Seconds between exports of the metrics, which happen as '
+             'handlers complete.'
+    ),
+    cfg.StrOpt(
+        'trace_dir',
+        help='Directory each resource handler run is traced to, with its '
+             'REST requests, as Zipkin v2 JSON, one file per stack '
+             'action. Unset disables tracing.'
+    ),
+    cfg.ListOpt(
+        'profile_handlers',
+        default=[],
+        help='Handlers to profile with cProfile, as <class>.<handler> or '
+             '<resource type>.<handler> patterns, such as '
+             'F5LTMPool.handle_create. Defaults to the '
+             'F5_HEAT_PROFILE_HANDLERS environment variable.'
+    ),
+    cfg.StrOpt(
+        'profile_dir',
+        help='Directory a pstats file is written to for every profiled '
+             'handler run. Defaults to the F5_HEAT_PROFILE_DIR environment '
+             'variable.'
+    ),
+    cfg.IntOpt(
+        'profile_every',
+        min=1,
+        help='Profile only the first of every this many runs of each '
+             'handler. Defaults to the F5_HEAT_PROFILE_EVERY environment '
+             'variable, or 1.'
+    ),
+    cfg.StrOpt(
+        'memory_snapshot_dir',
+        help='Directory snapshots of the memory allocated are written to, '
+             'with the memory held by each resource type and method. '
+             'Needs tracemalloc, from Python 3.4; on Python 2.7 nothing '
+             'is written.'
+    ),
+    cfg.IntOpt(
+        'memory_snapshot_frames',
+        default=64,
+        min=1,
+        help='Frames kept of the traceback of each allocation; more '
+             'attribute more allocations, at the cost of more memory.'
+    ),
+    cfg.IntOpt(
+        'memory_snapshot_interval',
+        default=300,
+        min=1,
+        help='Seconds between memory snapshots, which are taken as '
+             'handlers complete.'
+    ),
+    cfg.BoolOpt(
+        'wire_log_enabled',
+        default=False,
+        help='Log requests to BIG-IP devices as JSON, with their '
+             'endpoint, status, size, time to first byte, and time on the '
+             'device apart from time spent queued or backing off.'
+    ),
+    cfg.FloatOpt(
+        'wire_log_slow_threshold',
+        default=1.0,
+        min=0.0,
+        help='Requests taking at least this many seconds in all, and '
+             'logins, are always logged.'
+    ),
+    cfg.FloatOpt(
+        'wire_log_sample_rate',
+        default=0.01,
+        min=0.0,
+        max=1.0,
+        help='Fraction of the faster requests logged.'
+    )
+]
+
+CONF.register_opts(f5_heat_opts, group=GROUP)
+
+
+def list_opts():
+    yield GROUP, f5_heat_opts
@@ -0,0 +1,158 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''One config-sync for many changes written to a BIG-IP® cluster.
+
+Resources that target an F5::Cm::Cluster write to a single device of the
+cluster and then need their change synced to the others. Requests to sync
+that arrive within a short delay of each other share one config-sync, and
+every requester waits until the device group is back in sync. The
+config-sync is traced as a span of the handler that requested it first.
+'''
+
+import threading
+import time
+
+import eventlet
+from eventlet import event
+from oslo_log import log as logging
+
+import metrics
+import tracing
+
+
+LOG = logging.getLogger(__name__)
+
+# Seconds to gather sync requests before starting a config-sync.
+DEFAULT_SYNC_DELAY = 1.0
+# Seconds to wait for the device group to report it is in sync.
+DEFAULT_SYNC_TIMEOUT = 120
+SYNC_POLL_INTERVAL = 1.0
+
+SYNC_STATUS_ENTRY = 'https://localhost/mgmt/tm/cm/sync-status/0'
+
+_COALESCERS = {}
+_COALESCERS_LOCK = threading.Lock()
+
+
+class ConfigSyncTimeout(Exception):
+    pass
+
+
+def sync_status(bigip):
+    '''Return the sync status description of a device, such as 'In Sync'.'''
+
+    status = bigip.tm.cm.sync_status
+    status.refresh()
+    return (status.entries[SYNC_STATUS_ENTRY]['nestedStats']['entries']
+            ['status']['description'])
+
+
+class SyncCoalescer(object):
+    '''Runs one config-sync for all requests made close together.'''
+
+    def __init__(self, device_group, delay=DEFAULT_SYNC_DELAY,
+                 timeout=DEFAULT_SYNC_TIMEOUT):
+        self.device_group = device_group
+        self.delay = delay
+        self.timeout = timeout
+        self._pending = None
+        self._requests = 0
+        self._lock = threading.Lock()
+
+    def sync(self, bigip):
+        '''Sync the device group from bigip, sharing a pending sync.
+
+        A sync that has already started does not include changes made
+        since, so a request arriving then waits for the next one.
+
+        :raises: ConfigSyncTimeout, or whatever the sync raised
+        '''
+
+        with self._lock:
+            if self._pending is None:
+                self._pending = event.Event()
+                self._requests = 0
+                eventlet.spawn_n(self._run, bigip, self._pending,
+                                 tracing.current())
+            self._requests += 1
+            pending = self._pending
+        return pending.wait()
+
+    def _run(self, bigip, pending, span=None):
+        eventlet.sleep(self.delay)
+        with self._lock:
+            self._pending = None
+            requests = self._requests
+        LOG.debug('Syncing device group %(group)s for %(count)d changes',
+                  {'group': self.device_group, 'count': requests})
+        metrics.increment(
+            'f5_config_syncs_total', device_group=self.device_group
+        )
+        metrics.observe(
+            'f5_config_sync_coalesced_requests',
+            requests,
+            device_group=self.device_group
+        )
+        try:
+            with tracing.bind(span), tracing.span(
+                    'config_sync', device_group=self.device_group,
+                    coalesced_requests=requests):
+                bigip.tm.cm.exec_cmd(
+                    'run',
+                    utilCmdArgs='config-sync to-group {0}'.format(
+                        self.device_group
+                    )
+                )
+                self._wait_in_sync(bigip)
+        except Exception as ex:
+            pending.send_exception(ex)
+        else:
+            pending.send(True)
+
+    def _wait_in_sync(self, bigip):
+        deadline = time.time() + self.timeout
+        while True:
+            with tracing.span('sync_status_poll') as span:
+                status = sync_status(bigip)
+                if span is not None:
+                    span.tag('status', status)
+            if status.lower() == 'in sync':
+                return
+            if time.time() > deadline:
+                raise ConfigSyncTimeout(
+                    'Device group {0} not in sync after {1} seconds'.format(
+                        self.device_group, self.timeout
+                    )
+                )
+            eventlet.sleep(SYNC_POLL_INTERVAL)
+
+
+def get_coalescer(device_group, hostname):
+    '''Return the process-wide coalescer for a device group and writer.'''
+
+    key = (device_group, hostname)
+    with _COALESCERS_LOCK:
+        coalescer = _COALESCERS.get(key)
+        if coalescer is None:
+            coalescer = _COALESCERS[key] = SyncCoalescer(device_group)
+    return coalescer
+
+
+def clear_coalescers():
+    with _COALESCERS_LOCK:
+        _COALESCERS.clear()
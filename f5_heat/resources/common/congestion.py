@@ -0,0 +1,171 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Adaptive concurrency for a BIG-IP® device's management plane.
+
+restjavad signals overload with 503 responses, timeouts and rising latency
+well before it falls over. :class:`AIMDController` watches every response
+from a device and sizes the device's scheduler window the way TCP sizes a
+congestion window: it grows by one request per window of healthy responses
+and halves on an overload signal, between one request and the device's
+max_concurrency.
+
+Controllers are kept per device hostname, next to the device's scheduler,
+so the window learned from a device outlives the connections to it and
+every username on the device shares it.
+'''
+
+import threading
+import time
+
+from oslo_log import log as logging
+
+import metrics
+
+
+LOG = logging.getLogger(__name__)
+
+# Responses that mean the device is shedding load.
+OVERLOAD_STATUS_CODES = frozenset([429, 503])
+
+# A response this many times slower than the smoothed latency is a spike...
+LATENCY_SPIKE_FACTOR = 3.0
+# ...as long as it is also slower than this many seconds.
+LATENCY_SPIKE_FLOOR = 0.5
+
+# Weight of the newest sample in the smoothed latency.
+LATENCY_SMOOTHING = 0.2
+
+DECREASE_FACTOR = 0.5
+
+_CONTROLLERS = {}
+_CONTROLLERS_LOCK = threading.Lock()
+
+
+class AIMDController(object):
+    '''Additive-increase, multiplicative-decrease window for one device.'''
+
+    def __init__(self, scheduler, max_window, min_window=1):
+        self.scheduler = scheduler
+        self.min_window = min_window
+        self.max_window = max_window
+        self.window = float(max_window)
+        self.latency = None
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._publish()
+
+    def _publish(self):
+        # Called with the lock held, or from __init__.
+        capacity = max(self.min_window, int(self.window))
+        if capacity != self.scheduler.capacity:
+            LOG.info(
+                'Concurrency window for BIG-IP %(device)s is now '
+                '%(window)d', {'device': self.scheduler.device,
+                               'window': capacity}
+            )
+            self.scheduler.set_capacity(capacity)
+        metrics.set_gauge(
+            'f5_device_concurrency_window',
+            capacity,
+            device=self.scheduler.device
+        )
+
+    def set_max_window(self, max_window):
+        '''Change the largest window, shrinking the window if need be.'''
+
+        with self._lock:
+            if max_window != self.max_window:
+                self.max_window = max_window
+                self.window = min(self.window, float(max_window))
+                self._publish()
+
+    def _increase(self):
+        if self.window < self.max_window:
+            self.window = min(
+                self.max_window, self.window + 1.0 / self.window
+            )
+            self._publish()
+
+    def _decrease(self, started, reason):
+        # Requests already in flight when the window was last cut report
+        # the same congestion; only the first of them cuts the window.
+        if started < self._last_decrease:
+            return
+        self._last_decrease = time.time()
+        self.window = max(
+            float(self.min_window), self.window * DECREASE_FACTOR
+        )
+        metrics.increment(
+            'f5_device_overload_total',
+            device=self.scheduler.device,
+            reason=reason
+        )
+        self._publish()
+
+    def on_response(self, started, status_code):
+        '''Account for a response to a request sent at time started.'''
+
+        elapsed = time.time() - started
+        with self._lock:
+            if status_code in OVERLOAD_STATUS_CODES:
+                self._decrease(started, 'status')
+                return
+            spike = (
+                self.latency is not None and
+                elapsed > LATENCY_SPIKE_FLOOR and
+                elapsed > self.latency * LATENCY_SPIKE_FACTOR
+            )
+            if self.latency is None:
+                self.latency = elapsed
+            else:
+                self.latency += LATENCY_SMOOTHING * (elapsed - self.latency)
+            if spike:
+                self._decrease(started, 'latency')
+            else:
+                self._increase()
+
+    def on_timeout(self, started):
+        '''Account for a request sent at time started that timed out.'''
+
+        with self._lock:
+            self._decrease(started, 'timeout')
+
+
+def get_controller(scheduler, max_window):
+    '''Return the process-wide controller of a device's scheduler.
+
+    An existing controller keeps the window it has learned, within the
+    given max_window.
+    '''
+
+    with _CONTROLLERS_LOCK:
+        controller = _CONTROLLERS.get(scheduler.device)
+        if controller is None or controller.scheduler is not scheduler:
+            controller = _CONTROLLERS[scheduler.device] = AIMDController(
+                scheduler, max_window
+            )
+            return controller
+    controller.set_max_window(max_window)
+    return controller
+
+
+def clear_controllers():
+    '''Forget the window learned for every device.'''
+
+    with _CONTROLLERS_LOCK:
+        _CONTROLLERS.clear()
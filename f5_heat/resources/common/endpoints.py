@@ -0,0 +1,179 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Choose between the management addresses of a multi-homed BIG-IP®.
+
+A device reachable at several management addresses (IPv4, IPv6, a floating
+management address) is probed at all of them in parallel. Requests go to
+the fastest address that answered; an address that fails a request is
+passed over until the next probe, and addresses are probed again
+periodically in the background so that traffic follows the best path.
+
+A probe is an unauthenticated GET, so it costs the device no login and
+any HTTP response below 500 counts as healthy. With a cassette, probes are
+recorded and replayed like the device's requests, so a replay ranks the
+addresses as the recording did without reaching any of them.
+'''
+
+import threading
+import time
+
+import eventlet
+from oslo_log import log as logging
+import requests
+from requests.adapters import HTTPAdapter
+
+from concurrency import DeviceExecutor
+import metrics
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_REPROBE_INTERVAL = 60
+
+
+def endpoint_netloc(endpoint):
+    '''Host part of a URL for an address, bracketing IPv6 addresses.
+
+    An address may carry a port, as in ``10.0.0.1:8443`` or
+    ``[2001:db8::1]:8443``.
+    '''
+
+    if endpoint.count(':') > 1 and not endpoint.startswith('['):
+        return '[{0}]'.format(endpoint)
+    return endpoint
+
+
+class EndpointSelector(object):
+    '''Ranks the management addresses of one device by probed latency.
+
+    :param cassette: Cassette the probes are recorded to or replayed from
+    '''
+
+    def __init__(self, device, endpoints, timeout,
+                 interval=DEFAULT_REPROBE_INTERVAL, cassette=None):
+        self.device = device
+        self.endpoints = list(endpoints)
+        self.timeout = timeout
+        self.interval = interval
+        self.cassette = cassette
+        self._ranked = None
+        self._probed_at = 0
+        self._reprobing = False
+        self._lock = threading.Lock()
+        self._first_probe = threading.Lock()
+
+    def _measure(self, endpoint):
+        '''Return the latency of an endpoint in seconds, or None.'''
+
+        url = 'https://{0}/mgmt/tm/sys/version'.format(
+            endpoint_netloc(endpoint)
+        )
+        try:
+            response = self._get(endpoint, url)
+        except requests.RequestException:
+            return None
+        if response.status_code >= 500:
+            return None
+        return response.elapsed.total_seconds()
+
+    def _get(self, endpoint, url):
+        if self.cassette is None:
+            return requests.get(url, timeout=self.timeout, verify=False)
+
+        # Tracked apart from the device's own requests to the same path,
+        # which are authenticated and answered differently.
+        track = self.cassette.track('{0} probe'.format(endpoint))
+        transport = HTTPAdapter()
+        try:
+            return track.send(transport.send,
+                              requests.Request('GET', url).prepare(),
+                              timeout=self.timeout, verify=False)
+        finally:
+            transport.close()
+
+    def probe(self):
+        '''Probe every endpoint in parallel and rank the healthy ones.'''
+
+        latencies = DeviceExecutor().map(self._measure, self.endpoints)
+        ranked = [
+            endpoint for latency, endpoint in sorted(
+                (latency, endpoint)
+                for endpoint, latency in zip(self.endpoints, latencies)
+                if latency is not None
+            )
+        ]
+        for endpoint, latency in zip(self.endpoints, latencies):
+            if latency is not None:
+                metrics.set_gauge(
+                    'f5_device_endpoint_latency_seconds',
+                    latency,
+                    device=self.device,
+                    endpoint=endpoint
+                )
+        with self._lock:
+            self._switch(ranked)
+            self._probed_at = time.time()
+        return ranked
+
+    def _switch(self, ranked):
+        # Called with the lock held.
+        previous = self._ranked[0] if self._ranked else None
+        self._ranked = ranked
+        if ranked and ranked[0] != previous:
+            LOG.info(
+                'Sending requests for BIG-IP %(device)s to %(endpoint)s',
+                {'device': self.device, 'endpoint': ranked[0]}
+            )
+
+    def _reprobe(self):
+        try:
+            self.probe()
+        finally:
+            if self._ranked is None:
+                self._ranked = []
+            self._reprobing = False
+
+    def current(self):
+        '''Return the endpoint to send the next request to.
+
+        The first call probes every endpoint; later calls start a background
+        probe when the last one is older than the interval.
+        '''
+
+        if self._ranked is None:
+            with self._first_probe:
+                if self._ranked is None:
+                    self._reprobing = True
+                    self._reprobe()
+        elif (not self._reprobing and
+                time.time() - self._probed_at > self.interval):
+            self._reprobing = True
+            eventlet.spawn_n(self._reprobe)
+        ranked = self._ranked
+        return ranked[0] if ranked else self.endpoints[0]
+
+    def failed(self, endpoint):
+        '''Pass over an endpoint that failed a request until the next probe.'''
+
+        with self._lock:
+            if endpoint in self._ranked:
+                ranked = [other for other in self._ranked if other != endpoint]
+                metrics.increment(
+                    'f5_device_endpoint_failovers_total', device=self.device
+                )
+                self._switch(ranked)
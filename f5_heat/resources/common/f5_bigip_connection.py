@@ -0,0 +1,463 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Shared connections to BIG-IP® devices.
+
+Every resource that references an F5::BigIP::Device uses the same
+:class:`BigIPConnection` for that device, so the session (and its pooled
+HTTPS connections) is established once per engine process rather than once
+per resource handler.
+'''
+
+import functools
+import threading
+import time
+
+from f5.bigip import ManagementRoot
+from icontrol.session import iControlRESTSession
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError
+from requests.exceptions import Timeout
+from six.moves.urllib import parse as urlparse
+
+from auth import TokenAuth
+from capabilities import DEFAULT_CAPABILITIES_TTL
+from capabilities import DeviceCapabilities
+from cassette import clear_cassettes
+from cassette import get_cassette
+from circuit_breaker import clear_breakers
+from circuit_breaker import get_breaker
+from concurrency import clear_limiters
+from concurrency import get_limiter
+from congestion import clear_controllers
+from congestion import get_controller
+from endpoints import endpoint_netloc
+from endpoints import EndpointSelector
+import instrumentation
+from mixins import RetryPolicy
+import request_context
+from scheduler import clear_schedulers
+from scheduler import DEFAULT_FLOW
+from scheduler import get_scheduler
+from shared_cache import get_shared_cache
+import tracing
+import wire_log
+
+
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_MAX_CONCURRENCY = 8
+
+_CONNECTIONS = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+
+def _parse_tmos_version(payload):
+    '''Pull the TMOS version out of the selfLink of a REST response.
+
+    :param payload: decoded JSON body of any /mgmt/tm response
+    :returns: string version, such as '12.1.0'
+    '''
+
+    query = urlparse.urlparse(payload['selfLink']).query
+    return urlparse.parse_qs(query)['ver'][0]
+
+
+class DeviceAdapter(HTTPAdapter):
+    '''HTTP adapter every request to a device passes through.
+
+    It applies the device timeouts, since requests ignores a timeout set on
+    the session itself and calls made through the f5-sdk would otherwise
+    wait forever on an unresponsive device. When given a scheduler, it
+    holds each request until the scheduler grants it a slot on behalf of
+    the stack that made it. When given a controller, it reports the
+    outcome of every request so the controller can size the scheduler's
+    window. When given a breaker, it refuses requests while the device is
+    known to be down, before they are queued. When given a retry policy,
+    it retries transient failures, giving up its scheduler slot while it
+    backs off. When given an endpoint selector, it sends each request to
+    the management address the selector picks. When given a cassette
+    track, it records every exchange with the device to it, or replays
+    them from it without reaching the device. Every request sent within a
+    traced handler is traced as a span of its own, retries apart. When the
+    wire log is enabled, it times each request on the wire and in all.
+    '''
+
+    # Methods that may be repeated without changing the result.
+    IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT'])
+
+    def __init__(self, timeout, scheduler=None, controller=None,
+                 breaker=None, retry_policy=None, selector=None,
+                 track=None, **kwargs):
+        self.timeout = timeout
+        self.scheduler = scheduler
+        self.controller = controller
+        self.breaker = breaker
+        self.retry_policy = retry_policy
+        self.selector = selector
+        self.track = track
+        super(DeviceAdapter, self).__init__(**kwargs)
+
+    def _transport(self, request, **kwargs):
+        if self.track is None:
+            return super(DeviceAdapter, self).send(request, **kwargs)
+
+        response = self.track.send(
+            super(DeviceAdapter, self).send, request, **kwargs
+        )
+        # A replayed response was not built by this adapter; TokenAuth
+        # resends a request rejected with a 401 through its connection.
+        response.connection = self
+        return response
+
+    def _timed(self, request, **kwargs):
+        return wire_log.attempt(self._transport, request, **kwargs)
+
+    def _counted(self, request, **kwargs):
+        if not instrumentation.enabled():
+            return self._timed(request, **kwargs)
+
+        try:
+            response = self._timed(request, **kwargs)
+        except Exception:
+            instrumentation.record_request(request)
+            raise
+        instrumentation.record_request(request, response,
+                                       kwargs.get('stream', False))
+        return response
+
+    def _traced(self, request, **kwargs):
+        with tracing.request_span(request) as span:
+            response = self._counted(request, **kwargs)
+            if span is not None:
+                span.tag('http.status_code', response.status_code)
+                if response.status_code >= 500:
+                    span.tag('error', response.reason or 'server error')
+            return response
+
+    def _send(self, request, **kwargs):
+        if self.controller is None:
+            return self._traced(request, **kwargs)
+
+        started = time.time()
+        try:
+            response = self._traced(request, **kwargs)
+        except Timeout:
+            self.controller.on_timeout(started)
+            raise
+        self.controller.on_response(started, response.status_code)
+        return response
+
+    def _routed(self, request, **kwargs):
+        if self.selector is None:
+            return self._send(request, **kwargs)
+
+        endpoint = self.selector.current()
+        routed = request.copy()
+        url = urlparse.urlsplit(request.url)
+        routed.url = urlparse.urlunsplit(
+            url._replace(netloc=endpoint_netloc(endpoint))
+        )
+        try:
+            return self._send(routed, **kwargs)
+        except (ConnectionError, Timeout):
+            self.selector.failed(endpoint)
+            raise
+
+    def _scheduled(self, request, **kwargs):
+        if self.scheduler is None:
+            return self._routed(request, **kwargs)
+
+        context = request_context.current()
+        if context is None or context.stack_id is None:
+            self.scheduler.acquire(DEFAULT_FLOW)
+        else:
+            self.scheduler.acquire(context.stack_id, context.weight)
+        try:
+            return self._routed(request, **kwargs)
+        finally:
+            self.scheduler.release()
+
+    def _guarded(self, request, **kwargs):
+        if self.breaker is None:
+            return self._scheduled(request, **kwargs)
+
+        self.breaker.before_request()
+        try:
+            response = self._scheduled(request, **kwargs)
+        except (ConnectionError, Timeout):
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        if response.status_code in (502, 504):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        with wire_log.exchange(request):
+            if self.retry_policy is None:
+                return self._guarded(request, **kwargs)
+
+            return self.retry_policy.call(
+                functools.partial(self._guarded, request, **kwargs),
+                request.method in self.IDEMPOTENT_METHODS,
+                device=urlparse.urlparse(request.url).hostname,
+                method=request.method
+            )
+
+
+class _SeededManagementRoot(ManagementRoot):
+    '''ManagementRoot built on the session of an existing connection.
+
+    The stock ManagementRoot opens its own session and issues a GET to learn
+    the TMOS version; both are already known once a connection is probed.
+    '''
+
+    def __init__(self, connection):
+        self._connection = connection
+        address = urlparse.urlsplit(
+            '//' + endpoint_netloc(connection.hostname)
+        )
+        super(_SeededManagementRoot, self).__init__(
+            endpoint_netloc(address.hostname),
+            connection.username,
+            connection.password,
+            timeout=connection.timeout[1],
+            port=address.port or 443
+        )
+
+    def _get_tmos_version(self):
+        self._meta_data['icr_session'] = self._connection.icr_session
+        if self._connection.tmos_version is None:
+            self._connection.probe()
+        self._meta_data['tmos_version'] = self._connection.tmos_version
+
+
+class BigIPConnection(object):
+    '''An authenticated, reusable session to a single BIG-IP® device.
+
+    The hostname may carry a port, for a device whose management interface
+    does not listen on 443.
+
+    When the shared device cache is configured, a new connection starts from
+    the version and capabilities other engine processes have discovered,
+    and shares their login tokens.
+    '''
+
+    def __init__(self, hostname, username, password,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 token_auth=False, endpoints=None):
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.timeout = (connect_timeout, read_timeout)
+        self.tmos_version = None
+        self._capabilities = None
+        self.shared_cache = get_shared_cache()
+        if self.shared_cache is not None:
+            self._load_shared()
+        # Bounds concurrent requests from bulk operations on this device.
+        self.limiter = get_limiter(hostname, max_concurrency)
+        # Shares the device between every stack that uses it, with a
+        # window that adapts to how loaded the device is, up to
+        # max_concurrency. Like the breaker, both are shared with every
+        # other connection to the same device.
+        self.scheduler = get_scheduler(hostname, max_concurrency)
+        self.controller = get_controller(self.scheduler, max_concurrency)
+        # Shared with every other connection to the same device.
+        self.breaker = get_breaker(hostname)
+        # The device is always addressed by hostname; requests are routed
+        # to whichever of its management addresses is performing best.
+        cassette = get_cassette()
+        self.selector = None
+        if endpoints:
+            self.selector = EndpointSelector(
+                hostname,
+                [hostname] + [ep for ep in endpoints if ep != hostname],
+                self.timeout,
+                cassette=cassette
+            )
+        self.icr_session = iControlRESTSession(username, password)
+        self.icr_session.session.mount(
+            'https://',
+            DeviceAdapter(
+                self.timeout,
+                scheduler=self.scheduler,
+                controller=self.controller,
+                breaker=self.breaker,
+                retry_policy=RetryPolicy(),
+                selector=self.selector,
+                track=None if cassette is None else cassette.track(hostname),
+                pool_maxsize=max_concurrency
+            )
+        )
+        if token_auth:
+            self.icr_session.session.auth = TokenAuth(
+                self.icr_session.session,
+                self.base_uri,
+                hostname,
+                username,
+                password,
+                self.timeout,
+                shared_cache=self.shared_cache
+            )
+        self._bigip = None
+        self._lock = threading.Lock()
+
+    def _load_shared(self):
+        facts = self.shared_cache.get_device(self.hostname)
+        if facts is None:
+            return
+        self.tmos_version = facts['tmos_version']
+        if facts['modules'] is not None:
+            self._capabilities = DeviceCapabilities(
+                facts['tmos_version'],
+                facts['modules'],
+                discovered_at=facts['discovered_at']
+            )
+
+    @property
+    def base_uri(self):
+        return 'https://{0}/mgmt/'.format(endpoint_netloc(self.hostname))
+
+    @property
+    def bigip(self):
+        '''The f5-sdk ManagementRoot for this device, built on first use.
+
+        :raises: CircuitOpenError while the device is known to be down
+        '''
+
+        self.breaker.check()
+        with self._lock:
+            if self._bigip is None:
+                self._bigip = _SeededManagementRoot(self)
+        return self._bigip
+
+    def probe(self):
+        '''Issue one authenticated GET to verify reachability and credentials.
+
+        :returns: string TMOS version of the device
+        :raises: requests.RequestException
+        '''
+
+        response = self.icr_session.get(
+            self.base_uri + 'tm/sys/version', timeout=self.timeout
+        )
+        self.tmos_version = _parse_tmos_version(response.json())
+        if self.shared_cache is not None:
+            self.shared_cache.set_version(self.hostname, self.tmos_version)
+        return self.tmos_version
+
+    def get_capabilities(self, ttl=DEFAULT_CAPABILITIES_TTL):
+        '''Return the device capabilities, discovering them when stale.
+
+        Discovery costs one GET of the provisioned modules (plus a probe if
+        the version is not yet known) and is shared by every resource using
+        this connection until the ttl runs out.
+
+        :param ttl: seconds a discovery remains valid
+        :returns: DeviceCapabilities
+        :raises: requests.RequestException
+        '''
+
+        with self._lock:
+            if self._capabilities is None or self._capabilities.expired(ttl):
+                if self.tmos_version is None:
+                    self.probe()
+                response = self.icr_session.get(
+                    self.base_uri + 'tm/sys/provision', timeout=self.timeout
+                )
+                self._capabilities = DeviceCapabilities.from_provision(
+                    self.tmos_version, response.json()
+                )
+                if self.shared_cache is not None:
+                    self.shared_cache.set_capabilities(
+                        self.hostname, self._capabilities
+                    )
+        return self._capabilities
+
+
+def _connection_key(hostname, username):
+    return (hostname, username)
+
+
+def seed_connection(connection):
+    '''Place a connection in the shared cache, replacing any previous one.'''
+
+    key = _connection_key(connection.hostname, connection.username)
+    with _CONNECTIONS_LOCK:
+        _CONNECTIONS[key] = connection
+
+
+def get_connection(hostname, username, password, **kwargs):
+    '''Return the shared connection for a device, creating it if necessary.
+
+    A cached connection is only reused when its password still matches, so a
+    credential change in the template takes effect on the next handler.
+
+    :param kwargs: connect_timeout, read_timeout, max_concurrency,
+                   token_auth and endpoints for a new connection
+    :returns: BigIPConnection
+    '''
+
+    key = _connection_key(hostname, username)
+    with _CONNECTIONS_LOCK:
+        connection = _CONNECTIONS.get(key)
+        if connection is None or connection.password != password:
+            connection = BigIPConnection(
+                hostname, username, password, **kwargs
+            )
+            _CONNECTIONS[key] = connection
+    return connection
+
+
+def probe_connection(hostname, username, password, **kwargs):
+    '''Probe a device and seed the shared cache with the resulting session.
+
+    :param kwargs: connect_timeout, read_timeout, max_concurrency,
+                   token_auth and endpoints
+    :returns: BigIPConnection
+    :raises: requests.RequestException
+    '''
+
+    connection = BigIPConnection(hostname, username, password, **kwargs)
+    connection.probe()
+    seed_connection(connection)
+    return connection
+
+
+def clear_connections():
+    '''Drop every cached connection and what is known of every device.
+
+    Also closes the cassette, if one is being recorded.
+    '''
+
+    with _CONNECTIONS_LOCK:
+        _CONNECTIONS.clear()
+    clear_breakers()
+    clear_controllers()
+    clear_limiters()
+    clear_schedulers()
+    clear_cassettes()
@@ -0,0 +1,134 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Which unit of a BIG-IP® HA pair is active.
+
+Changes made on a standby unit have to be synced back to the active one.
+:class:`ActiveUnitTracker` asks every unit for its failover status at once
+and remembers the active unit for a short time, so every resource using
+the pair sends its changes to the active unit and follows it after a
+failover.
+'''
+
+import threading
+import time
+
+from oslo_log import log as logging
+
+from circuit_breaker import CLOSED
+from concurrency import DeviceExecutor
+import metrics
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_FAILOVER_TTL = 5
+
+ACTIVE = 'ACTIVE'
+
+_TRACKERS = {}
+_TRACKERS_LOCK = threading.Lock()
+
+
+def failover_status(connection):
+    '''Return the failover status of a unit, such as 'ACTIVE', or None.'''
+
+    try:
+        response = connection.icr_session.get(
+            connection.base_uri + 'tm/cm/failover-status',
+            timeout=connection.timeout
+        )
+        for entry in response.json()['entries'].values():
+            stats = entry['nestedStats']['entries']
+            return stats['status']['description'].upper()
+    except Exception as ex:
+        LOG.debug('Failover status of BIG-IP %(device)s unknown: %(error)s',
+                  {'device': connection.hostname, 'error': ex})
+    return None
+
+
+class ActiveUnitTracker(object):
+    '''Remembers the active unit of one HA pair.'''
+
+    def __init__(self, name):
+        self.name = name
+        self.active = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def _fresh(self, connections, ttl):
+        current = connections.get(self.active)
+        return (
+            current is not None and
+            current.breaker.state == CLOSED and
+            time.time() - self._checked_at < ttl
+        )
+
+    def active_connection(self, connections, ttl=DEFAULT_FAILOVER_TTL):
+        '''Return the connection to the active unit.
+
+        The failover status of every unit is checked once the last check is
+        older than ttl, or sooner if the active unit stops answering. When
+        no unit reports itself active, the last known active unit is used,
+        or else the first unit.
+
+        :param connections: list of BigIPConnection, one per unit
+        :param ttl: seconds a check remains valid
+        :returns: BigIPConnection
+        '''
+
+        by_hostname = dict(
+            (connection.hostname, connection) for connection in connections
+        )
+        with self._lock:
+            if not self._fresh(by_hostname, ttl):
+                self._check(connections)
+            return by_hostname.get(self.active, connections[0])
+
+    def _check(self, connections):
+        # Called with the lock held.
+        statuses = DeviceExecutor().map(failover_status, connections)
+        self._checked_at = time.time()
+        for connection, status in zip(connections, statuses):
+            if status == ACTIVE:
+                if self.active != connection.hostname:
+                    if self.active is not None:
+                        metrics.increment(
+                            'f5_device_pair_failovers_total', pair=self.name
+                        )
+                    LOG.info(
+                        'Active unit of BIG-IP pair %(pair)s is %(device)s',
+                        {'pair': self.name, 'device': connection.hostname}
+                    )
+                    self.active = connection.hostname
+                return
+
+
+def get_tracker(hostnames):
+    '''Return the process-wide tracker for the pair of the given units.'''
+
+    key = tuple(sorted(hostnames))
+    with _TRACKERS_LOCK:
+        tracker = _TRACKERS.get(key)
+        if tracker is None:
+            tracker = _TRACKERS[key] = ActiveUnitTracker('/'.join(key))
+    return tracker
+
+
+def clear_trackers():
+    with _TRACKERS_LOCK:
+        _TRACKERS.clear()
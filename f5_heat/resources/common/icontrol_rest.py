@@ -0,0 +1,124 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Raw iControl® REST requests for the plugins' hot operations.
+
+The f5-sdk builds an object graph for every resource it touches and wraps
+deletes in an exists/load/delete sequence. The client here sends only the
+JSON body of a create, or a single DELETE, on the pooled session of a shared
+BIG-IP® connection.
+'''
+
+from requests import HTTPError
+
+from concurrency import json_dumps
+from concurrency import YIELD_INTERVAL
+
+
+# Part of the error BIG-IP® sometimes answers a successful iApp® service
+# create with.
+SERVICE_NOT_RETRIEVED = (
+    'The configuration was updated successfully but could not be retrieved'
+)
+
+
+class iControlRESTClient(object):
+    '''Create and delete BIG-IP® objects without the f5-sdk object model.'''
+
+    def __init__(self, connection):
+        self.session = connection.icr_session
+        self.tm_uri = connection.base_uri + 'tm/'
+
+    def _uri(self, collection, partition=None, name=None, suffix=''):
+        uri = self.tm_uri + collection
+        if name is not None:
+            uri += '/~{0}~{1}'.format(partition, name)
+        return uri + suffix
+
+    def _post(self, uri, body, large=False):
+        return self.session.post(uri, data=json_dumps(body, large)).json()
+
+    def _delete(self, uri):
+        '''Delete the object at uri.
+
+        :returns: False if the object did not exist, otherwise True
+        :raises: HTTPError for any failure other than a 404
+        '''
+
+        try:
+            self.session.delete(uri)
+        except HTTPError as ex:
+            if ex.response is not None and ex.response.status_code == 404:
+                return False
+            raise
+        return True
+
+    def create_pool(self, **body):
+        '''Create a pool, including any members listed in the body.'''
+
+        large = len(body.get('members') or ()) > YIELD_INTERVAL
+        return self._post(self._uri('ltm/pool'), body, large)
+
+    def delete_pool(self, name, partition):
+        return self._delete(self._uri('ltm/pool', partition, name))
+
+    def create_member(self, pool, **body):
+        uri = self._uri('ltm/pool', body['partition'], pool, '/members')
+        return self._post(uri, body)
+
+    def create_virtual(self, **body):
+        return self._post(self._uri('ltm/virtual'), body)
+
+    def delete_virtual(self, name, partition):
+        return self._delete(self._uri('ltm/virtual', partition, name))
+
+    def create_template(self, **body):
+        return self._post(self._uri('sys/application/template'), body)
+
+    def delete_template(self, name, partition):
+        return self._delete(
+            self._uri('sys/application/template', partition, name)
+        )
+
+    def create_service(self, **body):
+        '''Create an iApp® service.
+
+        When the device reports that it created the service but could not
+        retrieve it, the service is loaded instead, as the f5-sdk does.
+
+        :raises: HTTPError for any other failure
+        '''
+
+        try:
+            return self._post(self._uri('sys/application/service'), body)
+        except HTTPError as ex:
+            if ex.response is None or \
+                    SERVICE_NOT_RETRIEVED not in ex.response.text:
+                raise
+        app_name = '{0}.app~{0}'.format(body['name'])
+        return self.session.get(self._uri(
+            'sys/application/service', body.get('partition', 'Common'),
+            app_name
+        )).json()
+
+    def delete_service(self, name, partition):
+        '''Delete an iApp® service from its own <name>.app folder.'''
+
+        app_name = '{0}.app~{0}'.format(name)
+        return self._delete(
+            self._uri('sys/application/service', partition, app_name)
+        )
@@ -0,0 +1,230 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Where the time and the requests of resource handlers go.
+
+When ``[f5_heat] metrics_enabled`` is set, every handler is timed into a
+latency histogram, and every request sent to a device is counted against
+the resource type and handler that sent it (see
+:mod:`~request_context`), by method and endpoint, with the bytes it
+transferred. Logins and retries are counted the same way. When it is not
+set, each hook costs one option lookup.
+
+The metrics are exported every ``metrics_interval`` seconds, when a
+handler completes, to a Prometheus text file at ``metrics_file`` and as
+an ``f5_heat.metrics`` oslo notification when ``metrics_notifications``
+is set. Every heat-engine worker process keeps metrics of its own, so
+``metrics_file`` may contain ``{pid}`` to give each its own file.
+'''
+
+import contextlib
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from oslo_log import log as logging
+from six.moves.urllib import parse as urlparse
+
+from config import CONF
+from config import GROUP
+import metrics
+import request_context
+
+
+LOG = logging.getLogger(__name__)
+
+HANDLER_DURATION = 'f5_handler_duration_seconds'
+HANDLER_REQUESTS = 'f5_handler_requests_total'
+HANDLER_BYTES = 'f5_handler_bytes_total'
+HANDLER_LOGINS = 'f5_handler_logins_total'
+HANDLER_RETRIES = 'f5_handler_retries_total'
+
+LOGIN_ENDPOINT = '/mgmt/shared/authn/login'
+
+NOTIFICATION_EVENT = 'f5_heat.metrics'
+
+_EXPORT_LOCK = threading.Lock()
+_LAST_EXPORT = {'at': None}
+
+
+def enabled():
+    '''Whether handlers and requests are being measured.'''
+
+    return CONF[GROUP].metrics_enabled
+
+
+def endpoint(url):
+    '''The endpoint of a request, without the names of objects in its path.
+
+    For example, /mgmt/tm/ltm/pool/~Common~web/members/~Common~10.0.0.1:80
+    is endpoint /mgmt/tm/ltm/pool/{name}/members/{name}, so each endpoint
+    is counted once rather than once per object.
+    '''
+
+    segments = urlparse.urlsplit(url).path.split('/')
+    for i, segment in enumerate(segments):
+        if segment.startswith('~'):
+            segments[i] = '{name}'
+        elif segment.isdigit():
+            segments[i] = '{id}'
+        elif i and segments[i - 1] == 'tokens':
+            segments[i] = '{token}'
+    return '/'.join(segments)
+
+
+def _attribution():
+    context = request_context.current()
+    if context is None:
+        return {'resource_type': '', 'handler': ''}
+    return {
+        'resource_type': context.resource_type or '',
+        'handler': context.handler or ''
+    }
+
+
+@contextlib.contextmanager
+def timed_handler(resource_type, handler):
+    '''Time the body of a with block as a run of a resource handler.'''
+
+    if not enabled():
+        yield
+        return
+
+    started = time.time()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'success'
+    finally:
+        metrics.observe_histogram(
+            HANDLER_DURATION, time.time() - started,
+            resource_type=resource_type, handler=handler, outcome=outcome
+        )
+        export_due()
+
+
+def record_request(request, response=None, stream=False):
+    '''Count one request sent to a device, and what it transferred.
+
+    :param response: the response, or None if the request failed
+    :param stream: whether the response body is left to be streamed, in
+                   which case only its declared length is counted
+    '''
+
+    labels = _attribution()
+    path = endpoint(request.url)
+    metrics.increment(HANDLER_REQUESTS, method=request.method,
+                      endpoint=path, **labels)
+    sent = len(request.body or '')
+    received = 0
+    if response is not None:
+        if stream:
+            length = response.headers.get('Content-Length', '')
+            received = int(length) if length.isdigit() else 0
+        else:
+            received = len(response.content or '')
+    metrics.increment(HANDLER_BYTES, sent, direction='sent', **labels)
+    metrics.increment(HANDLER_BYTES, received, direction='received',
+                      **labels)
+    if path == LOGIN_ENDPOINT:
+        metrics.increment(HANDLER_LOGINS, **labels)
+
+
+def record_retry(reason):
+    '''Count one retry of a request to a device.'''
+
+    if enabled():
+        metrics.increment(HANDLER_RETRIES, reason=reason, **_attribution())
+
+
+def _payload(snapshot):
+    def series(name, labels, **values):
+        values.update(name=name, labels=dict(labels))
+        return values
+
+    payload = []
+    for (name, labels), value in sorted(snapshot['counters'].items()):
+        payload.append(series(name, labels, type='counter', value=value))
+    for (name, labels), value in sorted(snapshot['gauges'].items()):
+        payload.append(series(name, labels, type='gauge', value=value))
+    for (name, labels), (count, total, peak) in \
+            sorted(snapshot['summaries'].items()):
+        payload.append(series(name, labels, type='summary', count=count,
+                              sum=total, max=peak))
+    for (name, labels), (bounds, counts, count, total) in \
+            sorted(snapshot['histograms'].items()):
+        payload.append(series(name, labels, type='histogram',
+                              buckets=list(zip(bounds, counts)),
+                              count=count, sum=total))
+    return payload
+
+
+def _write_textfile(path, text):
+    # Written aside and renamed over the file, so a collector never reads
+    # a partial file.
+    directory = os.path.dirname(path) or '.'
+    descriptor, written = tempfile.mkstemp(dir=directory,
+                                           prefix='.f5_heat_metrics')
+    with os.fdopen(descriptor, 'wb') as textfile:
+        textfile.write(text.encode('utf-8'))
+    os.chmod(written, 0o644)
+    os.rename(written, path)
+
+
+def _notify(payload):
+    from heat.common import context
+    from heat.common import messaging
+
+    if messaging.NOTIFIER is None:
+        return
+    notifier = messaging.get_notifier(
+        'f5_heat.{0}'.format(socket.gethostname())
+    )
+    notifier.info(context.get_admin_context(), NOTIFICATION_EVENT, {
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+        'metrics': payload
+    })
+
+
+def export():
+    '''Write the metrics to the file and notification configured.'''
+
+    options = CONF[GROUP]
+    snapshot = metrics.REGISTRY.snapshot()
+    try:
+        if options.metrics_file:
+            _write_textfile(options.metrics_file.format(pid=os.getpid()),
+                            metrics.prometheus_text(snapshot))
+        if options.metrics_notifications:
+            _notify(_payload(snapshot))
+    except Exception:
+        LOG.exception('Could not export the F5 plugin metrics.')
+
+
+def export_due():
+    '''Export the metrics if metrics_interval has passed since the last.'''
+
+    now = time.time()
+    with _EXPORT_LOCK:
+        last = _LAST_EXPORT['at']
+        if last is not None and now - last < CONF[GROUP].metrics_interval:
+            return
+        _LAST_EXPORT['at'] = now
+    export()
@@ -0,0 +1,139 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Reader-writer locks on BIG-IP® devices shared by heat-engine processes.
+
+When the ``[f5_heat] lock_path`` option is set, every handler holds a lock
+file for its device, and one for its partition if it has one, in that
+directory. Handlers that change the device take their innermost lock
+exclusively and any outer lock shared, so changes to one partition are
+serialized across every engine process on the host while changes to other
+partitions, and all reads, proceed in parallel. Device-wide changes, such as
+saving the configuration, exclude everything else on the device.
+
+The locks are flock(2) locks polled without blocking, so a greenthread
+waiting for one lets the rest of its engine process run.
+'''
+
+import contextlib
+import errno
+import fcntl
+import os
+import re
+import time
+
+import eventlet
+from eventlet import corolocal
+from oslo_log import log as logging
+
+from config import CONF
+from config import GROUP
+import metrics
+import tracing
+
+
+LOG = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.01
+MAX_POLL_INTERVAL = 0.2
+
+# Lock files held by the current greenthread, so nested handlers reuse them.
+_HELD = corolocal.local()
+
+
+def _lock_file(lock_path, *names):
+    name = '-'.join(re.sub(r'[^\w.-]', '_', str(part)) for part in names)
+    return os.path.join(lock_path, 'f5-heat-{0}.lock'.format(name))
+
+
+def flock(fd, operation):
+    '''Take a flock(2) lock without blocking the hub.
+
+    The lock is polled, sleeping between attempts, so other greenthreads
+    run while another process holds it.
+
+    :param fd: file descriptor, or object with a fileno method, to lock
+    :param operation: fcntl.LOCK_EX or fcntl.LOCK_SH
+    '''
+
+    interval = POLL_INTERVAL
+    while True:
+        try:
+            fcntl.flock(fd, operation | fcntl.LOCK_NB)
+            return
+        except IOError as ex:
+            if ex.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+        eventlet.sleep(interval)
+        interval = min(MAX_POLL_INTERVAL, interval * 2)
+
+
+@contextlib.contextmanager
+def _flock(device, path, exclusive):
+    held = _HELD.__dict__.setdefault('paths', set())
+    if path in held:
+        yield
+        return
+
+    with open(path, 'a') as lock_file:
+        started = time.time()
+        with tracing.span('device_lock_wait', path=path,
+                          mode='exclusive' if exclusive else 'shared'):
+            flock(lock_file.fileno(),
+                  fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        waited = time.time() - started
+        metrics.observe(
+            'f5_device_lock_wait_seconds',
+            waited,
+            device=device,
+            mode='exclusive' if exclusive else 'shared'
+        )
+        LOG.debug('Waited %(waited).3fs for lock %(path)s',
+                  {'waited': waited, 'path': path})
+        held.add(path)
+        try:
+            yield
+        finally:
+            held.discard(path)
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def device_lock(device, partition=None, exclusive=False):
+    '''Hold the lock on a device, or on a partition of a device.
+
+    Does nothing unless the lock_path option is set. A greenthread that
+    already holds a lock reuses it, so handlers may call one another.
+
+    :param device: hostname of the BIG-IP® device
+    :param partition: partition name, or None to lock the whole device
+    :param exclusive: whether the holder changes what it locks
+    '''
+
+    lock_path = CONF[GROUP].lock_path
+    if not lock_path:
+        yield
+        return
+
+    device_path = _lock_file(lock_path, device)
+    with _flock(device, device_path, exclusive and partition is None):
+        if partition is None:
+            yield
+        else:
+            partition_path = _lock_file(lock_path, device, partition)
+            with _flock(device, partition_path, exclusive):
+                yield
@@ -0,0 +1,324 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Which resource types and handlers the memory of heat-engine is held by.
+
+When ``[f5_heat] memory_snapshot_dir`` is set, allocations are traced with
+tracemalloc from the first handler run on, and every
+``memory_snapshot_interval`` seconds, as a handler completes, a snapshot
+of the memory still allocated is written to that directory. Each snapshot
+is written twice: in tracemalloc's own format, for
+``tracemalloc.Snapshot.load``, and as a JSON summary of the memory held by
+each resource type and method, such as the parsed template of an
+F5::Sys::iAppFullTemplate kept from its handle_create.
+
+An allocation is attributed to the innermost method of a resource class
+on its traceback, or when there is none, to the innermost plugin module,
+or failing that to the package that allocated it. Tracebacks are kept
+``memory_snapshot_frames`` deep, and allocations made deeper than that
+below a handler, or in a native thread by :func:`~concurrency.offload`,
+are attributed to the package that made them.
+
+Snapshots are taken and attributed in a native thread, off the hub.
+
+tracemalloc needs Python 3.4 or later. On earlier versions, including
+the Python 2.7 heat-engine usually runs on, no snapshots are taken:
+setting memory_snapshot_dir only logs a warning.
+'''
+
+import collections
+import contextlib
+import dis
+import json
+import os
+import pkgutil
+import sys
+import threading
+import time
+
+from oslo_log import log as logging
+
+import concurrency
+from config import CONF
+from config import GROUP
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+LOG = logging.getLogger(__name__)
+
+# Where an allocation was made, when it is not in a resource class.
+OTHER = ''
+
+Usage = collections.namedtuple('Usage', ['size', 'count'])
+
+_LOCK = threading.Lock()
+_STATE = {'ranges': None, 'last': None, 'warned': False, 'taken': 0}
+_MODULES = {}
+
+# The directory of the resource modules, which holds this package.
+_PLUGIN_DIR = os.path.dirname(
+    os.path.dirname(os.path.realpath(__file__))
+)
+
+
+def available():
+    '''Whether this Python can trace allocations.'''
+
+    return tracemalloc is not None
+
+
+def enabled():
+    '''Whether memory snapshots are configured and can be taken.'''
+
+    if not CONF[GROUP].memory_snapshot_dir:
+        return False
+    if tracemalloc is None:
+        if not _STATE['warned']:
+            _STATE['warned'] = True
+            LOG.warning('memory_snapshot_dir is set, but this Python has '
+                        'no tracemalloc; no snapshots are taken.')
+        return False
+    return True
+
+
+def start(frames=None):
+    '''Start tracing allocations, if they are not already traced.'''
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames or CONF[GROUP].memory_snapshot_frames)
+
+
+def _lines(code):
+    lines = [line for _, line in dis.findlinestarts(code)]
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            lines.extend(_lines(const))
+    return lines
+
+
+def _methods(module, resource_types):
+    # The lines of each method of the resource classes defined in module,
+    # read from the code objects of its source, since the methods of the
+    # classes themselves may be wrapped by a handler decorator.
+    path = os.path.splitext(module.__file__)[0] + '.py'
+    with open(path) as source:
+        code = compile(source.read(), path, 'exec')
+    ranges = []
+    for body in code.co_consts:
+        resource_type = resource_types.get(getattr(body, 'co_name', None))
+        if resource_type is None:
+            continue
+        for method in body.co_consts:
+            if hasattr(method, 'co_code'):
+                lines = _lines(method)
+                ranges.append((min(lines + [method.co_firstlineno]),
+                               max(lines), resource_type, method.co_name))
+    return os.path.realpath(path), ranges
+
+
+def _resource_methods():
+    from f5_heat import resources
+
+    methods = {}
+    for _, name, _ in pkgutil.iter_modules(resources.__path__):
+        module = __import__('f5_heat.resources.' + name, fromlist=[name])
+        mapping = getattr(module, 'resource_mapping', None)
+        if mapping is None:
+            continue
+        resource_types = dict(
+            (cls.__name__, resource_type)
+            for resource_type, cls in mapping().items()
+            if cls.__module__ == module.__name__
+        )
+        path, ranges = _methods(module, resource_types)
+        methods[path] = ranges
+    return methods
+
+
+def _ranges():
+    # Read in a native thread, which must not wait for a green lock; two
+    # threads reading them at once find the same ranges.
+    if _STATE['ranges'] is None:
+        _STATE['ranges'] = _resource_methods()
+    return _STATE['ranges']
+
+
+def _module(filename):
+    # The real path of filename, the dotted name of its module and whether
+    # it is a module of the plugins. Plugin modules are named from the
+    # plugin directory, which heat-engine loads them from; others from the
+    # longest entry of sys.path they are under. A snapshot holds the same
+    # few files in many tracebacks, so each is looked up once.
+    found = _MODULES.get(filename)
+    if found is not None:
+        return found
+
+    path = os.path.realpath(filename)
+    if path.startswith(_PLUGIN_DIR + os.sep):
+        roots, plugin = [_PLUGIN_DIR], True
+    else:
+        roots = sorted(
+            (os.path.realpath(entry) for entry in sys.path if entry),
+            key=len, reverse=True
+        )
+        plugin = False
+    module = os.path.splitext(os.path.basename(path))[0]
+    for root in roots:
+        if path.startswith(root + os.sep):
+            module = os.path.splitext(path[len(root) + 1:])[0].replace(
+                os.sep, '.'
+            )
+            break
+    found = _MODULES[filename] = (path, module, plugin)
+    return found
+
+
+def owner(frames, ranges=None):
+    '''The resource type and method that made an allocation.
+
+    :param frames: the frames of its traceback, innermost first, each with
+                   a filename and lineno
+    :returns: (resource type, method), or (OTHER, plugin module) or
+              (OTHER, package)
+    '''
+
+    ranges = _ranges() if ranges is None else ranges
+    plugin = None
+    for frame in frames:
+        path, module, in_plugin = _module(frame.filename)
+        for first, last, resource_type, method in ranges.get(path, ()):
+            if first <= frame.lineno <= last:
+                return resource_type, method
+        if plugin is None and in_plugin:
+            plugin = module
+    if plugin is not None:
+        return OTHER, plugin
+    if not frames:
+        return OTHER, OTHER
+    return OTHER, _module(frames[0].filename)[1].split('.')[0]
+
+
+def _innermost_first(traceback):
+    # Tracebacks list their most recent frame last from Python 3.7 on.
+    if sys.version_info >= (3, 7):
+        return list(reversed(traceback))
+    return list(traceback)
+
+
+def take():
+    '''Snapshot the memory allocated since tracing started.
+
+    :returns: tracemalloc.Snapshot
+    '''
+
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__)
+    ])
+
+
+def attribute(snapshot):
+    '''The memory of a snapshot held by each resource type and method.
+
+    :returns: dict of owner (see :func:`owner`) to Usage
+    '''
+
+    ranges = _ranges()
+    totals = collections.defaultdict(lambda: [0, 0])
+    for statistic in snapshot.statistics('traceback'):
+        key = owner(_innermost_first(statistic.traceback), ranges)
+        totals[key][0] += statistic.size
+        totals[key][1] += statistic.count
+    return dict((key, Usage(*total)) for key, total in totals.items())
+
+
+def summary(snapshot):
+    '''A snapshot as a document for the JSON snapshot file.'''
+
+    current, peak = tracemalloc.get_traced_memory()
+    usage = sorted(attribute(snapshot).items(), key=lambda item: -item[1].size)
+    return collections.OrderedDict([
+        ('time', time.time()),
+        ('pid', os.getpid()),
+        ('traced_bytes', current),
+        ('peak_traced_bytes', peak),
+        ('usage', [collections.OrderedDict([
+            ('resource_type', resource_type),
+            ('method', method),
+            ('size', size),
+            ('count', count)
+        ]) for (resource_type, method), (size, count) in usage])
+    ])
+
+
+def write(directory):
+    '''Snapshot the memory to directory.
+
+    The snapshot is taken, attributed and written in a native thread, so
+    the other greenthreads run meanwhile.
+
+    :returns: path of the JSON summary written
+    '''
+
+    with _LOCK:
+        _STATE['taken'] += 1
+        name = 'f5_heat_memory.{0}.{1}'.format(os.getpid(), _STATE['taken'])
+    return concurrency.offload(_write, os.path.join(directory, name))
+
+
+def _write(base):
+    snapshot = take()
+    snapshot.dump(base + '.tracemalloc')
+    path = base + '.json'
+    with open(path, 'w') as summary_file:
+        json.dump(summary(snapshot), summary_file, indent=2)
+    return path
+
+
+def snapshot_due():
+    '''Snapshot the memory if memory_snapshot_interval has passed.'''
+
+    now = time.time()
+    with _LOCK:
+        last = _STATE['last']
+        if last is not None and \
+                now - last < CONF[GROUP].memory_snapshot_interval:
+            return
+        _STATE['last'] = now
+    try:
+        LOG.info('Wrote a memory snapshot to %s',
+                 write(CONF[GROUP].memory_snapshot_dir))
+    except Exception:
+        LOG.exception('Could not write a memory snapshot.')
+
+
+@contextlib.contextmanager
+def watched():
+    '''Trace allocations in a with block, snapshotting them when due.'''
+
+    if not enabled():
+        yield
+        return
+
+    start()
+    try:
+        yield
+    finally:
+        snapshot_due()
@@ -0,0 +1,175 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Process-wide counters, gauges and summaries for the F5® plugins.
+
+Each metric is identified by a name and a set of labels, for example
+``increment('f5_device_requests_total', device='10.0.0.1')``.
+:func:`prometheus_text` renders them in the Prometheus text format.
+'''
+
+import threading
+
+import six
+
+
+# Upper bounds, in seconds, of the buckets of a latency histogram.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0)
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+class Registry(object):
+    '''Holds the current value of every metric.'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._gauges = {}
+            self._summaries = {}
+            self._histograms = {}
+
+    def increment(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        '''Record one observation of a summary (count, sum and max).'''
+
+        key = _key(name, labels)
+        with self._lock:
+            count, total, peak = self._summaries.get(key, (0, 0, value))
+            self._summaries[key] = (count + 1, total + value, max(peak, value))
+
+    def observe_histogram(self, name, value, buckets=DEFAULT_BUCKETS,
+                          **labels):
+        '''Record one observation of a histogram.
+
+        A histogram is kept as its bucket bounds, the count of observations
+        in each bucket (not cumulative), and their count and sum.
+        '''
+
+        key = _key(name, labels)
+        with self._lock:
+            bounds, counts, count, total = self._histograms.get(
+                key, (buckets, [0] * len(buckets), 0, 0)
+            )
+            counts = list(counts)
+            for i, bound in enumerate(bounds):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._histograms[key] = (bounds, counts, count + 1,
+                                     total + value)
+
+    def snapshot(self):
+        '''Return a copy of every metric, keyed by (name, labels).'''
+
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'summaries': dict(self._summaries),
+                'histograms': dict(self._histograms)
+            }
+
+
+REGISTRY = Registry()
+
+increment = REGISTRY.increment
+set_gauge = REGISTRY.set_gauge
+observe = REGISTRY.observe
+observe_histogram = REGISTRY.observe_histogram
+
+
+def _escape(value):
+    return six.text_type(value).replace('\\', '\\\\').replace(
+        '"', '\\"'
+    ).replace('\n', '\\n')
+
+
+def _series(name, labels, value, extra=()):
+    pairs = list(labels) + list(extra)
+    if pairs:
+        name += '{' + ','.join(
+            u'{0}="{1}"'.format(label, _escape(label_value))
+            for label, label_value in pairs
+        ) + '}'
+    return u'{0} {1}'.format(name, repr(float(value)))
+
+
+def prometheus_text(snapshot=None):
+    '''Render metrics in the Prometheus text exposition format.
+
+    Summaries become a _count and a _sum series and a separate _max gauge.
+
+    :param snapshot: as returned by Registry.snapshot, by default that of
+                     the process-wide registry
+    :returns: text, to be encoded as UTF-8
+    '''
+
+    if snapshot is None:
+        snapshot = REGISTRY.snapshot()
+    families = {}
+
+    def family(name, kind):
+        return families.setdefault(name, (kind, []))[1]
+
+    for (name, labels), value in sorted(snapshot['counters'].items()):
+        family(name, 'counter').append(_series(name, labels, value))
+    for (name, labels), value in sorted(snapshot['gauges'].items()):
+        family(name, 'gauge').append(_series(name, labels, value))
+    for (name, labels), (count, total, peak) in \
+            sorted(snapshot['summaries'].items()):
+        family(name, 'summary').extend([
+            _series(name + '_count', labels, count),
+            _series(name + '_sum', labels, total)
+        ])
+        family(name + '_max', 'gauge').append(
+            _series(name + '_max', labels, peak)
+        )
+    for (name, labels), (bounds, counts, count, total) in \
+            sorted(snapshot.get('histograms', {}).items()):
+        series = family(name, 'histogram')
+        cumulative = 0
+        for bound, bucket in zip(bounds, counts):
+            cumulative += bucket
+            series.append(_series(name + '_bucket', labels, cumulative,
+                                  [('le', repr(float(bound)))]))
+        series.extend([
+            _series(name + '_bucket', labels, count, [('le', '+Inf')]),
+            _series(name + '_count', labels, count),
+            _series(name + '_sum', labels, total)
+        ])
+    lines = []
+    for name in sorted(families):
+        kind, series = families[name]
+        lines.append('# TYPE {0} {1}'.format(name, kind))
+        lines.extend(series)
+    return '\n'.join(lines) + '\n' if lines else ''
@@ -15,30 +15,243 @@
 # limitations under the License.
 #
 
+import contextlib
+import functools
+import random
+
+import eventlet
+from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectTimeout
+from requests.exceptions import Timeout
+from requests.packages.urllib3.exceptions import NewConnectionError
+
+from circuit_breaker import CircuitOpenError
+import instrumentation
+import locks
+import memory
+import metrics
+import prewarm
+import profiling
+import request_context
+import tracing
+
+
+DEFAULT_RETRY_ATTEMPTS = 4
+DEFAULT_RETRY_BASE_DELAY = 0.5
+DEFAULT_RETRY_MAX_DELAY = 8.0
+
+# Responses that mean the device did not act on the request.
+RETRY_ANY_STATUS_CODES = frozenset([429, 503])
+# Responses that leave it unknown whether the device acted on the request.
+RETRY_IDEMPOTENT_STATUS_CODES = frozenset([502, 504])
+
+
+def _mutates(func):
+    '''Whether a handler changes the device, judged by its name.'''
+
+    return func.__name__.startswith('handle_')
+
+
+@contextlib.contextmanager
+def _handling(resource, handler):
+    '''Attribute, time, trace and profile a with block as a handler.'''
+
+    context = request_context.for_resource(resource, handler)
+    with request_context.bind(context), instrumentation.timed_handler(
+            context.resource_type, context.handler), \
+            tracing.handler_span(resource, handler), \
+            profiling.profiled(resource, handler), memory.watched():
+        yield
+
+
+def f5_handler(func):
+    '''Attribute and time a handler of a resource with no bigip_server.'''
+
+    @functools.wraps(func)
+    def func_wrapper(self, *args, **kwargs):
+        with _handling(self, func.__name__):
+            return func(self, *args, **kwargs)
+    return func_wrapper
+
 
 def f5_common_resources(func):
+    @functools.wraps(func)
     def func_wrapper(self, *args, **kwargs):
-        self.get_bigip()
-        self.set_partition_name()
-        return func(self, *args, **kwargs)
+        with _handling(self, func.__name__):
+            with tracing.span('prewarm_stack'):
+                prewarm.prewarm_stack(self.stack)
+            with tracing.span('get_bigip'):
+                self.get_bigip()
+            with tracing.span('set_partition_name'):
+                self.set_partition_name()
+            with locks.device_lock(self.connection.hostname,
+                                   self.partition_name,
+                                   exclusive=_mutates(func)):
+                result = func(self, *args, **kwargs)
+            if _mutates(func):
+                with tracing.span('sync_changes'):
+                    self.sync_changes()
+            return result
     return func_wrapper
 
 
 def f5_bigip(func):
+    @functools.wraps(func)
     def func_wrapper(self, *args, **kwargs):
-        self.get_bigip()
-        return func(self, *args, **kwargs)
+        with _handling(self, func.__name__):
+            with tracing.span('prewarm_stack'):
+                prewarm.prewarm_stack(self.stack)
+            with tracing.span('get_bigip'):
+                self.get_bigip()
+            with locks.device_lock(self.connection.hostname,
+                                   exclusive=_mutates(func)):
+                result = func(self, *args, **kwargs)
+            if _mutates(func):
+                with tracing.span('sync_changes'):
+                    self.sync_changes()
+            return result
     return func_wrapper
 
 
+def _connect_failed(ex):
+    '''Whether a request failed before it reached the device.'''
+
+    if isinstance(ex, ConnectTimeout):
+        return True
+    reason = getattr(ex.args[0], 'reason', None) if ex.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class RetryPolicy(object):
+    '''Retries transient failures of a device request.
+
+    Idempotent requests are retried on any transient failure: a 429, 502,
+    503 or 504 response, a connection error or a timeout. Other requests
+    are retried only when the device cannot have acted on them, which is
+    after a 429 or 503 response or when the connection could not be made.
+    Requests refused by an open circuit breaker, client errors and every
+    other exception are not retried.
+
+    Delays grow exponentially from base_delay up to max_delay, with full
+    jitter so that requests failed by the same event do not retry in
+    lockstep.
+    '''
+
+    def __init__(self, attempts=DEFAULT_RETRY_ATTEMPTS,
+                 base_delay=DEFAULT_RETRY_BASE_DELAY,
+                 max_delay=DEFAULT_RETRY_MAX_DELAY):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def classify_response(self, response, idempotent):
+        '''Return why a response should be retried, or None.'''
+
+        if response.status_code in RETRY_ANY_STATUS_CODES:
+            return 'status'
+        if idempotent and \
+                response.status_code in RETRY_IDEMPOTENT_STATUS_CODES:
+            return 'status'
+        return None
+
+    def classify_error(self, ex, idempotent):
+        '''Return why a failed request should be retried, or None.'''
+
+        if isinstance(ex, CircuitOpenError):
+            return None
+        if isinstance(ex, (ConnectionError, Timeout)):
+            if _connect_failed(ex):
+                return 'connect'
+            if idempotent:
+                return 'timeout' if isinstance(ex, Timeout) else 'connection'
+        return None
+
+    def delay(self, attempt, retry_after=None):
+        '''Seconds to wait after a given failed attempt, counting from 1.'''
+
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, min(self.max_delay, retry_after))
+        return delay
+
+    def call(self, send, idempotent, **labels):
+        '''Call send until it succeeds or fails for good.
+
+        :param send: function making one attempt and returning a response
+        :param idempotent: whether the request may be repeated safely
+        :param labels: labels of the retry counter
+        :returns: the final response
+        '''
+
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            try:
+                response = send()
+            except Exception as ex:
+                reason = self.classify_error(ex, idempotent)
+                if reason is None or attempt >= self.attempts:
+                    raise
+            else:
+                reason = self.classify_response(response, idempotent)
+                if reason is None or attempt >= self.attempts:
+                    return response
+                header = response.headers.get('Retry-After', '')
+                if header.isdigit():
+                    retry_after = int(header)
+                response.close()
+            metrics.increment('f5_device_retries_total', reason=reason,
+                              **labels)
+            instrumentation.record_retry(reason)
+            eventlet.sleep(self.delay(attempt, retry_after))
+
+
 class F5BigIPMixin(object):
     '''This class is to be subclassed by an F5® Heat Resource Plugin.'''
 
     def get_bigip(self):
-        '''Retrieve the BIG-IP® connection from the F5::BigIP resource.'''
+        '''Retrieve the BIG-IP® connection from the F5::BigIP resource.
+
+        Also sets device, the resource referenced by bigip_server; connection,
+        the shared session bulk operations use to bound their concurrency;
+        and rest_client, which is None unless the device enables the raw
+        iControl REST fast path. All three are resolved together, so a
+        cluster picks the device to write to once per handler.
+        '''
 
         refid = self.properties[self.BIGIP_SERVER]
-        self.bigip = self.stack.resource_by_refid(refid).get_bigip()
+        device = self.stack.resource_by_refid(refid)
+        self.device = device
+        session = device.get_session()
+        self.connection = session.connection
+        self.bigip = session.bigip
+        self.rest_client = session.rest_client
+
+    def get_capabilities(self):
+        '''Retrieve the cached capabilities of the F5::BigIP device.
+
+        Capabilities are discovered once per device and shared, so consulting
+        them does not cost a request to the device.
+
+        :returns: DeviceCapabilities
+        '''
+
+        refid = self.properties[self.BIGIP_SERVER]
+        return self.stack.resource_by_refid(refid).get_capabilities()
+
+    def sync_changes(self):
+        '''Sync changes to every device when bigip_server is a cluster.
+
+        Called after each handler that changes the device. The sync starts
+        from the device the handler wrote to, even if the cluster has
+        since chosen another. A single device needs no sync.
+        '''
+
+        request_sync = getattr(self.device, 'request_sync', None)
+        if request_sync is not None:
+            request_sync(self.connection)
 
     def set_partition_name(self):
         '''Return the partition name from the F5::Sys::Partition resource.
@@ -0,0 +1,107 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Warm the BIG-IP® sessions of a stack before its resources need them.
+
+The first handler of a stack operation to reach the plugins starts a
+background greenthread that connects to every device of the stack at once,
+logging in and discovering the TMOS version of each. The resources that
+follow, often started together by heat-engine, find hot connections instead
+of all paying for the same cold start.
+
+Each stack operation is warmed once; handlers that arrive while it is in
+progress do not start another.
+'''
+
+import collections
+import threading
+
+import eventlet
+from oslo_log import log as logging
+
+from concurrency import DeviceExecutor
+import request_context
+
+
+LOG = logging.getLogger(__name__)
+
+DEVICE_TYPES = ('F5::BigIP::Device', 'F5::BigIP::DevicePair')
+
+# Stack operations remembered as warmed, oldest forgotten first.
+MAX_WARMED = 1024
+
+_WARMED = collections.OrderedDict()
+_WARMED_LOCK = threading.Lock()
+
+
+def _operation_key(stack):
+    return (
+        stack.id,
+        stack.action,
+        getattr(stack, 'current_traversal', None),
+        stack.updated_time or stack.created_time
+    )
+
+
+def _devices(stack):
+    # Devices that have not been created yet probe the device themselves.
+    return [
+        resource for resource in stack.values()
+        if resource.type() in DEVICE_TYPES and
+        resource.action != resource.INIT
+    ]
+
+
+def _warm_device(device):
+    try:
+        device.get_bigip()
+    except Exception as ex:
+        LOG.debug('Could not warm BIG-IP %(name)s: %(error)s',
+                  {'name': device.name, 'error': ex})
+
+
+def _warm(context, devices):
+    with request_context.bind(context):
+        DeviceExecutor().map(_warm_device, devices)
+
+
+def prewarm_stack(stack):
+    '''Warm the sessions of a stack's devices, once per stack operation.
+
+    :returns: the warming greenthread, or None if another handler has
+              already started warming this operation
+    '''
+
+    key = _operation_key(stack)
+    with _WARMED_LOCK:
+        if key in _WARMED:
+            return None
+        _WARMED[key] = True
+        while len(_WARMED) > MAX_WARMED:
+            _WARMED.popitem(last=False)
+
+    devices = _devices(stack)
+    if not devices:
+        return None
+    return eventlet.spawn(_warm, request_context.current(), devices)
+
+
+def clear_warmed():
+    '''Forget which stack operations have been warmed.'''
+
+    with _WARMED_LOCK:
+        _WARMED.clear()
@@ -0,0 +1,267 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''CPU profiles of selected resource handlers.
+
+``[f5_heat] profile_handlers`` lists the handlers to profile, as
+``<class>.<handler>`` or ``<resource type>.<handler>`` patterns, such as
+``F5LTMPool.handle_create`` or ``F5::LTM::*.handle_*``. A run of a handler
+it selects is profiled with cProfile, and the profile written in pstats
+format to ``<class>.<handler>.<pid>.<call>.pstats`` in ``profile_dir``.
+With ``profile_every`` N, only the first of every N runs of each handler is
+profiled. When the options are unset, the F5_HEAT_PROFILE_HANDLERS (comma
+separated), F5_HEAT_PROFILE_DIR and F5_HEAT_PROFILE_EVERY environment
+variables of the engine are used instead.
+
+Greenthreads share one profiler hook, so the profiler is only enabled while
+the handler's greenthread, or one it started through a
+:class:`~concurrency.DeviceExecutor`, is running; the other stacks served
+by the engine meanwhile are left out. Only one run is profiled at a time,
+and a sampled run that starts while another is profiled is skipped. The
+cumulative time of a function spanning a switch between greenthreads is
+cut at the switch.
+
+Run this module on pstats files, or directories of them, to list their
+hotspots::
+
+    python -m f5_heat.resources.common.profiling /var/tmp/f5_profiles
+'''
+
+import argparse
+import collections
+import contextlib
+import cProfile
+import fnmatch
+import os
+import pstats
+import sys
+import threading
+
+import greenlet
+from oslo_log import log as logging
+
+from config import CONF
+from config import GROUP
+
+
+LOG = logging.getLogger(__name__)
+
+HANDLERS_ENV = 'F5_HEAT_PROFILE_HANDLERS'
+DIR_ENV = 'F5_HEAT_PROFILE_DIR'
+EVERY_ENV = 'F5_HEAT_PROFILE_EVERY'
+
+SUFFIX = '.pstats'
+
+DEFAULT_TOP = 20
+SORT_KEYS = ('tottime', 'cumulative', 'calls')
+
+Hotspot = collections.namedtuple(
+    'Hotspot', ['function', 'calls', 'total', 'cumulative']
+)
+
+_LOCK = threading.Lock()
+_CALLS = collections.Counter()
+# The run being profiled, and the greenlet tracer installed before it.
+_ACTIVE = {'session': None, 'tracer': None}
+
+
+class _Session(object):
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.greenlets = set()
+
+
+def _patterns():
+    handlers = CONF[GROUP].profile_handlers
+    if handlers:
+        return handlers
+    return [pattern.strip()
+            for pattern in os.environ.get(HANDLERS_ENV, '').split(',')
+            if pattern.strip()]
+
+
+def _directory():
+    return CONF[GROUP].profile_dir or os.environ.get(DIR_ENV)
+
+
+def _every():
+    return CONF[GROUP].profile_every or int(os.environ.get(EVERY_ENV) or 1)
+
+
+def _selected(patterns, resource, handler):
+    names = ('{0}.{1}'.format(type(resource).__name__, handler),
+             '{0}.{1}'.format(resource.type(), handler))
+    return any(fnmatch.fnmatchcase(name, pattern)
+               for pattern in patterns for name in names)
+
+
+def _switched(event, args):
+    session = _ACTIVE['session']
+    if session is not None and event in ('switch', 'throw'):
+        origin, target = args
+        if origin in session.greenlets:
+            session.profiler.disable()
+        if target in session.greenlets:
+            session.profiler.enable()
+    tracer = _ACTIVE['tracer']
+    if tracer is not None:
+        tracer(event, args)
+
+
+def current():
+    '''Return the profile the running greenthread is part of, or None.'''
+
+    session = _ACTIVE['session']
+    if session is not None and greenlet.getcurrent() in session.greenlets:
+        return session
+    return None
+
+
+@contextlib.contextmanager
+def include(session):
+    '''Profile the running greenthread too, as part of session.'''
+
+    if session is None or _ACTIVE['session'] is not session:
+        yield
+        return
+
+    running = greenlet.getcurrent()
+    session.greenlets.add(running)
+    session.profiler.enable()
+    try:
+        yield
+    finally:
+        session.greenlets.discard(running)
+        session.profiler.disable()
+
+
+def _start(name):
+    with _LOCK:
+        _CALLS[name] += 1
+        call = _CALLS[name]
+        if (call - 1) % _every():
+            return None, call
+        if _ACTIVE['session'] is not None:
+            LOG.debug('Not profiling %s: another handler is profiled.', name)
+            return None, call
+        session = _ACTIVE['session'] = _Session()
+    _ACTIVE['tracer'] = greenlet.settrace(_switched)
+    session.greenlets.add(greenlet.getcurrent())
+    return session, call
+
+
+def _stop(session):
+    session.profiler.disable()
+    greenlet.settrace(_ACTIVE['tracer'])
+    with _LOCK:
+        _ACTIVE['session'] = _ACTIVE['tracer'] = None
+
+
+@contextlib.contextmanager
+def profiled(resource, handler):
+    '''Profile the body of a with block if profile_handlers selects it.'''
+
+    patterns = _patterns()
+    if not patterns or not _selected(patterns, resource, handler):
+        yield
+        return
+
+    directory = _directory()
+    if not directory:
+        yield
+        return
+
+    name = '{0}.{1}'.format(type(resource).__name__, handler)
+    session, call = _start(name)
+    if session is None:
+        yield
+        return
+
+    session.profiler.enable()
+    try:
+        yield
+    finally:
+        _stop(session)
+        path = os.path.join(directory, '{0}.{1}.{2}{3}'.format(
+            name, os.getpid(), call, SUFFIX
+        ))
+        try:
+            session.profiler.dump_stats(path)
+        except (IOError, OSError):
+            LOG.exception('Could not write the profile of %s.', name)
+        else:
+            LOG.info('Profiled %(name)s to %(path)s',
+                     {'name': name, 'path': path})
+
+
+def _profiles(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.endswith(SUFFIX)
+            ))
+        else:
+            found.append(path)
+    return found
+
+
+def summarize(paths, top=DEFAULT_TOP, sort='tottime'):
+    '''The hotspots of one or more profiles, added together.
+
+    :param paths: pstats files, or directories of them
+    :param sort: one of SORT_KEYS
+    :returns: list of at most top Hotspots, hottest first
+    '''
+
+    profiles = _profiles(paths)
+    if not profiles:
+        raise ValueError('No profiles in {0}'.format(', '.join(paths)))
+    stats = pstats.Stats(*profiles)
+    stats.sort_stats(sort)
+    hotspots = []
+    for function in stats.fcn_list[:top]:
+        _, calls, total, cumulative, _ = stats.stats[function]
+        hotspots.append(Hotspot(pstats.func_std_string(function), calls,
+                                total, cumulative))
+    return hotspots
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='List the hotspots of F5 handler profiles.'
+    )
+    parser.add_argument('paths', nargs='+',
+                        help='pstats files, or directories of them')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP)
+    parser.add_argument('--sort', choices=SORT_KEYS, default='tottime')
+    args = parser.parse_args(argv)
+
+    print('{0:>10} {1:>10} {2:>10}  {3}'.format(
+        'calls', 'tottime', 'cumtime', 'function'
+    ))
+    for hotspot in summarize(args.paths, args.top, args.sort):
+        print('{0:>10} {1:>10.4f} {2:>10.4f}  {3}'.format(
+            hotspot.calls, hotspot.total, hotspot.cumulative,
+            hotspot.function
+        ))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Which stack and handler the current greenthread is working for.
+
+The context set by a resource handler is local to the greenthread
+running it, whether or not threading is monkey patched. Code in the
+request path (scheduling, metrics) reads it to attribute each device
+request.
+'''
+
+import contextlib
+
+from eventlet import corolocal
+
+from config import CONF
+from config import GROUP
+
+
+_LOCAL = corolocal.local()
+
+
+class RequestContext(object):
+    '''Attribution for device requests made by a resource handler.'''
+
+    def __init__(self, stack_id=None, resource_type=None, handler=None,
+                 weight=1.0):
+        self.stack_id = stack_id
+        self.resource_type = resource_type
+        self.handler = handler
+        self.weight = weight
+
+
+def current():
+    '''Return the context of the running greenthread, or None.'''
+
+    return getattr(_LOCAL, 'context', None)
+
+
+@contextlib.contextmanager
+def bind(context):
+    '''Make context current for the duration of a with block.'''
+
+    previous = current()
+    _LOCAL.context = context
+    try:
+        yield context
+    finally:
+        _LOCAL.context = previous
+
+
+def for_resource(resource, handler):
+    '''Build the context for a handler of a Heat resource.
+
+    Requests are attributed to the root stack, so a nested stack shares its
+    parent's fair share of a device, weighted by the tenant_weights of the
+    stack's tenant.
+    '''
+
+    stack = resource.stack
+    stack_id = getattr(stack, 'root_stack_id', None) or stack.id
+    return RequestContext(
+        stack_id=stack_id,
+        resource_type=resource.type(),
+        handler=handler,
+        weight=CONF[GROUP].tenant_weights.get(
+            getattr(stack, 'tenant_id', None), 1.0
+        )
+    )
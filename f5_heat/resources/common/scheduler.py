@@ -0,0 +1,185 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Fair sharing of a BIG-IP® device's REST capacity between stacks.
+
+Every request to a device passes through that device's
+:class:`FairScheduler`. At most ``capacity`` requests are in flight at
+once; the rest wait in a queue ordered by self-clocked weighted fair
+queuing, so a stack creating thousands of pool members gets its share of
+the device without starving the stacks queued behind it.
+
+Schedulers are kept per device hostname for the life of the engine
+process, so every connection to the device, whatever its username, shares
+one.
+'''
+
+import heapq
+import itertools
+import threading
+import time
+
+from eventlet import event
+
+import metrics
+
+
+DEFAULT_FLOW = 'default'
+
+_SCHEDULERS = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+class FairScheduler(object):
+    '''Caps in-flight requests to one device and queues the rest fairly.'''
+
+    def __init__(self, device, capacity):
+        self.device = device
+        self._capacity = capacity
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._finish_tags = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def set_capacity(self, capacity):
+        '''Change how many requests may be in flight at once.'''
+
+        with self._lock:
+            self._capacity = capacity
+            self._dispatch()
+
+    def _dispatch(self):
+        # Called with the lock held: start queued requests while there is
+        # room, in order of their virtual finish tags.
+        while self._queue and self._in_flight < self._capacity:
+            entry = heapq.heappop(self._queue)
+            finish, _, waiter, cancelled = entry
+            if cancelled:
+                continue
+            self._virtual_time = finish
+            self._in_flight += 1
+            waiter.send()
+        if not self._queue:
+            # Every flow has caught up; forget their finish tags.
+            self._finish_tags.clear()
+        metrics.set_gauge(
+            'f5_device_queue_depth', len(self._queue), device=self.device
+        )
+
+    def acquire(self, flow=DEFAULT_FLOW, weight=1.0):
+        '''Wait for a slot to send a request on behalf of flow.
+
+        :param flow: identifies who the request is for, such as a stack id
+        :param weight: relative share of the device this flow is entitled to
+        '''
+
+        started = time.time()
+        with self._lock:
+            if not self._queue and self._in_flight < self._capacity:
+                self._in_flight += 1
+                entry = None
+            else:
+                start = max(
+                    self._virtual_time, self._finish_tags.get(flow, 0.0)
+                )
+                finish = start + 1.0 / weight
+                self._finish_tags[flow] = finish
+                entry = [finish, next(self._sequence), event.Event(), False]
+                heapq.heappush(self._queue, entry)
+                metrics.set_gauge(
+                    'f5_device_queue_depth',
+                    len(self._queue),
+                    device=self.device
+                )
+        if entry is not None:
+            try:
+                entry[2].wait()
+            except BaseException:
+                with self._lock:
+                    if entry[2].ready():
+                        # The slot was granted as we were interrupted.
+                        self._in_flight -= 1
+                        self._dispatch()
+                    else:
+                        entry[3] = True
+                raise
+        self._record_wait(time.time() - started)
+
+    def release(self):
+        '''Give back the slot taken by acquire.'''
+
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch()
+
+    def _record_wait(self, waited):
+        with self._lock:
+            self._waits += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        metrics.observe(
+            'f5_device_queue_wait_seconds', waited, device=self.device
+        )
+
+    def stats(self):
+        '''Current queue depth and wait times for this device.
+
+        :returns: dict
+        '''
+
+        with self._lock:
+            return {
+                'capacity': self._capacity,
+                'in_flight': self._in_flight,
+                'queue_depth': sum(
+                    1 for entry in self._queue if not entry[3]
+                ),
+                'requests': self._waits,
+                'wait_mean': (
+                    self._wait_total / self._waits if self._waits else 0.0
+                ),
+                'wait_max': self._wait_max
+            }
+
+
+def get_scheduler(device, capacity):
+    '''Return the process-wide scheduler for a device.
+
+    :param capacity: requests in flight at once, if the scheduler is new
+    '''
+
+    with _SCHEDULERS_LOCK:
+        scheduler = _SCHEDULERS.get(device)
+        if scheduler is None:
+            scheduler = _SCHEDULERS[device] = FairScheduler(device, capacity)
+    return scheduler
+
+
+def clear_schedulers():
+    '''Forget the scheduler of every device.'''
+
+    with _SCHEDULERS_LOCK:
+        _SCHEDULERS.clear()
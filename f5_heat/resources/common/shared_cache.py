@@ -0,0 +1,212 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''What heat-engine processes on a host know about BIG-IP® devices.
+
+When the ``[f5_heat] cache_path`` option is set, authentication tokens and
+the TMOS version and capabilities of each device are kept in an SQLite
+database at that path. Every engine worker, and every engine restarted on
+the host, starts from what the others have learned instead of logging in
+and discovering each device again.
+
+The database is in WAL mode, so readers never wait for writers, and is
+only readable by its owner since it holds tokens. The cache is an
+optimization: any error using it is logged and treated as a miss, and a
+database that cannot be opened disables the cache for the process. Each
+access runs in a native thread, so a wait for another process's lock
+never blocks the eventlet hub.
+'''
+
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from oslo_log import log as logging
+
+from concurrency import offload
+from config import CONF
+from config import GROUP
+
+
+LOG = logging.getLogger(__name__)
+
+# Seconds to wait for another process holding the database lock.
+BUSY_TIMEOUT = 5
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS tokens ('
+    'key TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS devices ('
+    'hostname TEXT PRIMARY KEY, tmos_version TEXT, modules TEXT, '
+    'discovered_at REAL)'
+)
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def credentials_key(hostname, username, password):
+    '''Key tokens by a digest of the credentials that obtained them.
+
+    A password change therefore never reuses a stale token, and the cache
+    never holds a password.
+    '''
+
+    return hashlib.sha256(
+        '\0'.join((hostname, username, password)).encode('utf-8')
+    ).hexdigest()
+
+
+def _tolerant(default=None):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return offload(func, self, *args, **kwargs)
+            except (sqlite3.Error, EnvironmentError) as ex:
+                LOG.warning('Shared device cache %(path)s unavailable: '
+                            '%(error)s', {'path': self.path, 'error': ex})
+                return default
+        return wrapper
+    return decorator
+
+
+class SharedCache(object):
+    '''An SQLite database of device tokens and facts shared by processes.'''
+
+    def __init__(self, path):
+        self.path = path
+        self.available = self._initialize()
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @_tolerant(default=False)
+    def _initialize(self):
+        os.close(os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600))
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            for statement in _SCHEMA:
+                db.execute(statement)
+        return True
+
+    @_tolerant()
+    def get_token(self, key):
+        '''Return an unexpired (token, expires_at) for a key, or None.'''
+
+        with self._connect() as db:
+            return db.execute(
+                'SELECT token, expires_at FROM tokens '
+                'WHERE key = ? AND expires_at > ?', (key, time.time())
+            ).fetchone()
+
+    @_tolerant()
+    def set_token(self, key, token, expires_at):
+        with self._connect() as db:
+            db.execute(
+                'INSERT OR REPLACE INTO tokens VALUES (?, ?, ?)',
+                (key, token, expires_at)
+            )
+
+    @_tolerant()
+    def delete_token(self, key, token):
+        '''Forget a token the device rejected.
+
+        A newer token stored by another process for the same key is kept.
+        '''
+
+        with self._connect() as db:
+            db.execute(
+                'DELETE FROM tokens WHERE key = ? AND token = ?', (key, token)
+            )
+
+    @_tolerant()
+    def get_device(self, hostname):
+        '''Return the known facts about a device.
+
+        :returns: dict of tmos_version, modules and discovered_at, where
+                  modules is None until capabilities have been discovered;
+                  or None if nothing is known
+        '''
+
+        with self._connect() as db:
+            row = db.execute(
+                'SELECT tmos_version, modules, discovered_at FROM devices '
+                'WHERE hostname = ?', (hostname,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'tmos_version': row[0],
+            'modules': json.loads(row[1]) if row[1] is not None else None,
+            'discovered_at': row[2]
+        }
+
+    @_tolerant()
+    def set_version(self, hostname, tmos_version):
+        '''Record a device's version, forgetting stale capabilities.'''
+
+        with self._connect() as db:
+            updated = db.execute(
+                'UPDATE devices SET tmos_version = ?, modules = NULL, '
+                'discovered_at = NULL WHERE hostname = ? AND '
+                'tmos_version != ?', (tmos_version, hostname, tmos_version)
+            ).rowcount
+            if not updated:
+                db.execute(
+                    'INSERT OR IGNORE INTO devices (hostname, tmos_version) '
+                    'VALUES (?, ?)', (hostname, tmos_version)
+                )
+
+    @_tolerant()
+    def set_capabilities(self, hostname, capabilities):
+        with self._connect() as db:
+            db.execute(
+                'INSERT OR REPLACE INTO devices VALUES (?, ?, ?, ?)',
+                (hostname,
+                 capabilities.tmos_version,
+                 json.dumps(sorted(capabilities.modules)),
+                 capabilities.discovered_at)
+            )
+
+
+def get_shared_cache():
+    '''Return the cache at the configured cache_path.
+
+    :returns: SharedCache, or None if cache_path is unset or the database
+              could not be opened
+    '''
+
+    path = CONF[GROUP].cache_path
+    if not path:
+        return None
+    with _CACHES_LOCK:
+        cache = _CACHES.get(path)
+        if cache is None:
+            cache = _CACHES[path] = SharedCache(path)
+    return cache if cache.available else None
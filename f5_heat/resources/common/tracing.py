@@ -0,0 +1,287 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Trace spans of resource handlers and the device calls they make.
+
+When ``[f5_heat] trace_dir`` is set, every handler run opens a span, and
+the work it does inside (looking up the resources it references, waiting
+for locks, every REST request and every poll for a config-sync) opens
+child spans of it. Each span records when it started, how long it took and
+whether it failed.
+
+The spans of every handler run for one action on a stack share a trace,
+whose id is derived from the root stack and its current traversal, so the
+gaps between handler spans show the time Heat took to schedule them, even
+across engine processes. Each trace is written to ``<trace id>.json`` in
+trace_dir as a JSON array of Zipkin v2 spans, which Zipkin and Jaeger can
+import and display.
+
+Spans are only opened inside a handler; device requests made outside one
+are not traced.
+'''
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import random
+import time
+
+from eventlet import corolocal
+from eventlet import tpool
+from oslo_log import log as logging
+import six
+from six.moves.urllib import parse as urlparse
+
+from config import CONF
+from config import GROUP
+from instrumentation import endpoint
+
+
+LOG = logging.getLogger(__name__)
+
+SERVICE_NAME = 'f5-heat'
+DEVICE_SERVICE_NAME = 'bigip'
+
+CLIENT = 'CLIENT'
+
+# Local to each greenthread even where threading is not monkey patched,
+# since a greenthread that saw another's open span would nest under it.
+_LOCAL = corolocal.local()
+
+
+def enabled():
+    '''Whether spans are being recorded.'''
+
+    return bool(CONF[GROUP].trace_dir)
+
+
+def _micros(seconds):
+    return int(seconds * 1000000)
+
+
+def _span_id():
+    return '{0:016x}'.format(random.getrandbits(64))
+
+
+def trace_id(stack):
+    '''The id of the trace of the current action on a stack.'''
+
+    stack_id = getattr(stack, 'root_stack_id', None) or stack.id
+    key = '{0}:{1}:{2}'.format(stack_id, getattr(stack, 'action', None),
+                               getattr(stack, 'current_traversal', None))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:32]
+
+
+class Span(object):
+    '''One timed operation in a trace.
+
+    :param spans: list the span adds itself to when it finishes, shared by
+                  every span of one handler run
+    '''
+
+    def __init__(self, name, trace, parent_id=None, spans=None, kind=None,
+                 remote_endpoint=None, tags=None):
+        self.name = name
+        self.trace_id = trace
+        self.id = _span_id()
+        self.parent_id = parent_id
+        self.spans = [] if spans is None else spans
+        self.kind = kind
+        self.remote_endpoint = remote_endpoint
+        self.tags = {}
+        for key, value in (tags or {}).items():
+            self.tag(key, value)
+        self.started = time.time()
+        self.duration = None
+
+    def child(self, name, **kwargs):
+        return Span(name, self.trace_id, self.id, self.spans, **kwargs)
+
+    def tag(self, key, value):
+        self.tags[key] = six.text_type(value)
+
+    def finish(self):
+        self.duration = time.time() - self.started
+        self.spans.append(self)
+
+    def to_zipkin(self):
+        '''The span as a Zipkin v2 span.'''
+
+        span = {
+            'traceId': self.trace_id,
+            'id': self.id,
+            'name': self.name,
+            'timestamp': _micros(self.started),
+            'duration': max(1, _micros(self.duration or 0)),
+            'localEndpoint': {'serviceName': SERVICE_NAME}
+        }
+        if self.parent_id is not None:
+            span['parentId'] = self.parent_id
+        if self.kind is not None:
+            span['kind'] = self.kind
+        if self.remote_endpoint is not None:
+            span['remoteEndpoint'] = self.remote_endpoint
+        if self.tags:
+            span['tags'] = self.tags
+        return span
+
+
+def current():
+    '''Return the span open in the running greenthread, or None.'''
+
+    return getattr(_LOCAL, 'span', None)
+
+
+@contextlib.contextmanager
+def bind(span):
+    '''Make span current for the duration of a with block.'''
+
+    previous = current()
+    _LOCAL.span = span
+    try:
+        yield span
+    finally:
+        _LOCAL.span = previous
+
+
+@contextlib.contextmanager
+def _opened(span):
+    with bind(span):
+        try:
+            yield span
+        except Exception as ex:
+            span.tag('error', u'{0}: {1}'.format(type(ex).__name__,
+                                                 six.text_type(ex)))
+            raise
+        finally:
+            span.finish()
+
+
+@contextlib.contextmanager
+def span(name, **tags):
+    '''Open a child span of the current span, if there is one.
+
+    :returns: the Span, or None when not tracing
+    '''
+
+    parent = current() if enabled() else None
+    if parent is None:
+        yield None
+        return
+
+    with _opened(parent.child(name, tags=tags)) as child:
+        yield child
+
+
+@contextlib.contextmanager
+def handler_span(resource, handler):
+    '''Open the span of one run of a resource handler.
+
+    The spans it and its children record are written out when it ends.
+    '''
+
+    if not enabled():
+        yield None
+        return
+
+    tags = {
+        'heat.stack_id': resource.stack.id,
+        'heat.resource_name': getattr(resource, 'name', ''),
+        'heat.resource_type': resource.type(),
+        'heat.handler': handler
+    }
+    name = '{0} {1}'.format(resource.type(), handler)
+    parent = current()
+    if parent is not None:
+        with _opened(parent.child(name, tags=tags)) as child:
+            yield child
+        return
+
+    root = Span(name, trace_id(resource.stack), tags=tags)
+    try:
+        with _opened(root):
+            yield root
+    finally:
+        write(root.trace_id, root.spans)
+
+
+def _remote_endpoint(url):
+    parts = urlparse.urlsplit(url)
+    remote = {'serviceName': DEVICE_SERVICE_NAME}
+    host = parts.hostname or ''
+    if ':' in host:
+        remote['ipv6'] = host
+    elif host.replace('.', '').isdigit():
+        remote['ipv4'] = host
+    remote['port'] = parts.port or 443
+    return remote
+
+
+@contextlib.contextmanager
+def request_span(request):
+    '''Open a span for one REST request sent to a device.'''
+
+    parent = current() if enabled() else None
+    if parent is None:
+        yield None
+        return
+
+    child = parent.child(
+        '{0} {1}'.format(request.method, endpoint(request.url)),
+        kind=CLIENT,
+        remote_endpoint=_remote_endpoint(request.url),
+        tags={'http.method': request.method,
+              'http.path': urlparse.urlsplit(request.url).path}
+    )
+    with _opened(child):
+        yield child
+
+
+def write(trace, spans):
+    '''Add spans to the file of their trace in trace_dir.
+
+    The file stays a JSON array of spans however many processes add to it.
+    '''
+
+    if not spans:
+        return
+    path = os.path.join(CONF[GROUP].trace_dir, trace + '.json')
+    encoded = ','.join(
+        json.dumps(span.to_zipkin(), sort_keys=True, separators=(',', ':'))
+        for span in spans
+    ).encode('utf-8')
+    try:
+        # Another process may hold the file; the wait for its lock happens
+        # in a native thread rather than on the hub.
+        tpool.execute(_append, path, encoded)
+    except (IOError, OSError):
+        LOG.exception('Could not write the spans of trace %s.', trace)
+
+
+def _append(path, encoded):
+    descriptor = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(descriptor, 'r+b') as trace_file:
+        fcntl.flock(trace_file.fileno(), fcntl.LOCK_EX)
+        trace_file.seek(0, os.SEEK_END)
+        if trace_file.tell() == 0:
+            trace_file.write(b'[' + encoded + b']\n')
+        else:
+            # Overwrite the closing bracket and newline.
+            trace_file.seek(-2, os.SEEK_END)
+            trace_file.write(b',' + encoded + b']\n')
@@ -0,0 +1,188 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''A log of the requests sent to devices, and where their time went.
+
+When ``[f5_heat] wire_log_enabled`` is set, every request a
+:class:`~f5_bigip_connection.DeviceAdapter` sends is logged as a JSON
+object when it took at least ``wire_log_slow_threshold`` seconds, when it
+is a login, or otherwise for a ``wire_log_sample_rate`` fraction of them.
+
+Each entry splits the time the request took between the device and the
+client. ``device_ms`` is the time on the wire: from sending each attempt
+until its response body was read, of which ``ttfb_ms`` went until the
+status and headers of the last attempt came back. ``client_ms`` is the
+rest: waiting for a scheduler slot, for the circuit breaker and between
+retries. A slow iApp service create is slow in device_ms; login churn
+shows as frequent login entries, and queueing behind other stacks as
+client_ms.
+'''
+
+import contextlib
+import json
+import random
+import time
+
+from eventlet import corolocal
+from oslo_log import log as logging
+from six.moves.urllib import parse as urlparse
+
+from config import CONF
+from config import GROUP
+from instrumentation import endpoint
+from instrumentation import LOGIN_ENDPOINT
+import request_context
+import tracing
+
+
+LOG = logging.getLogger(__name__)
+
+_LOCAL = corolocal.local()
+
+
+def enabled():
+    '''Whether requests to devices are being logged.'''
+
+    return CONF[GROUP].wire_log_enabled
+
+
+def _millis(seconds):
+    return round(seconds * 1000, 1)
+
+
+class Exchange(object):
+    '''One request to a device, with every attempt at sending it.'''
+
+    def __init__(self, request):
+        self.request = request
+        self.started = time.time()
+        self.attempts = 0
+        self.wire = 0.0
+        self.ttfb = None
+        self.transfer = None
+        self.status = None
+        self.error = None
+        self.received = 0
+
+    def entry(self, total):
+        '''The log entry of the exchange, after total seconds.'''
+
+        entry = {
+            'method': self.request.method,
+            'endpoint': endpoint(self.request.url),
+            'device': urlparse.urlsplit(self.request.url).hostname,
+            'status': self.status,
+            'attempts': self.attempts,
+            'sent_bytes': len(self.request.body or ''),
+            'received_bytes': self.received,
+            'total_ms': _millis(total),
+            'device_ms': _millis(self.wire),
+            'client_ms': _millis(max(0.0, total - self.wire))
+        }
+        if self.ttfb is not None:
+            entry['ttfb_ms'] = _millis(self.ttfb)
+        if self.transfer is not None:
+            entry['transfer_ms'] = _millis(self.transfer)
+        if self.error is not None:
+            entry['error'] = self.error
+        context = request_context.current()
+        if context is not None:
+            entry.update(stack_id=context.stack_id,
+                         resource_type=context.resource_type,
+                         handler=context.handler)
+        span = tracing.current()
+        if span is not None:
+            entry.update(trace_id=span.trace_id, span_id=span.id)
+        return entry
+
+
+def current():
+    '''Return the exchange being sent by the running greenthread, or None.'''
+
+    return getattr(_LOCAL, 'exchange', None)
+
+
+def _log(exchange):
+    total = time.time() - exchange.started
+    options = CONF[GROUP]
+    slow = total >= options.wire_log_slow_threshold
+    login = endpoint(exchange.request.url) == LOGIN_ENDPOINT
+    if not (slow or login or random.random() < options.wire_log_sample_rate):
+        return
+    entry = exchange.entry(total)
+    entry['slow'] = slow
+    message = json.dumps(entry, sort_keys=True)
+    if slow:
+        LOG.warning(message)
+    else:
+        LOG.info(message)
+
+
+@contextlib.contextmanager
+def exchange(request):
+    '''Log the request sent in a with block, if it is due to be logged.'''
+
+    if not enabled():
+        yield None
+        return
+
+    sent = Exchange(request)
+    previous = current()
+    _LOCAL.exchange = sent
+    try:
+        yield sent
+    except Exception as ex:
+        sent.error = type(ex).__name__
+        raise
+    finally:
+        _LOCAL.exchange = previous
+        _log(sent)
+
+
+def attempt(transport, request, **kwargs):
+    '''Send one attempt at the current exchange through transport.
+
+    The response body is read here, unless it is streamed, so that the
+    time it takes counts as device time.
+    '''
+
+    sent = current()
+    if sent is None:
+        return transport(request, **kwargs)
+
+    sent.attempts += 1
+    started = time.time()
+    try:
+        response = transport(request, **kwargs)
+        answered = time.time()
+        if kwargs.get('stream'):
+            length = response.headers.get('Content-Length', '')
+            sent.received = int(length) if length.isdigit() else 0
+        else:
+            sent.received = len(response.content or '')
+    except Exception as ex:
+        sent.wire += time.time() - started
+        sent.status = None
+        sent.error = type(ex).__name__
+        raise
+    finished = time.time()
+    sent.wire += finished - started
+    sent.ttfb = answered - started
+    sent.transfer = finished - answered
+    sent.status = response.status_code
+    sent.error = None
+    return response
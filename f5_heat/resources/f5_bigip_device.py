@@ -15,34 +15,79 @@
 # limitations under the License.
 #
 
-from f5.bigip import ManagementRoot
+import collections
+
 from heat.common.i18n import _
+from heat.engine import attributes
+from heat.engine import constraints
 from heat.engine import properties
 from heat.engine import resource
 from requests import HTTPError
+from requests import RequestException
+
+from common.capabilities import DEFAULT_CAPABILITIES_TTL
+from common.f5_bigip_connection import DEFAULT_CONNECT_TIMEOUT
+from common.f5_bigip_connection import DEFAULT_MAX_CONCURRENCY
+from common.f5_bigip_connection import DEFAULT_READ_TIMEOUT
+from common.f5_bigip_connection import get_connection
+from common.f5_bigip_connection import probe_connection
+from common.icontrol_rest import iControlRESTClient
+from common.mixins import f5_handler
 
 
 class BigIPConnectionFailed(HTTPError):
     pass
 
 
+# What a resource handler talks to a device through, all resolved from the
+# same connection.
+DeviceSession = collections.namedtuple(
+    'DeviceSession', ['connection', 'bigip', 'rest_client']
+)
+
+
 class F5BigIPDevice(resource.Resource):
     '''Holds BigIP server, username, and password.'''
 
     PROPERTIES = (
         IP,
         USERNAME,
-        PASSWORD
+        PASSWORD,
+        CONNECT_TIMEOUT,
+        READ_TIMEOUT,
+        CAPABILITIES_TTL,
+        REST_FAST_PATH,
+        MAX_CONCURRENCY,
+        TOKEN_AUTH,
+        ENDPOINTS
     ) = (
         'ip',
         'username',
-        'password'
+        'password',
+        'connect_timeout',
+        'read_timeout',
+        'capabilities_ttl',
+        'rest_fast_path',
+        'max_concurrency',
+        'token_auth',
+        'endpoints'
+    )
+
+    ATTRIBUTES = (
+        TMOS_VERSION,
+        PROVISIONED_MODULES,
+        FEATURES
+    ) = (
+        'tmos_version',
+        'provisioned_modules',
+        'features'
     )
 
     properties_schema = {
         IP: properties.Schema(
             properties.Schema.STRING,
-            _('IP address of BigIP device.'),
+            _('IP address of BigIP device, followed by :port if its '
+              'management interface does not listen on 443.'),
             required=True
         ),
         USERNAME: properties.Schema(
@@ -54,31 +99,168 @@ class F5BigIPDevice(resource.Resource):
             properties.Schema.STRING,
             _('Password for logging into the BigIP.'),
             required=True
+        ),
+        CONNECT_TIMEOUT: properties.Schema(
+            properties.Schema.NUMBER,
+            _('Seconds to wait for a connection to the BigIP.'),
+            default=DEFAULT_CONNECT_TIMEOUT
+        ),
+        READ_TIMEOUT: properties.Schema(
+            properties.Schema.NUMBER,
+            _('Seconds to wait for the BigIP to answer a request.'),
+            default=DEFAULT_READ_TIMEOUT
+        ),
+        CAPABILITIES_TTL: properties.Schema(
+            properties.Schema.NUMBER,
+            _('Seconds before the discovered device capabilities are '
+              'refreshed.'),
+            default=DEFAULT_CAPABILITIES_TTL
+        ),
+        REST_FAST_PATH: properties.Schema(
+            properties.Schema.BOOLEAN,
+            _('Send create and delete requests for pools, members, virtual '
+              'servers and iApps directly over iControl REST instead of '
+              'through the f5-sdk.'),
+            default=False
+        ),
+        MAX_CONCURRENCY: properties.Schema(
+            properties.Schema.INTEGER,
+            _('Maximum concurrent requests sent to the BigIP. The plugins '
+              'adapt the number actually in flight, up to this limit, to '
+              'signs of load on the management plane.'),
+            default=DEFAULT_MAX_CONCURRENCY,
+            constraints=[constraints.Range(min=1)]
+        ),
+        TOKEN_AUTH: properties.Schema(
+            properties.Schema.BOOLEAN,
+            _('Log in to the BigIP once and authenticate requests with the '
+              'resulting token, instead of authenticating every request '
+              'with the username and password.'),
+            default=False
+        ),
+        ENDPOINTS: properties.Schema(
+            properties.Schema.LIST,
+            _('Other management addresses of the BigIP, such as its IPv6 or '
+              'floating management address. Requests are sent to whichever '
+              'of these and ip answers fastest, failing over to the next '
+              'best when it stops answering.'),
+            schema=properties.Schema(properties.Schema.STRING)
         )
     }
 
-    def get_bigip(self):
-        return ManagementRoot(
+    attributes_schema = {
+        TMOS_VERSION: attributes.Schema(
+            _('TMOS version running on the BigIP.'),
+            type=attributes.Schema.STRING
+        ),
+        PROVISIONED_MODULES: attributes.Schema(
+            _('Modules provisioned on the BigIP.'),
+            type=attributes.Schema.LIST
+        ),
+        FEATURES: attributes.Schema(
+            _('Optional iControl REST features supported by the BigIP.'),
+            type=attributes.Schema.LIST
+        )
+    }
+
+    def _connection_args(self):
+        return (
             self.properties[self.IP],
             self.properties[self.USERNAME],
             self.properties[self.PASSWORD]
+        ), {
+            'connect_timeout': self.properties[self.CONNECT_TIMEOUT],
+            'read_timeout': self.properties[self.READ_TIMEOUT],
+            'max_concurrency': self.properties[self.MAX_CONCURRENCY],
+            'token_auth': self.properties[self.TOKEN_AUTH],
+            'endpoints': self.properties[self.ENDPOINTS]
+        }
+
+    def get_connection(self):
+        '''Retrieve the shared connection to this device.'''
+
+        args, kwargs = self._connection_args()
+        return get_connection(*args, **kwargs)
+
+    def get_bigip(self):
+        return self.get_connection().bigip
+
+    def get_rest_client(self):
+        '''Retrieve a raw iControl REST client, if enabled for this device.
+
+        :returns: iControlRESTClient or None
+        '''
+
+        return self._rest_client(self.get_connection())
+
+    def _rest_client(self, connection):
+        if not self.properties[self.REST_FAST_PATH]:
+            return None
+        return iControlRESTClient(connection)
+
+    def get_session(self):
+        '''Retrieve everything a resource handler talks to this device through.
+
+        The connection is looked up once, so the SDK and REST clients use
+        the same one.
+
+        :returns: DeviceSession
+        '''
+
+        connection = self.get_connection()
+        return DeviceSession(
+            connection, connection.bigip, self._rest_client(connection)
         )
 
+    def get_capabilities(self):
+        '''Retrieve the cached capabilities of this device.
+
+        :returns: DeviceCapabilities
+        '''
+
+        return self.get_connection().get_capabilities(
+            self.properties[self.CAPABILITIES_TTL]
+        )
+
+    @f5_handler
     def handle_create(self):
         '''Create the BigIP resource.
 
-        Attempt to initialize a bigip connection to test connectivity
+        Probe the device with a single authenticated request to test
+        connectivity. The probed session seeds the shared connection cache,
+        so resources depending on this device start with a warm session, and
+        the device capabilities are discovered once for all of them.
 
         raises: BigIPConnectionFailed
         '''
 
+        args, kwargs = self._connection_args()
         try:
-            self.get_bigip()
-        except HTTPError as ex:
+            connection = probe_connection(*args, **kwargs)
+            connection.get_capabilities(self.properties[self.CAPABILITIES_TTL])
+        except RequestException as ex:
             raise BigIPConnectionFailed(ex)
 
         self.resource_id_set(self.physical_resource_name())
 
+    def _resolve_attribute(self, name):
+        '''Resolve an attribute from the capabilities of the device.
+
+        raises: BigIPConnectionFailed
+        '''
+
+        try:
+            capabilities = self.get_capabilities()
+        except RequestException as ex:
+            raise BigIPConnectionFailed(ex)
+        if name == self.TMOS_VERSION:
+            return capabilities.tmos_version
+        if name == self.PROVISIONED_MODULES:
+            return sorted(capabilities.modules)
+        if name == self.FEATURES:
+            return sorted(capabilities.features)
+
+    @f5_handler
     def handle_delete(self):
         '''Delete this connection to the BIG-IP® device.'''
 
@@ -0,0 +1,129 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from heat.common.i18n import _
+from heat.engine import attributes
+from heat.engine import properties
+from requests import RequestException
+
+from common.concurrency import DeviceExecutor
+from common.f5_bigip_connection import get_connection
+from common.f5_bigip_connection import probe_connection
+from common.failover import DEFAULT_FAILOVER_TTL
+from common.failover import get_tracker
+from common.mixins import f5_handler
+from f5_bigip_device import BigIPConnectionFailed
+from f5_bigip_device import F5BigIPDevice
+
+
+class F5BigIPDevicePair(F5BigIPDevice):
+    '''An HA pair of BigIP devices, used through whichever unit is active.
+
+    Resources that reference the pair in bigip_server send their changes to
+    the active unit, and follow it to the other unit after a failover.
+    '''
+
+    PAIR_PROPERTIES = (
+        PEER_IP,
+        FAILOVER_TTL
+    ) = (
+        'peer_ip',
+        'failover_ttl'
+    )
+
+    PROPERTIES = F5BigIPDevice.PROPERTIES + PAIR_PROPERTIES
+
+    PAIR_ATTRIBUTES = (
+        ACTIVE_UNIT,
+    ) = (
+        'active_unit',
+    )
+
+    ATTRIBUTES = F5BigIPDevice.ATTRIBUTES + PAIR_ATTRIBUTES
+
+    properties_schema = dict(F5BigIPDevice.properties_schema, **{
+        PEER_IP: properties.Schema(
+            properties.Schema.STRING,
+            _('IP address of the other BigIP in the pair.'),
+            required=True
+        ),
+        FAILOVER_TTL: properties.Schema(
+            properties.Schema.NUMBER,
+            _('Seconds before the failover state of the pair is checked '
+              'again.'),
+            default=DEFAULT_FAILOVER_TTL
+        )
+    })
+
+    attributes_schema = dict(F5BigIPDevice.attributes_schema, **{
+        ACTIVE_UNIT: attributes.Schema(
+            _('IP address of the active BigIP in the pair.'),
+            type=attributes.Schema.STRING
+        )
+    })
+
+    def _unit_args(self):
+        '''Connection arguments for each unit, ip first.'''
+
+        args, kwargs = self._connection_args()
+        peer_args = (self.properties[self.PEER_IP],) + args[1:]
+        peer_kwargs = dict(kwargs, endpoints=None)
+        return [(args, kwargs), (peer_args, peer_kwargs)]
+
+    def get_connection(self):
+        '''Retrieve the shared connection to the active unit.'''
+
+        connections = [
+            get_connection(*args, **kwargs)
+            for args, kwargs in self._unit_args()
+        ]
+        tracker = get_tracker(
+            [connection.hostname for connection in connections]
+        )
+        return tracker.active_connection(
+            connections, self.properties[self.FAILOVER_TTL]
+        )
+
+    @f5_handler
+    def handle_create(self):
+        '''Create the BigIP pair resource.
+
+        Both units are probed at once, seeding the shared connection cache
+        for each of them.
+
+        raises: BigIPConnectionFailed
+        '''
+
+        try:
+            DeviceExecutor().map(
+                lambda unit: probe_connection(*unit[0], **unit[1]),
+                self._unit_args()
+            )
+            self.get_capabilities()
+        except RequestException as ex:
+            raise BigIPConnectionFailed(ex)
+
+        self.resource_id_set(self.physical_resource_name())
+
+    def _resolve_attribute(self, name):
+        if name == self.ACTIVE_UNIT:
+            return self.get_connection().hostname
+        return super(F5BigIPDevicePair, self)._resolve_attribute(name)
+
+
+def resource_mapping():
+    return {'F5::BigIP::DevicePair': F5BigIPDevicePair}
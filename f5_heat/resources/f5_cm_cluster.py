@@ -22,6 +22,12 @@ from heat.engine import resource
 
 from f5.multi_device.cluster import ClusterManager
 from f5.sdk_exception import F5SDKError
+from requests import RequestException
+
+from common.circuit_breaker import CLOSED
+from common.concurrency import DeviceExecutor
+from common.config_sync import get_coalescer
+from common.mixins import f5_handler
 
 
 class UpdateNotAllowed(object):
@@ -29,7 +35,13 @@ class UpdateNotAllowed(object):
 
 
 class F5CmCluster(resource.Resource):
-    '''Manages creation of the F5::Cm::Cluster resource.'''
+    '''Manages creation of the F5::Cm::Cluster resource.
+
+    A cluster may also be the bigip_server of other F5® resources. Their
+    changes are then written to one device of the cluster, the first one
+    reachable, and reach the others through a config-sync shared with any
+    other changes made at the same time.
+    '''
 
     PROPERTIES = (
         DEVICE_GROUP_NAME,
@@ -70,14 +82,74 @@ class F5CmCluster(resource.Resource):
     }
 
     def _set_devices(self):
-        '''Retrieve the BIG-IP® connection from the F5::BigIP resource.'''
+        '''Retrieve the BIG-IP® connections from the F5::BigIP resources.
 
-        self.devices = []
-        for device in self.properties[self.DEVICES]:
-            self.devices.append(
-                self.stack.resource_by_refid(device).get_bigip()
-            )
+        Connections to the devices are established concurrently.
+        '''
+
+        self.devices = DeviceExecutor().map(
+            lambda device: self.stack.resource_by_refid(device).get_bigip(),
+            self.properties[self.DEVICES]
+        )
+
+    def _writer(self):
+        '''The device that resources targeting the cluster write to.
+
+        That is the first device whose breaker is closed. A device whose
+        breaker has been open for its reset timeout is probed first, so a
+        device that recovers is written to again.
+        '''
+
+        devices = [
+            self.stack.resource_by_refid(refid)
+            for refid in self.properties[self.DEVICES]
+        ]
+        for device in devices:
+            connection = device.get_connection()
+            if connection.breaker.state == CLOSED:
+                return device
+            if connection.breaker.trial_due():
+                try:
+                    connection.probe()
+                except RequestException:
+                    continue
+                return device
+        return devices[0]
+
+    def get_connection(self):
+        return self._writer().get_connection()
+
+    def get_bigip(self):
+        return self._writer().get_bigip()
+
+    def get_rest_client(self):
+        return self._writer().get_rest_client()
+
+    def get_capabilities(self):
+        return self._writer().get_capabilities()
+
+    def get_session(self):
+        return self._writer().get_session()
+
+    def request_sync(self, connection=None):
+        '''Sync changes written to the cluster to all of its devices.
+
+        Blocks until the device group is in sync. Requests made while a
+        sync is pending share it.
+
+        :param connection: BigIPConnection the changes were written
+                           through, which the sync must start from; by
+                           default, the current writer's
+        '''
+
+        if connection is None:
+            connection = self._writer().get_connection()
+        get_coalescer(
+            self.properties[self.DEVICE_GROUP_NAME],
+            connection.hostname
+        ).sync(connection.bigip)
 
+    @f5_handler
     def handle_create(self):
         '''Create the device service group (cluster) of devices.
 
@@ -98,6 +170,7 @@ class F5CmCluster(resource.Resource):
         except F5SDKError as ex:
             raise exception.ResourceFailure(ex, None, action='CREATE')
 
+    @f5_handler
     def handle_delete(self):
         '''Teardown the device service group (cluster).
 
@@ -15,11 +15,15 @@
 # limitations under the License.
 #
 
+import functools
+
 from heat.common import exception
 from heat.common.i18n import _
 from heat.engine import properties
 from heat.engine import resource
 
+from common.concurrency import cooperative
+from common.concurrency import DeviceExecutor
 from common.mixins import f5_common_resources
 from common.mixins import F5BigIPMixin
 
@@ -55,7 +59,8 @@ class F5LTMPool(resource.Resource, F5BigIPMixin):
         ),
         BIGIP_SERVER: properties.Schema(
             properties.Schema.STRING,
-            _('Reference to the BigIP server resource.'),
+            _('Reference to the BigIP server resource, or to an '
+              'F5::Cm::Cluster to write once and sync to its devices.'),
             required=True
         ),
         PARTITION: properties.Schema(
@@ -88,30 +93,37 @@ class F5LTMPool(resource.Resource, F5BigIPMixin):
         )
     }
 
+    def _create_member(self, loaded_pool, member):
+        loaded_pool.members_s.members.create(
+            name='{0}:{1}'.format(
+                member[self.MEMBER_IP], member[self.MEMBER_PORT]
+            ),
+            partition=self.partition_name,
+            address=member[self.MEMBER_IP]
+        )
+
     @f5_common_resources
     def _assign_members(self):
         '''Assign members to the pool.
 
+        The pool is loaded once and the members are created concurrently,
+        within the concurrency limit of the device.
+
         :raises: ResourceFailure
         '''
 
-        members = self.properties[self.MEMBERS]
-        for member in members:
-            member_ip = member[self.MEMBER_IP]
-            member_port = member[self.MEMBER_PORT]
-            member_name = '{0}:{1}'.format(member_ip, member_port)
-            try:
-                loaded_pool = self.bigip.tm.ltm.pools.pool.load(
-                    name=self.properties[self.NAME],
-                    partition=self.partition_name
-                )
-                loaded_pool.members_s.members.create(
-                    name=member_name,
-                    partition=self.partition_name,
-                    address=member_ip
-                )
-            except Exception as ex:
-                raise exception.ResourceFailure(ex, None, action='ADD MEMBERS')
+        try:
+            loaded_pool = self.bigip.tm.ltm.pools.pool.load(
+                name=self.properties[self.NAME],
+                partition=self.partition_name
+            )
+            DeviceExecutor().map(
+                functools.partial(self._create_member, loaded_pool),
+                cooperative(self.properties[self.MEMBERS]),
+                limiter=self.connection.limiter
+            )
+        except Exception as ex:
+            raise exception.ResourceFailure(ex, None, action='ADD MEMBERS')
 
     @f5_common_resources
     def handle_create(self):
@@ -128,15 +140,39 @@ class F5LTMPool(resource.Resource, F5BigIPMixin):
             create_kwargs['service_down_action'] = \
                 self.properties[self.SERVICE_DOWN_ACTION]
 
+        if self.rest_client:
+            self._create_with_members(create_kwargs)
+        else:
+            try:
+                self.bigip.tm.ltm.pools.pool.create(**create_kwargs)
+            except Exception as ex:
+                raise exception.ResourceFailure(ex, None, action='CREATE')
+
+            if self.properties[self.MEMBERS]:
+                self._assign_members()
+        self.resource_id_set(self.physical_resource_name())
+
+    def _create_with_members(self, create_kwargs):
+        '''Create the pool and its members in a single REST request.
+
+        :raises: ResourceFailure
+        '''
+
+        create_kwargs['members'] = [
+            {
+                'name': '{0}:{1}'.format(
+                    member[self.MEMBER_IP], member[self.MEMBER_PORT]
+                ),
+                'partition': self.partition_name,
+                'address': member[self.MEMBER_IP]
+            }
+            for member in cooperative(self.properties[self.MEMBERS] or [])
+        ]
         try:
-            self.bigip.tm.ltm.pools.pool.create(**create_kwargs)
+            self.rest_client.create_pool(**create_kwargs)
         except Exception as ex:
             raise exception.ResourceFailure(ex, None, action='CREATE')
 
-        if self.properties[self.MEMBERS]:
-            self._assign_members()
-        self.resource_id_set(self.physical_resource_name())
-
     @f5_common_resources
     def handle_delete(self):
         '''Delete the BIG-IP® LTM Pool resource on the given device.
@@ -144,7 +180,14 @@ class F5LTMPool(resource.Resource, F5BigIPMixin):
         :raises: ResourceFailure
         '''
 
-        if self.bigip.tm.ltm.pools.pool.exists(
+        if self.rest_client:
+            try:
+                self.rest_client.delete_pool(
+                    self.properties[self.NAME], self.partition_name
+                )
+            except Exception as ex:
+                raise exception.ResourceFailure(ex, None, action='DELETE')
+        elif self.bigip.tm.ltm.pools.pool.exists(
                 name=self.properties[self.NAME],
                 partition=self.partition_name
         ):
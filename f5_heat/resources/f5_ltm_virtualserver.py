@@ -53,7 +53,8 @@ class F5LTMVirtualServer(resource.Resource, F5BigIPMixin):
         ),
         BIGIP_SERVER: properties.Schema(
             properties.Schema.STRING,
-            _('Reference to the BIG-IP Server resource.'),
+            _('Reference to the BIG-IP Server resource, or to an '
+              'F5::Cm::Cluster to write once and sync to its devices.'),
             required=True
         ),
         PARTITION: properties.Schema(
@@ -108,7 +109,10 @@ class F5LTMVirtualServer(resource.Resource, F5BigIPMixin):
             create_kwargs['vlansEnabled'] = True
 
         try:
-            self.bigip.tm.ltm.virtuals.virtual.create(**create_kwargs)
+            if self.rest_client:
+                self.rest_client.create_virtual(**create_kwargs)
+            else:
+                self.bigip.tm.ltm.virtuals.virtual.create(**create_kwargs)
         except Exception as ex:
             raise exception.ResourceFailure(ex, None, action='CREATE')
 
@@ -118,7 +122,14 @@ class F5LTMVirtualServer(resource.Resource, F5BigIPMixin):
 
         :raises: ResourceFailure exception
         '''
-        if self.bigip.tm.ltm.virtuals.virtual.exists(
+        if self.rest_client:
+            try:
+                self.rest_client.delete_virtual(
+                    self.properties[self.NAME], self.partition_name
+                )
+            except Exception as ex:
+                raise exception.ResourceFailure(ex, None, action='DELETE')
+        elif self.bigip.tm.ltm.virtuals.virtual.exists(
                 name=self.properties[self.NAME],
                 partition=self.partition_name
         ):
@@ -55,7 +55,8 @@ class F5SysiAppCompositeTemplate(F5BigIPMixin, resource.Resource):
         ),
         BIGIP_SERVER: properties.Schema(
             properties.Schema.STRING,
-            _('BIG-IP resource reference.'),
+            _('BIG-IP resource reference, or an F5::Cm::Cluster to write '
+              'once and sync to its devices.'),
             required=True
         ),
         PARTITION: properties.Schema(
@@ -133,8 +134,11 @@ class F5SysiAppCompositeTemplate(F5BigIPMixin, resource.Resource):
         template_dict['partition'] = self.partition_name
 
         try:
-            template = self.bigip.tm.sys.application.templates.template
-            template.create(**template_dict)
+            if self.rest_client:
+                self.rest_client.create_template(**template_dict)
+            else:
+                template = self.bigip.tm.sys.application.templates.template
+                template.create(**template_dict)
         except Exception as ex:
             raise exception.ResourceFailure(ex, None, action='CREATE')
 
@@ -145,7 +149,14 @@ class F5SysiAppCompositeTemplate(F5BigIPMixin, resource.Resource):
         :raises: ResourceFailure
         '''
 
-        if self.bigip.tm.sys.application.templates.template.exists(
+        if self.rest_client:
+            try:
+                self.rest_client.delete_template(
+                    self.properties[self.NAME], self.partition_name
+                )
+            except Exception as ex:
+                raise exception.ResourceFailure(ex, None, action='DELETE')
+        elif self.bigip.tm.sys.application.templates.template.exists(
                 name=self.properties[self.NAME],
                 partition=self.partition_name
         ):
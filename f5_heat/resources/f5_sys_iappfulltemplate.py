@@ -20,6 +20,8 @@ from heat.common.i18n import _
 from heat.engine import properties
 from heat.engine import resource
 
+from common.concurrency import offload
+from common.concurrency import OFFLOAD_THRESHOLD
 from common.mixins import f5_common_resources
 from common.mixins import F5BigIPMixin
 from f5.utils.iapp_parser import IappParser
@@ -45,7 +47,8 @@ class F5SysiAppFullTemplate(F5BigIPMixin, resource.Resource):
     properties_schema = {
         BIGIP_SERVER: properties.Schema(
             properties.Schema.STRING,
-            _('BigIP resource reference.'),
+            _('BigIP resource reference, or an F5::Cm::Cluster to write '
+              'once and sync to its devices.'),
             required=True
         ),
         PARTITION: properties.Schema(
@@ -65,10 +68,17 @@ class F5SysiAppFullTemplate(F5BigIPMixin, resource.Resource):
         self._parse_full_template()
 
     def _parse_full_template(self):
-        '''Parse template and set resulting dictionary as instance attr.'''
+        '''Parse template and set resulting dictionary as instance attr.
 
-        templ = self.properties[self.FULL_TEMPLATE]
-        self.template_dict = IappParser(templ).parse_template()
+        Large templates are parsed in a native thread so that parsing does
+        not hold up other stacks on the engine.
+        '''
+
+        parser = IappParser(self.properties[self.FULL_TEMPLATE])
+        if len(parser.template_str) >= OFFLOAD_THRESHOLD:
+            self.template_dict = offload(parser.parse_template)
+        else:
+            self.template_dict = parser.parse_template()
 
     @f5_common_resources
     def _validate_template_partition(self):
@@ -94,8 +104,11 @@ class F5SysiAppFullTemplate(F5BigIPMixin, resource.Resource):
 
         self._validate_template_partition()
         try:
-            template = self.bigip.tm.sys.application.templates.template
-            template.create(**self.template_dict)
+            if self.rest_client:
+                self.rest_client.create_template(**self.template_dict)
+            else:
+                template = self.bigip.tm.sys.application.templates.template
+                template.create(**self.template_dict)
         except Exception as ex:
             raise exception.ResourceFailure(ex, None, action='CREATE')
 
@@ -106,7 +119,14 @@ class F5SysiAppFullTemplate(F5BigIPMixin, resource.Resource):
         :raises: ResourceFailure
         '''
 
-        if self.bigip.tm.sys.application.templates.template.exists(
+        if self.rest_client:
+            try:
+                self.rest_client.delete_template(
+                    self.template_dict['name'], self.partition_name
+                )
+            except Exception as ex:
+                raise exception.ResourceFailure(ex, None, action='DELETE')
+        elif self.bigip.tm.sys.application.templates.template.exists(
                 name=self.template_dict['name'],
                 partition=self.partition_name
         ):
@@ -22,12 +22,11 @@ from heat.common.i18n import _LE
 from heat.engine import properties
 from heat.engine import resource
 
+from common.concurrency import json_loads
 from common.mixins import f5_common_resources
 from common.mixins import F5BigIPMixin
 from oslo_log import log as logging
 
-import json
-
 LOG = logging.getLogger(__name__)
 
 
@@ -62,7 +61,8 @@ class F5SysiAppService(resource.Resource, F5BigIPMixin):
         ),
         BIGIP_SERVER: properties.Schema(
             properties.Schema.STRING,
-            _('IP address of BIG-IP device.')
+            _('IP address of BIG-IP device, or an F5::Cm::Cluster to write '
+              'once and sync to its devices.')
         ),
         PARTITION: properties.Schema(
             properties.Schema.STRING,
@@ -110,7 +110,7 @@ class F5SysiAppService(resource.Resource, F5BigIPMixin):
         '''
 
         try:
-            self.iapp_answers_from_hot[prop_name] = json.loads(
+            self.iapp_answers_from_hot[prop_name] = json_loads(
                 self.properties[prop_name]
             )
         except Exception:
@@ -143,8 +143,11 @@ class F5SysiAppService(resource.Resource, F5BigIPMixin):
         service_dict['partition'] = self.partition_name
 
         try:
-            service = self.bigip.tm.sys.application.services.service
-            service.create(**service_dict)
+            if self.rest_client:
+                self.rest_client.create_service(**service_dict)
+            else:
+                service = self.bigip.tm.sys.application.services.service
+                service.create(**service_dict)
         except Exception as ex:
             raise exception.ResourceFailure(ex, None, action='CREATE')
 
@@ -155,7 +158,14 @@ class F5SysiAppService(resource.Resource, F5BigIPMixin):
         :raises: Resource Failure # TODO Change to proper exception
         '''
 
-        if self.bigip.tm.sys.application.services.service.exists(
+        if self.rest_client:
+            try:
+                self.rest_client.delete_service(
+                    self.properties[self.NAME], self.partition_name
+                )
+            except Exception as ex:
+                raise exception.ResourceFailure(ex, None, action='DELETE')
+        elif self.bigip.tm.sys.application.services.service.exists(
                 name=self.properties[self.NAME],
                 partition=self.partition_name
         ):
@@ -0,0 +1,98 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.auth import TokenAuth
+from f5_heat.resources.common.shared_cache import SharedCache
+
+import mock
+import pytest
+import time
+
+
+def login_response(token, timeout=1200):
+    response = mock.MagicMock()
+    response.json.return_value = {
+        'token': {'token': token, 'timeout': timeout}
+    }
+    return response
+
+
+@pytest.fixture
+def session():
+    session = mock.MagicMock()
+    session.post.return_value = login_response('ABC')
+    return session
+
+
+def make_auth(session, shared_cache=None):
+    return TokenAuth(
+        session, 'https://10.0.0.1/mgmt/', '10.0.0.1', 'admin', 'admin',
+        (5, 30), shared_cache=shared_cache
+    )
+
+
+def test_logs_in_once(session):
+    auth = make_auth(session)
+    request = mock.MagicMock(headers={})
+    auth(request)
+    auth(request)
+    assert request.headers['X-F5-Auth-Token'] == 'ABC'
+    assert session.post.call_count == 1
+    assert session.post.call_args[0][0] == \
+        'https://10.0.0.1/mgmt/shared/authn/login'
+
+
+def test_logs_in_again_when_expired(session):
+    auth = make_auth(session)
+    session.post.return_value = login_response('ABC', timeout=0)
+    auth.token()
+    session.post.return_value = login_response('DEF')
+    assert auth.token() == 'DEF'
+
+
+def test_token_shared_through_cache(session, tmpdir):
+    cache = SharedCache(str(tmpdir.join('devices.sqlite')))
+    make_auth(session, cache).token()
+    other = mock.MagicMock()
+    assert make_auth(other, cache).token() == 'ABC'
+    assert other.post.call_count == 0
+
+
+def test_rejected_token_retried_once(session):
+    auth = make_auth(session)
+    auth.token()
+    session.post.return_value = login_response('DEF')
+    rejected = mock.MagicMock(status_code=401, history=[])
+    rejected.request.headers = {'X-F5-Auth-Token': 'ABC'}
+    retry = rejected.request.copy.return_value
+    retry.headers = {}
+    retried = rejected.connection.send.return_value
+    retried.history = []
+    assert auth._handle_401(rejected) is retried
+    assert retry.headers['X-F5-Auth-Token'] == 'DEF'
+    assert retried.history == [rejected]
+
+
+def test_other_responses_untouched(session):
+    response = mock.MagicMock(status_code=200)
+    assert make_auth(session)._handle_401(response) is response
+
+
+def test_expiry_margin(session):
+    auth = make_auth(session)
+    auth.token()
+    assert auth._expires_at < time.time() + 1200
@@ -0,0 +1,49 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.capabilities import DeviceCapabilities
+
+
+provision = {
+    'items': [
+        {'name': 'ltm', 'level': 'nominal'},
+        {'name': 'asm', 'level': 'none'},
+        {'name': 'AVR', 'level': 'minimum'}
+    ]
+}
+
+
+def test_from_provision():
+    capabilities = DeviceCapabilities.from_provision('12.1.0', provision)
+    assert capabilities.tmos_version == '12.1.0'
+    assert capabilities.modules == frozenset(['ltm', 'avr'])
+    assert capabilities.has_modules(['LTM', 'avr']) is True
+    assert capabilities.has_modules(['asm']) is False
+
+
+def test_features_by_version():
+    old = DeviceCapabilities('11.5.4', [])
+    new = DeviceCapabilities('12.1.0', [])
+    assert old.supports('transactions') is True
+    assert old.supports('token_auth') is False
+    assert new.supports('pool_member_fqdn') is True
+
+
+def test_expired():
+    capabilities = DeviceCapabilities('12.1.0', [], discovered_at=0)
+    assert capabilities.expired(3600) is True
+    assert DeviceCapabilities('12.1.0', []).expired(3600) is False
@@ -0,0 +1,278 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.auth import TokenAuth
+from f5_heat.resources.common import cassette
+from f5_heat.resources.common.config import CONF
+from f5_heat.resources.common.endpoints import EndpointSelector
+from f5_heat.resources.common import f5_bigip_connection
+from requests.models import Response
+from requests import ReadTimeout
+from requests import Request
+
+import eventlet
+import fcntl
+import gzip
+import mock
+import pytest
+
+
+@pytest.fixture
+def cassette_path(tmpdir):
+    yield str(tmpdir.join('traffic.json.gz'))
+    cassette.clear_cassettes()
+
+
+def configure(path, mode, timing_scale=1.0):
+    CONF.set_override('cassette_path', path, group='f5_heat')
+    CONF.set_override('cassette_mode', mode, group='f5_heat')
+    CONF.set_override('cassette_timing_scale', timing_scale,
+                      group='f5_heat')
+
+
+@pytest.fixture(autouse=True)
+def clear_overrides():
+    yield
+    for option in ('cassette_path', 'cassette_mode',
+                   'cassette_timing_scale'):
+        CONF.clear_override(option, group='f5_heat')
+    cassette.clear_cassettes()
+
+
+def request(method='GET', path='tm/ltm/pool', body=None):
+    return Request(
+        method, 'https://10.0.0.1/mgmt/' + path,
+        data=body
+    ).prepare()
+
+
+def response(status, body, **headers):
+    response = Response()
+    response.status_code = status
+    response._content = body
+    response.headers.update(headers)
+    return response
+
+
+def record(path, exchanges):
+    tape = cassette.Cassette(path, cassette.RECORD).track('10.0.0.1')
+    for sent, received in exchanges:
+        transport = mock.MagicMock(side_effect=[received])
+        try:
+            tape.send(transport, sent, timeout=(5, 30))
+        except ReadTimeout:
+            pass
+        assert transport.call_args == mock.call(sent, timeout=(5, 30))
+    tape.cassette.close()
+
+
+def test_disabled_by_default():
+    assert cassette.get_cassette() is None
+
+
+def test_get_cassette_configured(cassette_path):
+    configure(cassette_path, 'record')
+    recorder = cassette.get_cassette()
+    assert recorder.mode == cassette.RECORD
+    assert cassette.get_cassette() is recorder
+
+
+def test_unknown_mode(cassette_path):
+    with pytest.raises(ValueError):
+        cassette.Cassette(cassette_path, 'rewind')
+
+
+def test_record_keeps_no_request_bodies(cassette_path):
+    record(cassette_path, [(
+        request('POST', 'shared/authn/login', '{"password": "secret"}'),
+        response(200, b'{"token": {"token": "abc"}}',
+                 **{'Content-Type': 'application/json', 'Server': 'x'})
+    )])
+    with gzip.open(cassette_path, 'rb') as recorded:
+        content = recorded.read().decode('utf-8')
+    assert 'secret' not in content
+    assert 'abc' in content
+    assert 'Server' not in content
+
+
+def test_replay(cassette_path):
+    record(cassette_path, [
+        (request(), response(200, b'{"items": []}',
+                             **{'Content-Type': 'application/json'})),
+        (request('POST', body='{"name": "pool"}'),
+         response(409, b'{"code": 409}', **{'Retry-After': '2'}))
+    ])
+    player = cassette.Cassette(cassette_path, cassette.REPLAY, 0)
+    tape = player.track('10.0.0.1')
+    transport = mock.MagicMock()
+    created = tape.send(transport, request('POST', body='{"name": "pool"}'))
+    listed = tape.send(transport, request())
+    assert transport.call_count == 0
+    assert created.status_code == 409
+    assert created.headers['retry-after'] == '2'
+    assert listed.json() == {'items': []}
+    assert listed.url == 'https://10.0.0.1/mgmt/tm/ltm/pool'
+
+
+def test_replay_in_order_then_repeats_last(cassette_path):
+    record(cassette_path, [
+        (request(path='tm/cm/sync-status'), response(200, b'"syncing"')),
+        (request(path='tm/cm/sync-status'), response(200, b'"in sync"'))
+    ])
+    tape = cassette.Cassette(cassette_path, cassette.REPLAY, 0).track(
+        '10.0.0.1'
+    )
+    statuses = [tape.send(None, request(path='tm/cm/sync-status')).json()
+                for _ in range(3)]
+    assert statuses == ['syncing', 'in sync', 'in sync']
+
+
+def test_replay_miss(cassette_path):
+    record(cassette_path, [(request(), response(200, b'{}'))])
+    player = cassette.Cassette(cassette_path, cassette.REPLAY, 0)
+    with pytest.raises(cassette.CassetteMissError):
+        player.track('10.0.0.2').send(None, request())
+    with pytest.raises(cassette.CassetteMissError):
+        player.track('10.0.0.1').send(None, request(body='{}'))
+
+
+def test_replay_error(cassette_path):
+    record(cassette_path, [(request(), ReadTimeout('slow'))])
+    tape = cassette.Cassette(cassette_path, cassette.REPLAY, 0).track(
+        '10.0.0.1'
+    )
+    with pytest.raises(ReadTimeout):
+        tape.send(None, request())
+
+
+@pytest.mark.parametrize('timing_scale,slept', [(1.0, 1), (0.5, 1), (0, 0)])
+def test_replay_timing(cassette_path, timing_scale, slept):
+    with mock.patch.object(cassette, 'time') as mock_time:
+        mock_time.time.side_effect = [10.0, 10.2]
+        record(cassette_path, [(request(), response(200, b'{}'))])
+    tape = cassette.Cassette(
+        cassette_path, cassette.REPLAY, timing_scale
+    ).track('10.0.0.1')
+    with mock.patch.object(cassette.eventlet, 'sleep') as mock_sleep:
+        tape.send(None, request())
+    assert mock_sleep.call_count == slept
+    if slept:
+        assert mock_sleep.call_args[0][0] == pytest.approx(
+            0.2 * timing_scale
+        )
+
+
+def test_device_adapter_records_and_replays(cassette_path):
+    configure(cassette_path, 'record')
+    adapter = f5_bigip_connection.DeviceAdapter(
+        (2, 10), track=cassette.get_cassette().track('10.0.0.1')
+    )
+    with mock.patch.object(
+            f5_bigip_connection.HTTPAdapter, 'send',
+            return_value=response(200, b'{"kind": "pool"}')
+    ):
+        adapter.send(request())
+    cassette.clear_cassettes()
+
+    configure(cassette_path, 'replay', 0)
+    adapter = f5_bigip_connection.DeviceAdapter(
+        (2, 10), track=cassette.get_cassette().track('10.0.0.1')
+    )
+    with mock.patch.object(
+            f5_bigip_connection.HTTPAdapter, 'send'
+    ) as mock_send:
+        assert adapter.send(request()).json() == {'kind': 'pool'}
+    assert mock_send.call_count == 0
+
+
+def test_record_from_several_processes(cassette_path):
+    # Each worker of a heat-engine records through a file of its own.
+    workers = [cassette.Cassette(cassette_path, cassette.RECORD)
+               for _ in range(2)]
+    for status in (200, 201, 202):
+        workers[status % 2].track('10.0.0.1').send(
+            mock.MagicMock(return_value=response(status, b'{}')), request()
+        )
+    for worker in workers:
+        worker.close()
+    tape = cassette.Cassette(cassette_path, cassette.REPLAY, 0).track(
+        '10.0.0.1'
+    )
+    assert [tape.send(None, request()).status_code
+            for _ in range(3)] == [200, 201, 202]
+
+
+def test_record_waits_for_lock_off_the_hub(cassette_path):
+    # Another process holding the file waits the recorder without stopping
+    # the rest of the engine.
+    tape = cassette.Cassette(cassette_path, cassette.RECORD).track('10.0.0.1')
+    with open(cassette_path, 'ab') as other:
+        fcntl.flock(other, fcntl.LOCK_EX)
+        recording = eventlet.spawn(
+            tape.send, mock.MagicMock(return_value=response(200, b'{}')),
+            request()
+        )
+        ran = eventlet.spawn(lambda: True)
+        assert ran.wait() is True
+        assert recording.dead is False
+        fcntl.flock(other, fcntl.LOCK_UN)
+    assert recording.wait().status_code == 200
+    tape.cassette.close()
+    assert len(cassette.Cassette(cassette_path, cassette.REPLAY)) == 1
+
+
+def test_replayed_401_resent_by_token_auth(cassette_path):
+    record(cassette_path, [
+        (request(), response(401, b'{}')),
+        (request(), response(200, b'{"items": []}'))
+    ])
+    adapter = f5_bigip_connection.DeviceAdapter(
+        (2, 10), track=cassette.Cassette(
+            cassette_path, cassette.REPLAY, 0
+        ).track('10.0.0.1')
+    )
+    auth = TokenAuth(mock.MagicMock(), 'https://10.0.0.1/mgmt/', '10.0.0.1',
+                     'admin', 'admin', (2, 10))
+    with mock.patch.object(auth, 'token', return_value='abc'):
+        resent = auth._handle_401(adapter.send(request()))
+    assert resent.json() == {'items': []}
+    assert resent.history[0].status_code == 401
+
+
+def test_endpoint_probes_recorded_and_replayed(cassette_path):
+    endpoints = ['10.0.0.1', '10.0.0.100']
+    recorder = cassette.Cassette(cassette_path, cassette.RECORD)
+    with mock.patch.object(cassette, 'time') as mock_time:
+        # The first endpoint answers in 300 ms, the second in 100 ms.
+        mock_time.time.side_effect = [10.0, 10.3, 20.0, 20.1]
+        with mock.patch.object(
+                f5_bigip_connection.HTTPAdapter, 'send',
+                side_effect=lambda sent, **kwargs: response(401, b'{}')
+        ):
+            assert EndpointSelector(
+                '10.0.0.1', endpoints, (5, 30), cassette=recorder
+            ).probe() == ['10.0.0.100', '10.0.0.1']
+    recorder.close()
+
+    player = cassette.Cassette(cassette_path, cassette.REPLAY, 0)
+    with mock.patch.object(
+            f5_bigip_connection.HTTPAdapter, 'send'
+    ) as mock_send:
+        assert EndpointSelector(
+            '10.0.0.1', endpoints, (5, 30), cassette=player
+        ).probe() == ['10.0.0.100', '10.0.0.1']
+    assert mock_send.call_count == 0
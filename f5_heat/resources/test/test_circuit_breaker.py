@@ -0,0 +1,113 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common import circuit_breaker
+from f5_heat.resources.common.circuit_breaker import CircuitBreaker
+from f5_heat.resources.common.circuit_breaker import CircuitOpenError
+from requests import RequestException
+
+import mock
+import pytest
+
+
+@pytest.fixture
+def clock():
+    with mock.patch.object(circuit_breaker, 'time') as mock_time:
+        mock_time.time.return_value = 100.0
+        yield mock_time.time
+
+
+@pytest.fixture
+def breaker(clock):
+    breaker = CircuitBreaker('10.0.0.1', failure_threshold=3,
+                             reset_timeout=30)
+    yield breaker
+    circuit_breaker.clear_breakers()
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_request()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_open_error_is_request_exception():
+    assert issubclass(CircuitOpenError, RequestException)
+
+
+def test_single_half_open_probe(breaker, clock):
+    open_breaker(breaker)
+    clock.return_value = 131.0
+    breaker.check()
+    assert breaker.before_request() is True
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == circuit_breaker.CLOSED
+    assert breaker.before_request() is False
+
+
+def test_trial_due_after_reset_timeout(breaker, clock):
+    assert not breaker.trial_due()
+    open_breaker(breaker)
+    assert not breaker.trial_due()
+    clock.return_value = 131.0
+    assert breaker.trial_due()
+    breaker.before_request()
+    assert not breaker.trial_due()
+
+
+def test_failed_probe_reopens(breaker, clock):
+    open_breaker(breaker)
+    clock.return_value = 131.0
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    clock.return_value = 162.0
+    assert breaker.before_request() is True
+
+
+def test_abandoned_probe_lets_next_request_probe(breaker, clock):
+    open_breaker(breaker)
+    clock.return_value = 131.0
+    breaker.before_request()
+    breaker.abandon()
+    assert breaker.before_request() is True
+
+
+def test_get_breaker_shared_per_device(breaker):
+    first = circuit_breaker.get_breaker('10.0.0.1')
+    assert circuit_breaker.get_breaker('10.0.0.1') is first
+    assert circuit_breaker.get_breaker('10.0.0.2') is not first
@@ -0,0 +1,101 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from eventlet import semaphore
+from f5_heat.resources.common import concurrency
+from f5_heat.resources.common.concurrency import cooperative
+from f5_heat.resources.common.concurrency import DeviceExecutor
+from f5_heat.resources.common.concurrency import json_dumps
+from f5_heat.resources.common.concurrency import json_loads
+from f5_heat.resources.common.concurrency import offload
+
+import eventlet
+import pytest
+
+
+def test_map_preserves_order():
+    def slow_square(value):
+        eventlet.sleep(0.01 * (5 - value))
+        return value * value
+
+    assert DeviceExecutor().map(slow_square, range(5)) == [0, 1, 4, 9, 16]
+
+
+def test_map_respects_limiter():
+    in_flight = []
+    peak = []
+
+    def operation(value):
+        in_flight.append(value)
+        peak.append(len(in_flight))
+        eventlet.sleep(0.01)
+        in_flight.remove(value)
+
+    DeviceExecutor().map(operation, range(10), limiter=semaphore.Semaphore(3))
+    assert max(peak) == 3
+
+
+def test_map_error_cancels_remaining():
+    finished = []
+
+    def operation(value):
+        if value == 0:
+            raise ValueError('test')
+        eventlet.sleep(0.05)
+        finished.append(value)
+
+    with pytest.raises(ValueError):
+        DeviceExecutor().map(operation, range(4))
+    eventlet.sleep(0.1)
+    assert finished == []
+
+
+def test_cancel():
+    finished = []
+    executor = DeviceExecutor()
+    executor.submit(None, lambda: eventlet.sleep(0.05) or finished.append(1))
+    executor.cancel()
+    eventlet.sleep(0.1)
+    assert finished == []
+
+
+def test_cooperative_yields(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(eventlet, 'sleep', sleeps.append)
+    assert list(cooperative(range(250), interval=100)) == list(range(250))
+    assert sleeps == [0, 0]
+
+
+def test_offload():
+    assert offload(sum, [1, 2, 3]) == 6
+
+
+def test_json_loads_offloads_large(monkeypatch):
+    offloaded = []
+    monkeypatch.setattr(concurrency, 'OFFLOAD_THRESHOLD', 10)
+    monkeypatch.setattr(
+        concurrency, 'offload',
+        lambda func, *args: offloaded.append(func) or func(*args)
+    )
+    assert json_loads('{"a": 1}') == {'a': 1}
+    assert offloaded == []
+    assert json_loads('{"a": [1, 2, 3]}') == {'a': [1, 2, 3]}
+    assert len(offloaded) == 1
+
+
+def test_json_dumps_large():
+    assert json_dumps({'a': 1}, large=True) == '{"a": 1}'
@@ -0,0 +1,93 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common import config_sync
+from f5_heat.resources.common.config_sync import ConfigSyncTimeout
+from f5_heat.resources.common.config_sync import SyncCoalescer
+
+import eventlet
+import mock
+import pytest
+
+
+def mock_bigip(*statuses):
+    bigip = mock.MagicMock()
+    bigip.tm.cm.sync_status.entries = mock.MagicMock()
+    descriptions = iter(statuses)
+
+    def refresh():
+        bigip.tm.cm.sync_status.entries = {
+            config_sync.SYNC_STATUS_ENTRY: {
+                'nestedStats': {
+                    'entries': {
+                        'status': {'description': next(descriptions)}
+                    }
+                }
+            }
+        }
+
+    bigip.tm.cm.sync_status.refresh.side_effect = refresh
+    return bigip
+
+
+@pytest.fixture(autouse=True)
+def fast_poll():
+    with mock.patch.object(config_sync, 'SYNC_POLL_INTERVAL', 0):
+        yield
+
+
+def test_requests_share_one_sync():
+    bigip = mock_bigip('Changes Pending', 'In Sync')
+    coalescer = SyncCoalescer('cluster', delay=0.01)
+    threads = [eventlet.spawn(coalescer.sync, bigip) for _ in range(5)]
+    assert [thread.wait() for thread in threads] == [True] * 5
+    assert bigip.tm.cm.exec_cmd.call_args_list == [
+        mock.call('run', utilCmdArgs='config-sync to-group cluster')
+    ]
+
+
+def test_later_request_gets_next_sync():
+    bigip = mock_bigip('In Sync', 'In Sync')
+    coalescer = SyncCoalescer('cluster', delay=0)
+    coalescer.sync(bigip)
+    coalescer.sync(bigip)
+    assert bigip.tm.cm.exec_cmd.call_count == 2
+
+
+def test_sync_timeout():
+    bigip = mock_bigip(*['Changes Pending'] * 5)
+    coalescer = SyncCoalescer('cluster', delay=0, timeout=-1)
+    with pytest.raises(ConfigSyncTimeout):
+        coalescer.sync(bigip)
+
+
+def test_sync_error_raised_to_every_requester():
+    bigip = mock_bigip()
+    bigip.tm.cm.exec_cmd.side_effect = Exception('sync failed')
+    coalescer = SyncCoalescer('cluster', delay=0.01)
+    threads = [eventlet.spawn(coalescer.sync, bigip) for _ in range(2)]
+    for thread in threads:
+        with pytest.raises(Exception) as ex:
+            thread.wait()
+        assert 'sync failed' in str(ex.value)
+
+
+def test_get_coalescer_shared():
+    first = config_sync.get_coalescer('cluster', '10.0.0.1')
+    assert config_sync.get_coalescer('cluster', '10.0.0.1') is first
+    assert config_sync.get_coalescer('cluster', '10.0.0.2') is not first
+    config_sync.clear_coalescers()
@@ -0,0 +1,98 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common import congestion
+from f5_heat.resources.common.congestion import AIMDController
+from f5_heat.resources.common.scheduler import FairScheduler
+
+import mock
+import pytest
+
+
+@pytest.fixture
+def clock():
+    with mock.patch.object(congestion, 'time') as mock_time:
+        mock_time.time.return_value = 100.0
+        yield mock_time.time
+
+
+@pytest.fixture(autouse=True)
+def clear_controllers():
+    yield
+    congestion.clear_controllers()
+
+
+@pytest.fixture
+def controller(clock):
+    return AIMDController(FairScheduler('10.0.0.1', 8), 8)
+
+
+def test_starts_at_max_window(controller):
+    assert controller.scheduler.capacity == 8
+
+
+def test_halves_on_503(controller):
+    controller.on_response(99.0, 503)
+    assert controller.scheduler.capacity == 4
+
+
+def test_halves_on_timeout_once_per_burst(controller, clock):
+    controller.on_timeout(99.0)
+    controller.on_timeout(99.5)
+    assert controller.scheduler.capacity == 4
+    clock.return_value = 101.0
+    controller.on_timeout(100.5)
+    assert controller.scheduler.capacity == 2
+
+
+def test_never_below_min_window(controller, clock):
+    for second in range(10):
+        clock.return_value = 100.0 + second
+        controller.on_timeout(clock.return_value)
+    assert controller.scheduler.capacity == 1
+
+
+def test_halves_on_latency_spike(controller, clock):
+    controller.on_response(99.8, 200)
+    assert controller.scheduler.capacity == 8
+    controller.on_response(98.0, 200)
+    assert controller.scheduler.capacity == 4
+
+
+def test_grows_additively(controller, clock):
+    controller.on_response(99.0, 503)
+    responses = 0
+    while controller.scheduler.capacity == 4:
+        controller.on_response(99.9, 200)
+        responses += 1
+    assert controller.scheduler.capacity == 5
+    assert 4 <= responses <= 5
+    for _ in range(100):
+        controller.on_response(99.9, 200)
+    assert controller.scheduler.capacity == 8
+
+
+def test_get_controller_keeps_window(clock):
+    scheduler = FairScheduler('10.0.0.1', 8)
+    controller = congestion.get_controller(scheduler, 8)
+    controller.on_response(99.0, 503)
+    assert congestion.get_controller(scheduler, 8) is controller
+    assert scheduler.capacity == 4
+    congestion.get_controller(scheduler, 2)
+    assert scheduler.capacity == 2
+    other = FairScheduler('10.0.0.2', 8)
+    assert congestion.get_controller(other, 8) is not controller
@@ -0,0 +1,106 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common import endpoints
+from f5_heat.resources.common.endpoints import EndpointSelector
+from requests import ConnectionError
+
+import datetime
+import mock
+import pytest
+
+
+def probe_response(seconds, status_code=401):
+    response = mock.MagicMock(status_code=status_code)
+    response.elapsed = datetime.timedelta(seconds=seconds)
+    return response
+
+
+@pytest.fixture
+def mock_get():
+    with mock.patch.object(endpoints.requests, 'get') as mock_get:
+        yield mock_get
+
+
+def answers(latencies):
+    def get(url, **kwargs):
+        for endpoint, latency in latencies.items():
+            netloc = endpoints.endpoint_netloc(endpoint)
+            if url.startswith('https://{0}/'.format(netloc)):
+                if isinstance(latency, Exception):
+                    raise latency
+                return probe_response(latency)
+    return get
+
+
+@pytest.fixture
+def selector():
+    return EndpointSelector(
+        '10.0.0.1', ['10.0.0.1', '2001:db8::1', '10.0.0.100'], (5, 30)
+    )
+
+
+def test_endpoint_netloc():
+    assert endpoints.endpoint_netloc('10.0.0.1') == '10.0.0.1'
+    assert endpoints.endpoint_netloc('2001:db8::1') == '[2001:db8::1]'
+
+
+def test_picks_fastest_healthy(selector, mock_get):
+    mock_get.side_effect = answers({
+        '10.0.0.1': 0.2,
+        '2001:db8::1': 0.05,
+        '10.0.0.100': ConnectionError('unreachable')
+    })
+    assert selector.current() == '2001:db8::1'
+    assert mock_get.call_count == 3
+    assert selector.current() == '2001:db8::1'
+    assert mock_get.call_count == 3
+
+
+def test_fails_over_to_next_best(selector, mock_get):
+    mock_get.side_effect = answers({
+        '10.0.0.1': 0.2, '2001:db8::1': 0.05, '10.0.0.100': 0.1
+    })
+    selector.current()
+    selector.failed('2001:db8::1')
+    assert selector.current() == '10.0.0.100'
+    selector.failed('10.0.0.100')
+    selector.failed('10.0.0.1')
+    assert selector.current() == '10.0.0.1'
+
+
+def test_server_errors_unhealthy(selector, mock_get):
+    mock_get.return_value = probe_response(0.01, status_code=503)
+    assert selector.probe() == []
+
+
+def test_reprobes_in_background(selector, mock_get):
+    mock_get.side_effect = answers({
+        '10.0.0.1': 0.2, '2001:db8::1': 0.05, '10.0.0.100': 0.1
+    })
+    selector.current()
+    selector._probed_at = 0
+    with mock.patch.object(endpoints.eventlet, 'spawn_n') as mock_spawn:
+        selector.current()
+    assert mock_spawn.call_args == mock.call(selector._reprobe)
+
+
+def test_endpoint_netloc_with_port():
+    assert endpoints.endpoint_netloc('10.0.0.1:8443') == '10.0.0.1:8443'
+    assert endpoints.endpoint_netloc('2001:db8::1') == '[2001:db8::1]'
+    assert endpoints.endpoint_netloc('[2001:db8::1]:8443') == \
+        '[2001:db8::1]:8443'
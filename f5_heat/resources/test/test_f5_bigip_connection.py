@@ -0,0 +1,274 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5.bigip import ManagementRoot
+from f5_heat.resources.common.circuit_breaker import CircuitBreaker
+from f5_heat.resources.common.circuit_breaker import CircuitOpenError
+from f5_heat.resources.common import f5_bigip_connection
+from f5_heat.resources.common import request_context
+from requests import ConnectionError
+from requests import ReadTimeout
+
+import mock
+import pytest
+
+
+version_payload = {
+    'kind': 'tm:sys:version:versionstats',
+    'selfLink': 'https://localhost/mgmt/tm/sys/version?ver=12.1.0'
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_connections():
+    yield
+    f5_bigip_connection.clear_connections()
+
+
+@pytest.fixture
+def mock_session():
+    with mock.patch.object(
+            f5_bigip_connection, 'iControlRESTSession'
+    ) as mock_icrs:
+        mock_icrs.return_value.get.return_value.json.return_value = \
+            version_payload
+        yield mock_icrs.return_value
+
+
+def test_probe(mock_session):
+    connection = f5_bigip_connection.BigIPConnection(
+        '10.0.0.1', 'admin', 'admin', connect_timeout=2, read_timeout=10
+    )
+    assert connection.probe() == '12.1.0'
+    assert mock_session.get.call_args == mock.call(
+        'https://10.0.0.1/mgmt/tm/sys/version', timeout=(2, 10)
+    )
+
+
+def test_probe_connection_seeds_cache(mock_session):
+    probed = f5_bigip_connection.probe_connection(
+        '10.0.0.1', 'admin', 'admin'
+    )
+    assert probed.tmos_version == '12.1.0'
+    assert f5_bigip_connection.get_connection(
+        '10.0.0.1', 'admin', 'admin') is probed
+
+
+def test_probe_connection_error_not_cached(mock_session):
+    mock_session.get.side_effect = ConnectionError('unreachable')
+    with pytest.raises(ConnectionError):
+        f5_bigip_connection.probe_connection('10.0.0.1', 'admin', 'admin')
+    assert f5_bigip_connection._CONNECTIONS == {}
+
+
+def test_get_connection_password_change(mock_session):
+    first = f5_bigip_connection.get_connection('10.0.0.1', 'admin', 'admin')
+    assert f5_bigip_connection.get_connection(
+        '10.0.0.1', 'admin', 'admin') is first
+    second = f5_bigip_connection.get_connection('10.0.0.1', 'admin', 'new')
+    assert second is not first
+
+
+def test_bigip_reuses_probed_session(mock_session):
+    connection = f5_bigip_connection.probe_connection(
+        '10.0.0.1', 'admin', 'admin'
+    )
+    bigip = connection.bigip
+    assert isinstance(bigip, ManagementRoot)
+    assert bigip.tmos_version == '12.1.0'
+    assert bigip._meta_data['icr_session'] is connection.icr_session
+    assert mock_session.get.call_count == 1
+    assert connection.bigip is bigip
+
+
+def test_device_adapter_default_timeout():
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10))
+    with mock.patch.object(
+            f5_bigip_connection.HTTPAdapter, 'send'
+    ) as mock_send:
+        adapter.send(mock.MagicMock())
+        adapter.send(mock.MagicMock(), timeout=1)
+    assert mock_send.call_args_list[0][1]['timeout'] == (2, 10)
+    assert mock_send.call_args_list[1][1]['timeout'] == 1
+
+
+def test_get_capabilities_cached(mock_session):
+    connection = f5_bigip_connection.probe_connection(
+        '10.0.0.1', 'admin', 'admin'
+    )
+    mock_session.get.return_value.json.return_value = {
+        'items': [{'name': 'ltm', 'level': 'nominal'}]
+    }
+    capabilities = connection.get_capabilities()
+    assert connection.get_capabilities() is capabilities
+    assert mock_session.get.call_count == 2
+    assert mock_session.get.call_args == mock.call(
+        'https://10.0.0.1/mgmt/tm/sys/provision', timeout=(5, 30)
+    )
+
+
+def test_get_capabilities_expired(mock_session):
+    connection = f5_bigip_connection.probe_connection(
+        '10.0.0.1', 'admin', 'admin'
+    )
+    mock_session.get.return_value.json.return_value = {'items': []}
+    connection.get_capabilities()
+    connection.get_capabilities(ttl=-1)
+    assert mock_session.get.call_count == 3
+
+
+def test_device_adapter_schedules_by_stack():
+    scheduler = mock.MagicMock()
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10), scheduler=scheduler)
+    context = request_context.RequestContext(stack_id='stack', weight=2.0)
+    with mock.patch.object(f5_bigip_connection.HTTPAdapter, 'send'):
+        adapter.send(mock.MagicMock())
+        with request_context.bind(context):
+            adapter.send(mock.MagicMock())
+    assert scheduler.acquire.call_args_list == [
+        mock.call('default'), mock.call('stack', 2.0)
+    ]
+    assert scheduler.release.call_count == 2
+
+
+def test_device_adapter_releases_on_error():
+    scheduler = mock.MagicMock()
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10), scheduler=scheduler)
+    with mock.patch.object(
+            f5_bigip_connection.HTTPAdapter,
+            'send',
+            side_effect=ConnectionError('unreachable')
+    ):
+        with pytest.raises(ConnectionError):
+            adapter.send(mock.MagicMock())
+    assert scheduler.release.call_count == 1
+
+
+def test_device_adapter_reports_to_controller():
+    controller = mock.MagicMock()
+    adapter = f5_bigip_connection.DeviceAdapter(
+        (2, 10), controller=controller
+    )
+    with mock.patch.object(
+            f5_bigip_connection.HTTPAdapter, 'send'
+    ) as mock_send:
+        mock_send.return_value.status_code = 503
+        adapter.send(mock.MagicMock())
+        mock_send.side_effect = ReadTimeout('slow')
+        with pytest.raises(ReadTimeout):
+            adapter.send(mock.MagicMock())
+    assert controller.on_response.call_args[0][1] == 503
+    assert controller.on_timeout.call_count == 1
+
+
+def test_device_adapter_trips_breaker():
+    breaker = CircuitBreaker('10.0.0.1', failure_threshold=2)
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10), breaker=breaker)
+    with mock.patch.object(
+            f5_bigip_connection.HTTPAdapter,
+            'send',
+            side_effect=ConnectionError('unreachable')
+    ) as mock_send:
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                adapter.send(mock.MagicMock())
+        with pytest.raises(CircuitOpenError):
+            adapter.send(mock.MagicMock())
+    assert mock_send.call_count == 2
+
+
+def test_bigip_fails_fast_while_breaker_open(mock_session):
+    connection = f5_bigip_connection.get_connection(
+        '10.0.0.1', 'admin', 'admin'
+    )
+    for _ in range(connection.breaker.failure_threshold):
+        connection.breaker.record_failure()
+    other = f5_bigip_connection.get_connection('10.0.0.1', 'admin', 'new')
+    with pytest.raises(CircuitOpenError):
+        other.bigip
+    assert mock_session.get.call_count == 0
+
+
+def test_device_shared_between_usernames(mock_session):
+    first = f5_bigip_connection.get_connection('10.0.0.1', 'admin', 'admin')
+    other = f5_bigip_connection.get_connection('10.0.0.1', 'other', 'other')
+    assert other.scheduler is first.scheduler
+    assert other.controller is first.controller
+    assert other.limiter is first.limiter
+    elsewhere = f5_bigip_connection.get_connection(
+        '10.0.0.2', 'admin', 'admin'
+    )
+    assert elsewhere.scheduler is not first.scheduler
+
+
+def test_device_shared_after_probe(mock_session):
+    connection = f5_bigip_connection.get_connection(
+        '10.0.0.1', 'admin', 'admin'
+    )
+    connection.controller.on_timeout(0.0)
+    probed = f5_bigip_connection.probe_connection(
+        '10.0.0.1', 'admin', 'admin'
+    )
+    assert probed is not connection
+    assert probed.scheduler is connection.scheduler
+    assert probed.controller is connection.controller
+    assert probed.limiter is connection.limiter
+    assert probed.scheduler.capacity == 4
+    resized = f5_bigip_connection.probe_connection(
+        '10.0.0.1', 'admin', 'admin', max_concurrency=4
+    )
+    assert resized.limiter is not connection.limiter
+
+
+def test_device_adapter_retries_reads():
+    policy = f5_bigip_connection.RetryPolicy(base_delay=0)
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10), retry_policy=policy)
+    request = mock.MagicMock(method='GET', url='https://10.0.0.1/mgmt/tm')
+    with mock.patch.object(
+            f5_bigip_connection.HTTPAdapter,
+            'send',
+            side_effect=[ReadTimeout('slow'), mock.MagicMock(status_code=200)]
+    ) as mock_send:
+        assert adapter.send(request).status_code == 200
+    assert mock_send.call_count == 2
+
+
+def test_device_adapter_routes_to_selected_endpoint():
+    selector = mock.MagicMock()
+    selector.current.return_value = '2001:db8::1'
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10), selector=selector)
+    request = mock.MagicMock(url='https://10.0.0.1/mgmt/tm/sys?ver=12.1.0')
+    with mock.patch.object(
+            f5_bigip_connection.HTTPAdapter,
+            'send',
+            side_effect=ConnectionError('unreachable')
+    ):
+        with pytest.raises(ConnectionError):
+            adapter.send(request)
+    assert request.copy.return_value.url == \
+        'https://[2001:db8::1]/mgmt/tm/sys?ver=12.1.0'
+    assert selector.failed.call_args == mock.call('2001:db8::1')
+
+
+def test_management_port(mock_session):
+    connection = f5_bigip_connection.probe_connection(
+        '10.0.0.1:8443', 'admin', 'admin'
+    )
+    assert mock_session.get.call_args[0][0] == \
+        'https://10.0.0.1:8443/mgmt/tm/sys/version'
+    assert connection.bigip._meta_data['uri'] == \
+        'https://10.0.0.1:8443/mgmt/'
@@ -14,6 +14,8 @@
 #
 
 from f5.bigip import ManagementRoot
+from f5_heat.resources.common.capabilities import DeviceCapabilities
+from f5_heat.resources.common import f5_bigip_connection
 from f5_heat.resources import f5_bigip_device
 from f5_heat.resources.f5_bigip_device import BigIPConnectionFailed
 from heat.common import exception
@@ -21,6 +23,7 @@ from heat.common import template_format
 from heat.engine.hot.template import HOTemplate20150430
 from heat.engine import rsrc_defn
 from heat.engine import template
+from requests import ConnectionError
 
 import mock
 import pytest
@@ -79,9 +82,14 @@ def create_resource_definition(templ_dict):
     return rsrc_def
 
 
+@pytest.fixture(autouse=True)
+def clear_connections():
+    yield
+    f5_bigip_connection.clear_connections()
+
+
 @pytest.fixture
-@mock.patch('f5_heat.resources.f5_bigip_device.ManagementRoot')
-def F5BigIP(mock_mr):
+def F5BigIP():
     '''Instantiate the F5BigIP resource.'''
     template_dict = mock_template()
     rsrc_def = create_resource_definition(template_dict)
@@ -95,23 +103,34 @@ def F5BigIP(mock_mr):
 
 @pytest.fixture
 def F5BigIPSideEffect(F5BigIP):
-    F5BigIP.get_bigip = mock.MagicMock()
-    return F5BigIP
+    capabilities = DeviceCapabilities('12.1.0', ['ltm', 'asm'])
+    with mock.patch.object(
+            f5_bigip_connection.BigIPConnection, 'probe', return_value='12.1.0'
+    ):
+        with mock.patch.object(
+                f5_bigip_connection.BigIPConnection,
+                'get_capabilities',
+                return_value=capabilities
+        ):
+            yield F5BigIP
 
 
 @pytest.fixture
 def F5BigIPHTTPError(F5BigIP):
     '''Instantiate the F5BigIP resource.'''
-    mock_get_bigip = mock.MagicMock(side_effect=BigIPConnectionFailed)
-    F5BigIP.get_bigip = mock_get_bigip
-    return F5BigIP
+    with mock.patch.object(
+            f5_bigip_connection.BigIPConnection,
+            'probe',
+            side_effect=ConnectionError('unreachable')
+    ):
+        yield F5BigIP
 
 
 # Tests
 
 # Removed __init__ override, so removing test
 @mock.patch.object(
-    f5_bigip_device.ManagementRoot,
+    ManagementRoot,
     '__init__',
     side_effect=Exception()
 )
@@ -132,6 +151,32 @@ def test_handle_create(F5BigIPSideEffect):
     assert F5BigIPSideEffect.resource_id is not None
 
 
+def test_handle_create_seeds_connection(F5BigIPSideEffect):
+    F5BigIPSideEffect.handle_create()
+    connection = F5BigIPSideEffect.get_connection()
+    assert connection.probe.call_count == 1
+    assert connection.get_capabilities.call_args == mock.call(3600)
+    assert connection.timeout == (5, 30)
+
+
+def test_resolve_attributes(F5BigIPSideEffect):
+    assert F5BigIPSideEffect._resolve_attribute('tmos_version') == '12.1.0'
+    assert F5BigIPSideEffect._resolve_attribute('provisioned_modules') == \
+        ['asm', 'ltm']
+    assert 'transactions' in \
+        F5BigIPSideEffect._resolve_attribute('features')
+
+
+def test_resolve_attribute_unreachable(F5BigIP):
+    with mock.patch.object(
+            f5_bigip_connection.BigIPConnection,
+            'get_capabilities',
+            side_effect=ConnectionError('unreachable')
+    ):
+        with pytest.raises(BigIPConnectionFailed):
+            F5BigIP._resolve_attribute('tmos_version')
+
+
 def test_handle_create_http_error(F5BigIPHTTPError):
     with pytest.raises(BigIPConnectionFailed):
         F5BigIPHTTPError.handle_create()
@@ -142,10 +187,7 @@ def test_handle_delete(F5BigIP):
     assert delete_result is True
 
 
-@mock.patch(
-    'f5_heat.resources.f5_bigip_device.ManagementRoot.__init__',
-    return_value=None
-)
+@mock.patch('f5.bigip.ManagementRoot.__init__', return_value=None)
 def test_bigip_getter(mock_mr_init):
     template_dict = mock_template(test_templ=bad_f5_bigip_defn)
     rsrc_def = create_resource_definition(template_dict)
@@ -156,10 +198,29 @@ def test_bigip_getter(mock_mr_init):
     )
     bigip = f5_bigip_obj.get_bigip()
     assert isinstance(bigip, ManagementRoot)
+    assert f5_bigip_obj.get_bigip() is bigip
+
+
+@mock.patch('f5.bigip.ManagementRoot.__init__', return_value=None)
+def test_session_from_one_connection(mock_mr_init):
+    template_dict = mock_template(test_templ=bad_f5_bigip_defn)
+    rsrc_def = create_resource_definition(template_dict)
+    f5_bigip_obj = f5_bigip_device.F5BigIPDevice(
+        'test',
+        rsrc_def,
+        mock.MagicMock()
+    )
+    with mock.patch.object(
+            f5_bigip_obj, 'get_connection',
+            wraps=f5_bigip_obj.get_connection
+    ) as mock_get:
+        session = f5_bigip_obj.get_session()
+    assert mock_get.call_count == 1
+    assert session.bigip is session.connection.bigip
+    assert session.rest_client is None
 
 
-@mock.patch('f5_heat.resources.f5_bigip_device.ManagementRoot')
-def test_bad_property(mock_mr):
+def test_bad_property():
     template_dict = mock_template(test_templ=bad_f5_bigip_defn)
     rsrc_def = create_resource_definition(template_dict)
     f5_bigip_obj = f5_bigip_device.F5BigIPDevice(
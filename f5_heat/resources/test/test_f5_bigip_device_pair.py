@@ -0,0 +1,198 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.capabilities import DeviceCapabilities
+from f5_heat.resources.common import f5_bigip_connection
+from f5_heat.resources.common import failover
+from f5_heat.resources.f5_bigip_device import BigIPConnectionFailed
+from f5_heat.resources import f5_bigip_device_pair
+from heat.common import template_format
+from heat.engine.hot.template import HOTemplate20150430
+from heat.engine import rsrc_defn
+from heat.engine import template
+from requests import ConnectionError
+
+import mock
+import pytest
+
+f5_bigip_pair_defn = '''
+heat_template_version: 2015-04-30
+description: Testing BigIP device pair plugin
+resources:
+  bigip_rsrc:
+    type: F5::BigIP::DevicePair
+    properties:
+      ip: 10.0.0.1
+      peer_ip: 10.0.0.2
+      username: admin
+      password: admin
+'''
+
+versions = ('2015-04-30', '2015-04-30')
+
+
+@mock.patch.object(template, 'get_version', return_value=versions)
+@mock.patch.object(
+    template,
+    'get_template_class',
+    return_value=HOTemplate20150430
+)
+def mock_template(templ_vers, templ_class, test_templ=f5_bigip_pair_defn):
+    '''Mock a Heat template for the Kilo version.'''
+    templ_dict = template_format.parse(test_templ)
+    return templ_dict
+
+
+def create_resource_definition(templ_dict):
+    '''Create resource definition.'''
+    rsrc_def = rsrc_defn.ResourceDefinition(
+        'test_stack',
+        templ_dict['resources']['bigip_rsrc']['type'],
+        properties=templ_dict['resources']['bigip_rsrc']['properties']
+    )
+    return rsrc_def
+
+
+def status_payload(status):
+    return {
+        'entries': {
+            'https://localhost/mgmt/tm/cm/failoverStatus/0': {
+                'nestedStats': {
+                    'entries': {'status': {'description': status}}
+                }
+            }
+        }
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_connections():
+    yield
+    f5_bigip_connection.clear_connections()
+    failover.clear_trackers()
+
+
+@pytest.fixture
+def statuses():
+    '''Failover status of each unit, by hostname.'''
+
+    statuses = {'10.0.0.1': 'STANDBY', '10.0.0.2': 'ACTIVE'}
+
+    def status(connection):
+        return statuses[connection.hostname]
+
+    with mock.patch.object(
+            failover, 'failover_status', side_effect=status
+    ) as mock_status, mock.patch.object(
+        f5_bigip_connection, 'iControlRESTSession'
+    ):
+        mock_status.statuses = statuses
+        yield mock_status
+
+
+@pytest.fixture
+def F5BigIPPair():
+    template_dict = mock_template()
+    rsrc_def = create_resource_definition(template_dict)
+    pair = f5_bigip_device_pair.F5BigIPDevicePair(
+        'testing_pair', rsrc_def, mock.MagicMock()
+    )
+    pair.uuid = '5abe95ca-0bc9-4158-b51b-366156ea9448'
+    pair.validate()
+    return pair
+
+
+def test_routes_to_active_unit(F5BigIPPair, statuses):
+    assert F5BigIPPair.get_connection().hostname == '10.0.0.2'
+    assert F5BigIPPair._resolve_attribute('active_unit') == '10.0.0.2'
+    assert statuses.call_count == 2
+
+
+def test_session_consults_tracker_once(F5BigIPPair, statuses):
+    with mock.patch.object(
+            f5_bigip_device_pair, 'get_tracker', wraps=failover.get_tracker
+    ) as mock_tracker, mock.patch.object(
+        f5_bigip_connection.BigIPConnection, 'bigip'
+    ) as mock_bigip:
+        session = F5BigIPPair.get_session()
+    assert mock_tracker.call_count == 1
+    assert session.connection.hostname == '10.0.0.2'
+    assert session.bigip is mock_bigip
+
+
+def test_failover_state_cached(F5BigIPPair, statuses):
+    F5BigIPPair.get_connection()
+    statuses.statuses['10.0.0.1'] = 'ACTIVE'
+    statuses.statuses['10.0.0.2'] = 'STANDBY'
+    assert F5BigIPPair.get_connection().hostname == '10.0.0.2'
+    assert statuses.call_count == 2
+
+
+def test_reroutes_after_failover(F5BigIPPair, statuses):
+    tracker = failover.get_tracker(['10.0.0.1', '10.0.0.2'])
+    F5BigIPPair.get_connection()
+    statuses.statuses['10.0.0.1'] = 'ACTIVE'
+    statuses.statuses['10.0.0.2'] = 'STANDBY'
+    tracker._checked_at = 0
+    assert F5BigIPPair.get_connection().hostname == '10.0.0.1'
+
+
+def test_reroutes_when_active_unit_down(F5BigIPPair, statuses):
+    active = F5BigIPPair.get_connection()
+    statuses.statuses['10.0.0.1'] = 'ACTIVE'
+    statuses.statuses['10.0.0.2'] = None
+    for _ in range(active.breaker.failure_threshold):
+        active.breaker.record_failure()
+    assert F5BigIPPair.get_connection().hostname == '10.0.0.1'
+
+
+def test_no_active_unit_uses_first(F5BigIPPair, statuses):
+    statuses.statuses['10.0.0.2'] = 'STANDBY'
+    assert F5BigIPPair.get_connection().hostname == '10.0.0.1'
+
+
+def test_handle_create_probes_both_units(F5BigIPPair, statuses):
+    with mock.patch.object(
+            f5_bigip_device_pair, 'probe_connection'
+    ) as mock_probe, mock.patch.object(
+        f5_bigip_connection.BigIPConnection,
+        'get_capabilities',
+        return_value=DeviceCapabilities('12.1.0', ['ltm'])
+    ):
+        F5BigIPPair.handle_create()
+    assert sorted(call[0][0] for call in mock_probe.call_args_list) == \
+        ['10.0.0.1', '10.0.0.2']
+    assert F5BigIPPair.resource_id is not None
+
+
+def test_handle_create_unreachable_unit(F5BigIPPair):
+    with mock.patch.object(
+            f5_bigip_device_pair,
+            'probe_connection',
+            side_effect=ConnectionError('unreachable')
+    ):
+        with pytest.raises(BigIPConnectionFailed):
+            F5BigIPPair.handle_create()
+
+
+def test_failover_status_parsing():
+    connection = mock.MagicMock()
+    connection.icr_session.get.return_value.json.return_value = \
+        status_payload('active')
+    assert failover.failover_status(connection) == 'ACTIVE'
+    connection.icr_session.get.side_effect = ConnectionError('unreachable')
+    assert failover.failover_status(connection) is None
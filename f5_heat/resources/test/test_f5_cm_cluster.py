@@ -20,6 +20,7 @@ from heat.common import template_format
 from heat.engine.hot.template import HOTemplate20150430
 from heat.engine import rsrc_defn
 from heat.engine import template
+from requests import ConnectionError
 
 import mock
 import pytest
@@ -161,3 +162,74 @@ def test_handle_delete_f5sdkerror(ClusterMgrF5SDKError):
 def test_resource_mapping():
     rsrc_map = f5_cm_cluster.resource_mapping()
     assert rsrc_map == {'F5::Cm::Cluster': f5_cm_cluster.F5CmCluster}
+
+
+def devices_by_refid(cluster, states):
+    '''Give each device of the cluster a breaker in the given state.'''
+
+    devices = {}
+    for refid, state in zip(cluster.properties['devices'], states):
+        device = mock.MagicMock(name=refid)
+        device.get_connection.return_value.breaker.state = state
+        device.get_connection.return_value.breaker.trial_due.return_value = \
+            False
+        device.get_connection.return_value.hostname = refid
+        devices[refid] = device
+    cluster.stack.resource_by_refid.side_effect = devices.get
+    return devices
+
+
+def test_writes_to_first_reachable_device(F5CmCluster):
+    cluster, _ = F5CmCluster
+    devices = devices_by_refid(cluster, ['open', 'closed', 'closed'])
+    assert cluster.get_bigip() is devices['bigip_rsrc2'].get_bigip()
+    assert cluster.get_rest_client() is \
+        devices['bigip_rsrc2'].get_rest_client()
+
+
+def test_no_reachable_device_uses_first(F5CmCluster):
+    cluster, _ = F5CmCluster
+    devices = devices_by_refid(cluster, ['open', 'open', 'open'])
+    assert cluster.get_connection() is \
+        devices['bigip_rsrc1'].get_connection()
+
+
+def test_recovered_device_probed(F5CmCluster):
+    cluster, _ = F5CmCluster
+    devices = devices_by_refid(cluster, ['open', 'closed', 'closed'])
+    first = devices['bigip_rsrc1'].get_connection()
+    first.breaker.trial_due.return_value = True
+    assert cluster.get_connection() is first
+    assert first.probe.call_count == 1
+    first.probe.side_effect = ConnectionError('still down')
+    assert cluster.get_connection() is \
+        devices['bigip_rsrc2'].get_connection()
+
+
+def test_session_from_one_writer(F5CmCluster):
+    cluster, _ = F5CmCluster
+    devices = devices_by_refid(cluster, ['open', 'closed', 'closed'])
+    first = devices['bigip_rsrc1'].get_connection()
+    first.breaker.trial_due.return_value = True
+    assert cluster.get_session() is devices['bigip_rsrc1'].get_session()
+    assert first.probe.call_count == 1
+
+
+def test_request_sync(F5CmCluster):
+    cluster, _ = F5CmCluster
+    devices = devices_by_refid(cluster, ['closed', 'closed', 'closed'])
+    with mock.patch.object(f5_cm_cluster, 'get_coalescer') as mock_get:
+        cluster.request_sync()
+    assert mock_get.call_args == mock.call('test_cluster', 'bigip_rsrc1')
+    assert mock_get.return_value.sync.call_args == \
+        mock.call(devices['bigip_rsrc1'].get_connection().bigip)
+
+
+def test_request_sync_from_written_device(F5CmCluster):
+    cluster, _ = F5CmCluster
+    devices = devices_by_refid(cluster, ['closed', 'closed', 'closed'])
+    written = devices['bigip_rsrc2'].get_connection()
+    with mock.patch.object(f5_cm_cluster, 'get_coalescer') as mock_get:
+        cluster.request_sync(written)
+    assert mock_get.call_args == mock.call('test_cluster', 'bigip_rsrc2')
+    assert mock_get.return_value.sync.call_args == mock.call(written.bigip)
@@ -115,6 +115,7 @@ def F5LTMPool():
     rsrc_def = create_resource_definition(template_dict)
     mock_stack = mock.MagicMock()
     mock_stack.resource_by_refid().get_partition_name.return_value = 'Common'
+    mock_stack.resource_by_refid().get_session().rest_client = None
     f5_pool_obj = f5_ltm_pool.F5LTMPool(
         'testing_pool', rsrc_def, mock_stack
     )
@@ -216,3 +217,48 @@ def test_bad_property():
     )
     with pytest.raises(exception.StackValidationFailed):
         f5_ltm_pool_obj.validate()
+
+
+@pytest.fixture
+def F5LTMPoolFastPath(F5LTMPool):
+    F5LTMPool.stack.resource_by_refid().get_session().rest_client = \
+        mock.MagicMock()
+    return F5LTMPool
+
+
+def test_handle_create_fast_path(F5LTMPoolFastPath):
+    F5LTMPoolFastPath.handle_create()
+    rest_client = F5LTMPoolFastPath.rest_client
+    assert rest_client.create_pool.call_args == mock.call(
+        name=u'testing_pool',
+        partition=u'Common',
+        service_down_action='Reject',
+        members=[
+            {'name': '128.0.0.1:80', 'partition': 'Common',
+             'address': '128.0.0.1'},
+            {'name': '129.0.0.1:80', 'partition': 'Common',
+             'address': '129.0.0.1'}
+        ]
+    )
+    assert F5LTMPoolFastPath.bigip.tm.ltm.pools.pool.create.called is False
+
+
+def test_handle_delete_fast_path(F5LTMPoolFastPath):
+    assert F5LTMPoolFastPath.handle_delete() is True
+    assert F5LTMPoolFastPath.rest_client.delete_pool.call_args == \
+        mock.call('testing_pool', 'Common')
+    assert F5LTMPoolFastPath.bigip.tm.ltm.pools.pool.exists.called is False
+
+
+def test_handle_delete_fast_path_error(F5LTMPoolFastPath):
+    F5LTMPoolFastPath.stack.resource_by_refid().get_session().rest_client\
+        .delete_pool.side_effect = Exception('test')
+    with pytest.raises(exception.ResourceFailure):
+        F5LTMPoolFastPath.handle_delete()
+
+
+def test_assign_members_loads_pool_once(F5LTMPool):
+    F5LTMPool.handle_create()
+    pool = F5LTMPool.bigip.tm.ltm.pools.pool
+    assert pool.load.call_count == 1
+    assert pool.load().members_s.members.create.call_count == 2
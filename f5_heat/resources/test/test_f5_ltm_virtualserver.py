@@ -112,6 +112,7 @@ def F5LTMVirtualServer():
     rsrc_def = create_resource_definition(template_dict)
     mock_stack = mock.MagicMock()
     mock_stack.resource_by_refid().get_partition_name.return_value = 'Common'
+    mock_stack.resource_by_refid().get_session().rest_client = None
     f5_vs_obj = f5_ltm_virtualserver.F5LTMVirtualServer(
         'testing_vs', rsrc_def, mock_stack
     )
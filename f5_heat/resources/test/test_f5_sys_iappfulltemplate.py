@@ -148,6 +148,7 @@ def F5SysiAppTemplate():
     rsrc_def = create_resource_definition(template_dict)
     mock_stack = mock.MagicMock()
     mock_stack.resource_by_refid().get_partition_name.return_value = 'Common'
+    mock_stack.resource_by_refid().get_session().rest_client = None
     return f5_sys_iappfulltemplate.F5SysiAppFullTemplate(
         "iapp_template", rsrc_def, mock_stack
     )
@@ -149,6 +149,7 @@ def F5SysiAppService():
     rsrc_def = create_resource_definition(template_dict)
     mock_stack = mock.MagicMock()
     mock_stack.resource_by_refid().get_partition_name.return_value = 'Common'
+    mock_stack.resource_by_refid().get_session().rest_client = None
     return f5_sys_iappservice.F5SysiAppService(
         "testing_service", rsrc_def, mock_stack
     )
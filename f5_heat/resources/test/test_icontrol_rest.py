@@ -0,0 +1,107 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.icontrol_rest import iControlRESTClient
+from requests import HTTPError
+
+import json
+import mock
+import pytest
+
+
+@pytest.fixture
+def client():
+    connection = mock.MagicMock()
+    connection.base_uri = 'https://10.0.0.1/mgmt/'
+    return iControlRESTClient(connection)
+
+
+def http_error(status_code):
+    return HTTPError(response=mock.MagicMock(status_code=status_code))
+
+
+def test_create_pool(client):
+    client.create_pool(
+        name='pool1',
+        partition='Common',
+        members=[{'name': '1.1.1.1:80', 'address': '1.1.1.1'}]
+    )
+    uri, = client.session.post.call_args[0]
+    assert uri == 'https://10.0.0.1/mgmt/tm/ltm/pool'
+    assert json.loads(client.session.post.call_args[1]['data']) == {
+        'name': 'pool1',
+        'partition': 'Common',
+        'members': [{'name': '1.1.1.1:80', 'address': '1.1.1.1'}]
+    }
+
+
+def test_create_member(client):
+    client.create_member(
+        'pool1', name='1.1.1.1:80', partition='test', address='1.1.1.1'
+    )
+    assert client.session.post.call_args[0][0] == \
+        'https://10.0.0.1/mgmt/tm/ltm/pool/~test~pool1/members'
+
+
+def test_delete_virtual(client):
+    assert client.delete_virtual('vs1', 'Common') is True
+    assert client.session.delete.call_args == mock.call(
+        'https://10.0.0.1/mgmt/tm/ltm/virtual/~Common~vs1'
+    )
+
+
+def test_delete_service_app_folder(client):
+    client.delete_service('svc', 'test')
+    assert client.session.delete.call_args == mock.call(
+        'https://10.0.0.1/mgmt/tm/sys/application/service/'
+        '~test~svc.app~svc'
+    )
+
+
+def test_create_service_not_retrieved(client):
+    client.session.post.side_effect = HTTPError(response=mock.MagicMock(
+        status_code=400,
+        text='{"code": 400, "message": "The configuration was updated '
+             'successfully but could not be retrieved"}'
+    ))
+    client.session.get.return_value.json.return_value = {'name': 'svc'}
+    assert client.create_service(name='svc', partition='test') == \
+        {'name': 'svc'}
+    assert client.session.get.call_args == mock.call(
+        'https://10.0.0.1/mgmt/tm/sys/application/service/'
+        '~test~svc.app~svc'
+    )
+
+
+def test_create_service_error(client):
+    client.session.post.side_effect = HTTPError(response=mock.MagicMock(
+        status_code=400, text='{"code": 400, "message": "invalid"}'
+    ))
+    with pytest.raises(HTTPError):
+        client.create_service(name='svc', partition='test')
+    assert client.session.get.call_count == 0
+
+
+def test_delete_missing(client):
+    client.session.delete.side_effect = http_error(404)
+    assert client.delete_template('tmpl', 'Common') is False
+
+
+def test_delete_error(client):
+    client.session.delete.side_effect = http_error(400)
+    with pytest.raises(HTTPError):
+        client.delete_pool('pool1', 'Common')
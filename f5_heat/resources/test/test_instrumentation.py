@@ -0,0 +1,258 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.config import CONF
+from f5_heat.resources.common import f5_bigip_connection
+from f5_heat.resources.common import instrumentation
+from f5_heat.resources.common import metrics
+from f5_heat.resources.common import mixins
+from f5_heat.resources.common import request_context
+from requests import ConnectionError
+from requests.models import Response
+from requests import Request
+
+import mock
+import os
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    yield
+    for option in ('metrics_enabled', 'metrics_file',
+                   'metrics_notifications', 'metrics_interval'):
+        CONF.clear_override(option, group='f5_heat')
+    metrics.REGISTRY.reset()
+    instrumentation._LAST_EXPORT['at'] = None
+
+
+@pytest.fixture
+def enabled():
+    CONF.set_override('metrics_enabled', True, group='f5_heat')
+
+
+def counters():
+    return metrics.REGISTRY.snapshot()['counters']
+
+
+def labels(**values):
+    return tuple(sorted(values.items()))
+
+
+def request(method='GET', path='tm/ltm/pool', body=None):
+    return Request(method, 'https://10.0.0.1/mgmt/' + path,
+                   data=body).prepare()
+
+
+def response(body=b'{}'):
+    response = Response()
+    response.status_code = 200
+    response._content = body
+    return response
+
+
+@pytest.mark.parametrize('url,expected', [
+    ('https://10.0.0.1/mgmt/tm/ltm/pool?ver=12.1.0', '/mgmt/tm/ltm/pool'),
+    ('https://10.0.0.1/mgmt/tm/ltm/pool/~Common~web/members/'
+     '~Common~10.0.0.1:80', '/mgmt/tm/ltm/pool/{name}/members/{name}'),
+    ('https://10.0.0.1/mgmt/tm/transaction/1476/commands',
+     '/mgmt/tm/transaction/{id}/commands'),
+    ('https://10.0.0.1/mgmt/shared/authz/tokens/ABCDEF',
+     '/mgmt/shared/authz/tokens/{token}')
+])
+def test_endpoint(url, expected):
+    assert instrumentation.endpoint(url) == expected
+
+
+def test_disabled_records_nothing():
+    with instrumentation.timed_handler('F5::LTM::Pool', 'handle_create'):
+        pass
+    instrumentation.record_retry('status')
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10))
+    with mock.patch.object(f5_bigip_connection.HTTPAdapter, 'send',
+                           return_value=response()):
+        adapter.send(request())
+    assert metrics.REGISTRY.snapshot() == {
+        'counters': {}, 'gauges': {}, 'summaries': {}, 'histograms': {}
+    }
+
+
+def test_timed_handler(enabled):
+    with pytest.raises(ValueError):
+        with instrumentation.timed_handler('F5::LTM::Pool', 'handle_create'):
+            raise ValueError('failed')
+    with instrumentation.timed_handler('F5::LTM::Pool', 'handle_create'):
+        pass
+    histograms = metrics.REGISTRY.snapshot()['histograms']
+    for outcome in ('error', 'success'):
+        key = (instrumentation.HANDLER_DURATION, labels(
+            resource_type='F5::LTM::Pool', handler='handle_create',
+            outcome=outcome
+        ))
+        assert histograms[key][2] == 1
+
+
+def test_requests_attributed_to_handler(enabled):
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10))
+    context = request_context.RequestContext(
+        stack_id='stack', resource_type='F5::LTM::Pool',
+        handler='handle_create'
+    )
+    with request_context.bind(context):
+        with mock.patch.object(
+                f5_bigip_connection.HTTPAdapter, 'send',
+                side_effect=[response(b'{"token": {}}'), response(b'{}'),
+                             ConnectionError('unreachable')]
+        ):
+            adapter.send(request('POST', 'shared/authn/login', '{"a": 1}'))
+            adapter.send(request('POST', 'tm/ltm/pool/~Common~web/members',
+                                 '{}'))
+            with pytest.raises(ConnectionError):
+                adapter.send(request())
+    handler = dict(resource_type='F5::LTM::Pool', handler='handle_create')
+    found = counters()
+    assert found[(instrumentation.HANDLER_REQUESTS, labels(
+        method='POST', endpoint='/mgmt/tm/ltm/pool/{name}/members', **handler
+    ))] == 1
+    assert found[(instrumentation.HANDLER_REQUESTS, labels(
+        method='GET', endpoint='/mgmt/tm/ltm/pool', **handler
+    ))] == 1
+    assert found[(instrumentation.HANDLER_LOGINS, labels(**handler))] == 1
+    assert found[(instrumentation.HANDLER_BYTES, labels(
+        direction='sent', **handler
+    ))] == 10
+    assert found[(instrumentation.HANDLER_BYTES, labels(
+        direction='received', **handler
+    ))] == 15
+
+
+def test_unattributed_requests(enabled):
+    instrumentation.record_request(request())
+    assert counters()[(instrumentation.HANDLER_REQUESTS, labels(
+        method='GET', endpoint='/mgmt/tm/ltm/pool', resource_type='',
+        handler=''
+    ))] == 1
+
+
+def test_streamed_response_counts_declared_length(enabled):
+    streamed = response()
+    streamed.headers['Content-Length'] = '2048'
+    instrumentation.record_request(request(), streamed, stream=True)
+    assert counters()[(instrumentation.HANDLER_BYTES, labels(
+        direction='received', resource_type='', handler=''
+    ))] == 2048
+
+
+def test_retries_attributed(enabled):
+    send = mock.MagicMock(side_effect=[
+        mock.MagicMock(status_code=503, headers={}),
+        mock.MagicMock(status_code=200)
+    ])
+    context = request_context.RequestContext(
+        resource_type='F5::Sys::Save', handler='handle_create'
+    )
+    with mock.patch.object(mixins.eventlet, 'sleep'):
+        with request_context.bind(context):
+            mixins.RetryPolicy().call(send, idempotent=True)
+    assert counters()[(instrumentation.HANDLER_RETRIES, labels(
+        reason='status', resource_type='F5::Sys::Save',
+        handler='handle_create'
+    ))] == 1
+
+
+def test_f5_handler_binds_and_times(enabled):
+    seen = []
+
+    class Resource(object):
+        stack = mock.MagicMock(id='stack', root_stack_id=None)
+
+        def type(self):
+            return 'F5::BigIP::Device'
+
+        @mixins.f5_handler
+        def handle_create(self):
+            seen.append(request_context.current())
+
+    Resource().handle_create()
+    assert seen[0].handler == 'handle_create'
+    assert seen[0].stack_id == 'stack'
+    assert request_context.current() is None
+    assert (instrumentation.HANDLER_DURATION, labels(
+        resource_type='F5::BigIP::Device', handler='handle_create',
+        outcome='success'
+    )) in metrics.REGISTRY.snapshot()['histograms']
+
+
+def test_export_textfile(enabled, tmpdir):
+    path = str(tmpdir.join('f5_heat_{pid}.prom'))
+    CONF.set_override('metrics_file', path, group='f5_heat')
+    metrics.increment('f5_device_requests_total')
+    instrumentation.export()
+    exported = path.format(pid=os.getpid())
+    with open(exported) as textfile:
+        assert 'f5_device_requests_total 1.0' in textfile.read()
+    assert oct(os.stat(exported).st_mode & 0o777) == oct(0o644)
+    assert tmpdir.listdir() == [tmpdir.join(os.path.basename(exported))]
+
+
+def test_export_textfile_utf8(enabled, tmpdir):
+    path = str(tmpdir.join('f5_heat.prom'))
+    CONF.set_override('metrics_file', path, group='f5_heat')
+    metrics.increment('f5_device_requests_total', stack=u'pr\xe9prod')
+    instrumentation.export()
+    with open(path, 'rb') as textfile:
+        assert b'{stack="pr\xc3\xa9prod"} 1.0' in textfile.read()
+
+
+def test_export_notification(enabled):
+    CONF.set_override('metrics_notifications', True, group='f5_heat')
+    metrics.observe_histogram('latency', 0.2, buckets=(1.0,))
+    notifier = mock.MagicMock()
+    with mock.patch('heat.common.messaging.NOTIFIER', notifier):
+        instrumentation.export()
+    prepared = notifier.prepare.return_value
+    assert prepared.info.call_args[0][1] == 'f5_heat.metrics'
+    payload = prepared.info.call_args[0][2]
+    assert payload['pid'] == os.getpid()
+    assert payload['metrics'] == [{
+        'name': 'latency', 'labels': {}, 'type': 'histogram',
+        'buckets': [(1.0, 1)], 'count': 1, 'sum': 0.2
+    }]
+
+
+def test_export_without_messaging(enabled):
+    CONF.set_override('metrics_notifications', True, group='f5_heat')
+    with mock.patch('heat.common.messaging.NOTIFIER', None):
+        instrumentation.export()
+
+
+def test_export_errors_logged(enabled, tmpdir):
+    CONF.set_override('metrics_file', str(tmpdir.join('missing', 'x.prom')),
+                      group='f5_heat')
+    with mock.patch.object(instrumentation.LOG, 'exception') as logged:
+        instrumentation.export()
+    assert logged.call_count == 1
+
+
+def test_export_due_throttled(enabled):
+    CONF.set_override('metrics_interval', 60, group='f5_heat')
+    with mock.patch.object(instrumentation, 'export') as export:
+        with mock.patch.object(instrumentation, 'time') as mock_time:
+            mock_time.time.side_effect = [100.0, 130.0, 161.0]
+            for _ in range(3):
+                instrumentation.export_due()
+    assert export.call_count == 2
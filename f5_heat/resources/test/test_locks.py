@@ -0,0 +1,95 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.config import CONF
+from f5_heat.resources.common import locks
+
+import eventlet
+import pytest
+
+
+@pytest.fixture
+def lock_path(tmpdir):
+    CONF.set_override('lock_path', str(tmpdir), group='f5_heat')
+    yield tmpdir
+    CONF.clear_override('lock_path', group='f5_heat')
+
+
+def holder(events, name, *args, **kwargs):
+    with locks.device_lock(*args, **kwargs):
+        events.append(name + ' in')
+        eventlet.sleep(0.05)
+        events.append(name + ' out')
+
+
+def run(*holders):
+    events = []
+    threads = [
+        eventlet.spawn(holder, events, name, *args, **kwargs)
+        for name, args, kwargs in holders
+    ]
+    for thread in threads:
+        thread.wait()
+    return events
+
+
+def test_disabled_without_lock_path(tmpdir):
+    with locks.device_lock('10.0.0.1', 'Common', exclusive=True):
+        with locks.device_lock('10.0.0.1', 'Common', exclusive=True):
+            pass
+    assert tmpdir.listdir() == []
+
+
+def test_writes_to_partition_serialized(lock_path):
+    events = run(
+        ('a', ('10.0.0.1', 'Common'), {'exclusive': True}),
+        ('b', ('10.0.0.1', 'Common'), {'exclusive': True})
+    )
+    assert events == ['a in', 'a out', 'b in', 'b out']
+
+
+def test_reads_in_parallel(lock_path):
+    events = run(
+        ('a', ('10.0.0.1', 'Common'), {}),
+        ('b', ('10.0.0.1', 'Common'), {})
+    )
+    assert events[:2] == ['a in', 'b in']
+
+
+def test_other_partitions_in_parallel(lock_path):
+    events = run(
+        ('a', ('10.0.0.1', 'Common'), {'exclusive': True}),
+        ('b', ('10.0.0.1', 'tenant'), {'exclusive': True})
+    )
+    assert events[:2] == ['a in', 'b in']
+
+
+def test_device_write_excludes_partitions(lock_path):
+    events = run(
+        ('a', ('10.0.0.1',), {'exclusive': True}),
+        ('b', ('10.0.0.1', 'Common'), {})
+    )
+    assert events == ['a in', 'a out', 'b in', 'b out']
+
+
+def test_nested_locks_reused(lock_path):
+    with locks.device_lock('10.0.0.1', 'Common', exclusive=True):
+        with locks.device_lock('10.0.0.1', 'Common', exclusive=True):
+            pass
+    assert sorted(path.basename for path in lock_path.listdir()) == [
+        'f5-heat-10.0.0.1-Common.lock', 'f5-heat-10.0.0.1.lock'
+    ]
@@ -0,0 +1,182 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common import concurrency
+from f5_heat.resources.common.config import CONF
+from f5_heat.resources.common import memory
+from f5_heat.resources.common import mixins
+from f5_heat.resources import f5_ltm_pool
+from f5_heat.resources import f5_sys_iappfulltemplate
+
+import collections
+import inspect
+import json
+import mock
+import os
+import pytest
+
+
+Frame = collections.namedtuple('Frame', ['filename', 'lineno'])
+Statistic = collections.namedtuple('Statistic',
+                                   ['traceback', 'size', 'count'])
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    yield
+    for option in ('memory_snapshot_dir', 'memory_snapshot_interval'):
+        CONF.clear_override(option, group='f5_heat')
+    memory._STATE.update(last=None, warned=False, taken=0)
+
+
+@pytest.fixture
+def tracemalloc():
+    with mock.patch.object(memory, 'tracemalloc') as traced:
+        traced.__file__ = 'tracemalloc.py'
+        traced.get_traced_memory.return_value = (4096, 8192)
+        yield traced
+
+
+def frame_in(function, offset=1):
+    code = function.__code__
+    return Frame(code.co_filename, code.co_firstlineno + offset)
+
+
+def body_line(module, name):
+    # The first line of the body of a method, however it is decorated.
+    source = inspect.getsource(module).splitlines()
+    for number, line in enumerate(source, 1):
+        if line.strip().startswith('def {0}('.format(name)):
+            return Frame(inspect.getsourcefile(module), number + 1)
+
+
+class Resource(object):
+    stack = mock.MagicMock(id='stack', root_stack_id=None)
+
+    def type(self):
+        return 'F5::Sys::Save'
+
+    @mixins.f5_handler
+    def handle_create(self):
+        pass
+
+
+def test_resource_method():
+    frames = [frame_in(json.loads),
+              body_line(f5_ltm_pool, 'handle_create')]
+    assert memory.owner(frames) == ('F5::LTM::Pool', 'handle_create')
+
+
+def test_innermost_resource_method():
+    template = f5_sys_iappfulltemplate.F5SysiAppFullTemplate
+    parse = frame_in(template._parse_full_template)
+    frames = [parse, body_line(f5_ltm_pool, 'handle_create')]
+    assert memory.owner(frames) == (
+        'F5::Sys::iAppFullTemplate', '_parse_full_template'
+    )
+
+
+def test_plugin_module():
+    frames = [frame_in(json.loads), frame_in(concurrency.json_loads)]
+    assert memory.owner(frames) == (memory.OTHER,
+                                    'common.concurrency')
+
+
+def test_package():
+    assert memory.owner([frame_in(json.loads)]) == (memory.OTHER, 'json')
+    assert memory.owner([]) == (memory.OTHER, memory.OTHER)
+
+
+def test_attribute(tracemalloc):
+    pool = body_line(f5_ltm_pool, 'handle_create')
+    snapshot = mock.MagicMock()
+    snapshot.statistics.return_value = [
+        Statistic([frame_in(json.loads), pool], 100, 2),
+        Statistic([pool], 50, 1),
+        Statistic([frame_in(json.loads)], 10, 1)
+    ]
+    with mock.patch.object(memory, 'sys') as mock_sys:
+        mock_sys.version_info = (3, 6)
+        mock_sys.path = memory.sys.path
+        assert memory.attribute(snapshot) == {
+            ('F5::LTM::Pool', 'handle_create'): memory.Usage(150, 3),
+            (memory.OTHER, 'json'): memory.Usage(10, 1)
+        }
+
+
+def test_unavailable_warns_once(tmpdir):
+    CONF.set_override('memory_snapshot_dir', str(tmpdir), group='f5_heat')
+    with mock.patch.object(memory, 'tracemalloc', None):
+        with mock.patch.object(memory.LOG, 'warning') as warned:
+            Resource().handle_create()
+            Resource().handle_create()
+    assert warned.call_count == 1
+    assert tmpdir.listdir() == []
+
+
+def test_disabled(tracemalloc):
+    Resource().handle_create()
+    assert tracemalloc.start.call_count == 0
+
+
+def test_snapshots_when_due(tracemalloc, tmpdir):
+    CONF.set_override('memory_snapshot_dir', str(tmpdir), group='f5_heat')
+    CONF.set_override('memory_snapshot_interval', 60, group='f5_heat')
+    tracemalloc.is_tracing.return_value = False
+    snapshot = tracemalloc.take_snapshot.return_value.filter_traces
+    snapshot.return_value.statistics.return_value = [
+        Statistic([frame_in(json.loads)], 10, 1)
+    ]
+    with mock.patch.object(memory, 'time') as mock_time:
+        mock_time.time.side_effect = [100.0, 100.0, 130.0, 161.0, 161.0]
+        for _ in range(3):
+            Resource().handle_create()
+    assert tracemalloc.start.call_args == mock.call(64)
+    dumped = snapshot.return_value.dump.call_args_list
+    assert len(dumped) == 2
+    [summary] = [path for path in tmpdir.listdir()
+                 if path.basename.endswith('.1.json')]
+    assert json.loads(summary.read()) == {
+        'time': 100.0, 'pid': os.getpid(), 'traced_bytes': 4096,
+        'peak_traced_bytes': 8192,
+        'usage': [{'resource_type': '', 'method': 'json', 'size': 10,
+                   'count': 1}]
+    }
+
+
+def test_snapshot_offloaded(tracemalloc, tmpdir):
+    CONF.set_override('memory_snapshot_dir', str(tmpdir), group='f5_heat')
+    with mock.patch.object(
+            concurrency, 'offload', wraps=concurrency.offload
+    ) as offloaded:
+        Resource().handle_create()
+    assert offloaded.call_args == mock.call(
+        memory._write, str(tmpdir.join('f5_heat_memory.{0}.1'.format(
+            os.getpid()
+        )))
+    )
+    assert tracemalloc.take_snapshot.call_count == 1
+
+
+def test_snapshot_errors_logged(tracemalloc, tmpdir):
+    CONF.set_override('memory_snapshot_dir', str(tmpdir.join('missing')),
+                      group='f5_heat')
+    tracemalloc.take_snapshot.return_value.filter_traces.return_value \
+        .dump.side_effect = IOError('missing')
+    with mock.patch.object(memory.LOG, 'exception') as logged:
+        Resource().handle_create()
+    assert logged.call_count == 1
@@ -0,0 +1,93 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.metrics import prometheus_text
+from f5_heat.resources.common.metrics import Registry
+
+
+def test_counters_by_label():
+    registry = Registry()
+    registry.increment('requests', device='a')
+    registry.increment('requests', 2, device='a')
+    registry.increment('requests', device='b')
+    counters = registry.snapshot()['counters']
+    assert counters[('requests', (('device', 'a'),))] == 3
+    assert counters[('requests', (('device', 'b'),))] == 1
+
+
+def test_gauge_and_summary():
+    registry = Registry()
+    registry.set_gauge('depth', 4, device='a')
+    registry.set_gauge('depth', 1, device='a')
+    registry.observe('wait', 0.5)
+    registry.observe('wait', 1.5)
+    snapshot = registry.snapshot()
+    assert snapshot['gauges'][('depth', (('device', 'a'),))] == 1
+    assert snapshot['summaries'][('wait', ())] == (2, 2.0, 1.5)
+
+
+def test_reset():
+    registry = Registry()
+    registry.increment('requests')
+    registry.reset()
+    assert registry.snapshot()['counters'] == {}
+
+
+def test_histogram_buckets():
+    registry = Registry()
+    registry.observe_histogram('latency', 0.2, buckets=(0.1, 1.0))
+    registry.observe_histogram('latency', 0.05, buckets=(0.1, 1.0))
+    registry.observe_histogram('latency', 5, buckets=(0.1, 1.0))
+    assert registry.snapshot()['histograms'][('latency', ())] == \
+        ((0.1, 1.0), [1, 1], 3, 5.25)
+
+
+def test_prometheus_text():
+    registry = Registry()
+    registry.increment('requests_total', 2, device='10.0.0.1')
+    registry.set_gauge('window', 4)
+    registry.observe('wait_seconds', 1.5, device='a"b')
+    registry.observe_histogram('latency_seconds', 0.2, buckets=(0.1, 1.0),
+                               handler='handle_create')
+    assert prometheus_text(registry.snapshot()).splitlines() == [
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{handler="handle_create",le="0.1"} 0.0',
+        'latency_seconds_bucket{handler="handle_create",le="1.0"} 1.0',
+        'latency_seconds_bucket{handler="handle_create",le="+Inf"} 1.0',
+        'latency_seconds_count{handler="handle_create"} 1.0',
+        'latency_seconds_sum{handler="handle_create"} 0.2',
+        '# TYPE requests_total counter',
+        'requests_total{device="10.0.0.1"} 2.0',
+        '# TYPE wait_seconds summary',
+        'wait_seconds_count{device="a\\"b"} 1.0',
+        'wait_seconds_sum{device="a\\"b"} 1.5',
+        '# TYPE wait_seconds_max gauge',
+        'wait_seconds_max{device="a\\"b"} 1.5',
+        '# TYPE window gauge',
+        'window 4.0'
+    ]
+
+
+def test_prometheus_text_unicode_label():
+    registry = Registry()
+    registry.increment('requests_total', stack=u'pr\xe9prod')
+    assert prometheus_text(registry.snapshot()).splitlines()[1] == \
+        u'requests_total{stack="pr\xe9prod"} 1.0'
+
+
+def test_prometheus_text_empty():
+    assert prometheus_text(Registry().snapshot()) == ''
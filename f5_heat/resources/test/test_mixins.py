@@ -0,0 +1,145 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.circuit_breaker import CircuitOpenError
+from f5_heat.resources.common import metrics
+from f5_heat.resources.common import mixins
+from f5_heat.resources.common.mixins import RetryPolicy
+from requests import ConnectionError
+from requests import ConnectTimeout
+from requests import ReadTimeout
+
+import mock
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_sleep():
+    with mock.patch.object(mixins.eventlet, 'sleep') as mock_sleep:
+        yield mock_sleep
+    metrics.REGISTRY.reset()
+
+
+def response(status_code):
+    return mock.MagicMock(status_code=status_code, headers={})
+
+
+def test_retries_503_then_succeeds(no_sleep):
+    send = mock.MagicMock(side_effect=[response(503), response(200)])
+    result = RetryPolicy().call(send, idempotent=False, method='POST')
+    assert result.status_code == 200
+    assert send.call_count == 2
+    assert no_sleep.call_count == 1
+    counters = metrics.REGISTRY.snapshot()['counters']
+    assert counters[
+        ('f5_device_retries_total',
+         (('method', 'POST'), ('reason', 'status')))
+    ] == 1
+
+
+def test_gives_up_after_attempts():
+    send = mock.MagicMock(return_value=response(503))
+    result = RetryPolicy(attempts=3).call(send, idempotent=True)
+    assert result.status_code == 503
+    assert send.call_count == 3
+
+
+def test_write_not_retried_after_read_timeout():
+    send = mock.MagicMock(side_effect=ReadTimeout('slow'))
+    with pytest.raises(ReadTimeout):
+        RetryPolicy().call(send, idempotent=False)
+    assert send.call_count == 1
+
+
+def test_read_retried_after_read_timeout():
+    send = mock.MagicMock(side_effect=[ReadTimeout('slow'), response(200)])
+    assert RetryPolicy().call(send, idempotent=True).status_code == 200
+
+
+def test_write_retried_after_connect_timeout():
+    send = mock.MagicMock(
+        side_effect=[ConnectTimeout('unreachable'), response(200)]
+    )
+    assert RetryPolicy().call(send, idempotent=False).status_code == 200
+
+
+def test_write_not_retried_on_502():
+    send = mock.MagicMock(return_value=response(502))
+    RetryPolicy().call(send, idempotent=False)
+    assert send.call_count == 1
+
+
+@pytest.mark.parametrize('error', [
+    CircuitOpenError('down'), ValueError('bad')
+])
+def test_not_retryable_errors(error):
+    send = mock.MagicMock(side_effect=error)
+    with pytest.raises(type(error)):
+        RetryPolicy().call(send, idempotent=True)
+    assert send.call_count == 1
+
+
+def test_connection_reset_retried_only_if_idempotent():
+    policy = RetryPolicy()
+    reset = ConnectionError('connection reset by peer')
+    assert policy.classify_error(reset, idempotent=True) == 'connection'
+    assert policy.classify_error(reset, idempotent=False) is None
+
+
+def test_delay_capped_with_jitter():
+    policy = RetryPolicy(base_delay=1.0, max_delay=4.0)
+    for attempt in range(1, 10):
+        assert 0 <= policy.delay(attempt) <= min(4.0, 2 ** (attempt - 1))
+    assert policy.delay(1, retry_after=3) >= 3
+    assert policy.delay(1, retry_after=60) <= 4.0
+
+
+class FakeResource(mixins.F5BigIPMixin):
+    BIGIP_SERVER = 'bigip_server'
+    PARTITION = 'partition'
+
+    def __init__(self, device):
+        self.properties = {'bigip_server': 'bigip', 'partition': 'part'}
+        self.stack = mock.MagicMock(id='stack', root_stack_id=None)
+        self.stack.resource_by_refid.return_value = device
+        self.stack.values.return_value = []
+
+    def type(self):
+        return 'F5::Test::Resource'
+
+    @mixins.f5_common_resources
+    def handle_create(self):
+        return 'created'
+
+    @mixins.f5_common_resources
+    def check_create_complete(self, token):
+        return True
+
+
+def test_changes_synced_through_cluster():
+    cluster = mock.MagicMock()
+    resource = FakeResource(cluster)
+    assert resource.handle_create() == 'created'
+    assert cluster.request_sync.call_args == \
+        mock.call(cluster.get_session().connection)
+    resource.check_create_complete(None)
+    assert cluster.request_sync.call_count == 1
+
+
+def test_single_device_not_synced():
+    device = mock.MagicMock(spec=['get_session', 'get_partition_name'])
+    assert FakeResource(device).handle_create() == 'created'
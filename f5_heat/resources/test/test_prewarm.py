@@ -0,0 +1,76 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common import prewarm
+from f5_heat.resources.common import request_context
+
+import eventlet
+import mock
+import pytest
+
+
+def resource(resource_type, action='CREATE'):
+    mock_resource = mock.MagicMock(action=action, INIT='INIT')
+    mock_resource.type.return_value = resource_type
+    return mock_resource
+
+
+@pytest.fixture
+def stack():
+    yield mock.MagicMock(
+        id='stack', action='UPDATE', current_traversal='t1'
+    )
+    prewarm.clear_warmed()
+
+
+def test_warms_created_devices_concurrently(stack):
+    started = []
+
+    def get_bigip():
+        started.append(request_context.current().stack_id)
+        eventlet.sleep(0.01)
+
+    devices = [resource('F5::BigIP::Device') for _ in range(3)]
+    for device in devices:
+        device.get_bigip.side_effect = get_bigip
+    uncreated = resource('F5::BigIP::Device', action='INIT')
+    stack.values.return_value = devices + [
+        uncreated, resource('F5::LTM::Pool')
+    ]
+    context = request_context.RequestContext(stack_id='stack')
+    with request_context.bind(context):
+        prewarm.prewarm_stack(stack).wait()
+    assert started == ['stack'] * 3
+    assert uncreated.get_bigip.call_count == 0
+
+
+def test_once_per_operation(stack):
+    stack.values.return_value = [resource('F5::BigIP::Device')]
+    prewarm.prewarm_stack(stack).wait()
+    assert prewarm.prewarm_stack(stack) is None
+    stack.current_traversal = 't2'
+    prewarm.prewarm_stack(stack).wait()
+    assert stack.values.return_value[0].get_bigip.call_count == 2
+
+
+def test_unreachable_device_ignored(stack):
+    unreachable = resource('F5::BigIP::Device')
+    unreachable.get_bigip.side_effect = Exception('unreachable')
+    reachable = resource('F5::BigIP::Device')
+    stack.values.return_value = [unreachable, reachable]
+    prewarm.prewarm_stack(stack).wait()
+    assert reachable.get_bigip.call_count == 1
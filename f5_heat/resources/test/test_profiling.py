@@ -0,0 +1,160 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common import concurrency
+from f5_heat.resources.common.config import CONF
+from f5_heat.resources.common import mixins
+from f5_heat.resources.common import profiling
+
+import eventlet
+import mock
+import os
+import pstats
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    yield
+    for option in ('profile_handlers', 'profile_dir', 'profile_every'):
+        CONF.clear_override(option, group='f5_heat')
+    profiling._CALLS.clear()
+
+
+@pytest.fixture
+def profile_dir(tmpdir):
+    CONF.set_override('profile_dir', str(tmpdir), group='f5_heat')
+    return tmpdir
+
+
+def hot_loop():
+    return sum(i * i for i in range(20000))
+
+
+def unrelated_work():
+    return sum(i * i for i in range(20000))
+
+
+class F5FakePool(object):
+    name = 'pool'
+    stack = mock.MagicMock(id='stack', root_stack_id=None)
+
+    def type(self):
+        return 'F5::LTM::Pool'
+
+    @mixins.f5_handler
+    def handle_create(self, work=None):
+        if work is not None:
+            work()
+
+    @mixins.f5_handler
+    def handle_delete(self):
+        pass
+
+
+def profiled_functions(path):
+    return set(name for _, _, name in pstats.Stats(path).stats)
+
+
+def test_not_selected(profile_dir):
+    F5FakePool().handle_create()
+    assert profile_dir.listdir() == []
+
+
+def test_profile_per_sampled_run(profile_dir):
+    CONF.set_override('profile_handlers', ['F5FakePool.handle_create'],
+                      group='f5_heat')
+    CONF.set_override('profile_every', 2, group='f5_heat')
+    for _ in range(3):
+        F5FakePool().handle_create(work=hot_loop)
+    F5FakePool().handle_delete()
+    written = sorted(path.basename for path in profile_dir.listdir())
+    pid = os.getpid()
+    assert written == ['F5FakePool.handle_create.{0}.1.pstats'.format(pid),
+                       'F5FakePool.handle_create.{0}.3.pstats'.format(pid)]
+    assert 'hot_loop' in profiled_functions(str(profile_dir.join(
+        written[0]
+    )))
+    assert profiling._ACTIVE == {'session': None, 'tracer': None}
+
+
+def test_selected_by_environment(tmpdir):
+    environment = {profiling.HANDLERS_ENV: 'F5::LTM::*.handle_*, other',
+                   profiling.DIR_ENV: str(tmpdir)}
+    with mock.patch.dict(os.environ, environment):
+        F5FakePool().handle_delete()
+    assert len(tmpdir.listdir()) == 1
+
+
+def test_no_directory_profiles_nothing():
+    CONF.set_override('profile_handlers', ['*'], group='f5_heat')
+    with mock.patch.object(profiling.cProfile, 'Profile') as profile:
+        F5FakePool().handle_delete()
+    assert profile.call_count == 0
+
+
+def test_only_the_handler_greenthreads_profiled(profile_dir):
+    CONF.set_override('profile_handlers', ['F5FakePool.handle_create'],
+                      group='f5_heat')
+
+    def work():
+        other = eventlet.spawn(unrelated_work)
+        concurrency.DeviceExecutor().map(lambda _: hot_loop(), [1, 2])
+        other.wait()
+
+    F5FakePool().handle_create(work=work)
+    [profile] = profile_dir.listdir()
+    functions = profiled_functions(str(profile))
+    assert 'hot_loop' in functions
+    assert 'unrelated_work' not in functions
+
+
+def test_one_run_profiled_at_a_time(profile_dir):
+    CONF.set_override('profile_handlers', ['F5FakePool.*'],
+                      group='f5_heat')
+    F5FakePool().handle_create(work=F5FakePool().handle_delete)
+    [profile] = profile_dir.listdir()
+    assert profile.basename.startswith('F5FakePool.handle_create.')
+
+
+def test_write_errors_logged(profile_dir):
+    CONF.set_override('profile_handlers', ['F5FakePool.handle_delete'],
+                      group='f5_heat')
+    CONF.set_override('profile_dir', str(profile_dir.join('missing')),
+                      group='f5_heat')
+    with mock.patch.object(profiling.LOG, 'exception') as logged:
+        F5FakePool().handle_delete()
+    assert logged.call_count == 1
+
+
+def test_summarize(profile_dir, capsys):
+    CONF.set_override('profile_handlers', ['F5FakePool.handle_create'],
+                      group='f5_heat')
+    for _ in range(2):
+        F5FakePool().handle_create(work=hot_loop)
+    hotspots = profiling.summarize([str(profile_dir)], top=3)
+    assert len(hotspots) == 3
+    assert hotspots[0].total >= hotspots[1].total
+    assert any('hot_loop' in hotspot.function for hotspot in
+               profiling.summarize([str(profile_dir)], sort='cumulative'))
+    assert profiling.main([str(profile_dir), '--top', '2']) == 0
+    assert len(capsys.readouterr()[0].splitlines()) == 3
+
+
+def test_summarize_nothing(tmpdir):
+    with pytest.raises(ValueError):
+        profiling.summarize([str(tmpdir)])
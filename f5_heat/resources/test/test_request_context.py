@@ -0,0 +1,74 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.concurrency import DeviceExecutor
+from f5_heat.resources.common.config import CONF
+from f5_heat.resources.common import request_context
+
+import eventlet
+import mock
+
+
+def test_bind_restores_previous():
+    outer = request_context.RequestContext(stack_id='outer')
+    inner = request_context.RequestContext(stack_id='inner')
+    assert request_context.current() is None
+    with request_context.bind(outer):
+        with request_context.bind(inner):
+            assert request_context.current() is inner
+        assert request_context.current() is outer
+    assert request_context.current() is None
+
+
+def test_context_is_local_to_greenthread():
+    def other():
+        return request_context.current()
+
+    with request_context.bind(request_context.RequestContext()):
+        assert eventlet.spawn(other).wait() is None
+
+
+def test_for_resource_uses_root_stack():
+    resource = mock.MagicMock()
+    resource.stack.root_stack_id = 'root'
+    resource.type.return_value = 'F5::LTM::Pool'
+    context = request_context.for_resource(resource, 'handle_create')
+    assert context.stack_id == 'root'
+    assert context.resource_type == 'F5::LTM::Pool'
+    assert context.handler == 'handle_create'
+
+
+def test_for_resource_tenant_weight():
+    resource = mock.MagicMock()
+    resource.stack.tenant_id = 'gold'
+    assert request_context.for_resource(resource, 'handle_create') \
+        .weight == 1.0
+    CONF.set_override('tenant_weights', {'gold': 3.0}, group='f5_heat')
+    try:
+        context = request_context.for_resource(resource, 'handle_create')
+    finally:
+        CONF.clear_override('tenant_weights', group='f5_heat')
+    assert context.weight == 3.0
+
+
+def test_executor_propagates_context():
+    context = request_context.RequestContext(stack_id='stack')
+    with request_context.bind(context):
+        seen = DeviceExecutor().map(
+            lambda item: request_context.current(), range(3)
+        )
+    assert seen == [context] * 3
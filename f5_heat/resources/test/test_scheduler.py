@@ -0,0 +1,93 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.scheduler import FairScheduler
+
+import eventlet
+
+
+def run_flows(scheduler, requests):
+    '''Queue requests (flow, weight) behind a busy device; record order.'''
+
+    order = []
+
+    def request(flow, weight):
+        scheduler.acquire(flow, weight)
+        order.append(flow)
+        eventlet.sleep(0)
+        scheduler.release()
+
+    scheduler.acquire('blocker')
+    threads = [eventlet.spawn(request, flow, weight)
+               for flow, weight in requests]
+    eventlet.sleep(0)
+    scheduler.release()
+    for thread in threads:
+        thread.wait()
+    return order
+
+
+def test_acquire_under_capacity():
+    scheduler = FairScheduler('10.0.0.1', 2)
+    scheduler.acquire('a')
+    scheduler.acquire('b')
+    assert scheduler.stats()['in_flight'] == 2
+    assert scheduler.stats()['queue_depth'] == 0
+
+
+def test_fair_across_flows():
+    scheduler = FairScheduler('10.0.0.1', 1)
+    requests = [('bulk', 1.0)] * 6 + [('small', 1.0)] * 2
+    order = run_flows(scheduler, requests)
+    assert order[:4] == ['bulk', 'small', 'bulk', 'small']
+
+
+def test_weighted_share():
+    scheduler = FairScheduler('10.0.0.1', 1)
+    requests = [('heavy', 2.0)] * 4 + [('light', 1.0)] * 4
+    order = run_flows(scheduler, requests)
+    assert order[:3].count('heavy') == 2
+
+
+def test_set_capacity_dispatches_waiters():
+    scheduler = FairScheduler('10.0.0.1', 1)
+    scheduler.acquire('a')
+    waiter = eventlet.spawn(scheduler.acquire, 'b')
+    eventlet.sleep(0)
+    assert scheduler.stats()['queue_depth'] == 1
+    scheduler.set_capacity(2)
+    waiter.wait()
+    assert scheduler.stats()['in_flight'] == 2
+
+
+def test_cancelled_waiter_gives_up_slot():
+    scheduler = FairScheduler('10.0.0.1', 1)
+    scheduler.acquire('a')
+    waiter = eventlet.spawn(scheduler.acquire, 'b')
+    eventlet.sleep(0)
+    waiter.kill()
+    scheduler.release()
+    assert scheduler.stats()['in_flight'] == 0
+    assert scheduler.stats()['queue_depth'] == 0
+
+
+def test_wait_stats():
+    scheduler = FairScheduler('10.0.0.1', 1)
+    run_flows(scheduler, [('a', 1.0)] * 3)
+    stats = scheduler.stats()
+    assert stats['requests'] == 4
+    assert stats['wait_max'] >= stats['wait_mean'] >= 0.0
@@ -0,0 +1,132 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.capabilities import DeviceCapabilities
+from f5_heat.resources.common.config import CONF
+from f5_heat.resources.common import f5_bigip_connection
+from f5_heat.resources.common import shared_cache
+
+import mock
+import os
+import pytest
+import stat
+import time
+
+
+@pytest.fixture
+def cache_path(tmpdir):
+    path = str(tmpdir.join('devices.sqlite'))
+    CONF.set_override('cache_path', path, group='f5_heat')
+    yield path
+    CONF.clear_override('cache_path', group='f5_heat')
+    shared_cache._CACHES.clear()
+    f5_bigip_connection.clear_connections()
+
+
+@pytest.fixture
+def cache(cache_path):
+    return shared_cache.get_shared_cache()
+
+
+def test_disabled_without_cache_path():
+    assert shared_cache.get_shared_cache() is None
+
+
+def test_private_wal_database(cache, cache_path):
+    assert stat.S_IMODE(os.stat(cache_path).st_mode) == 0o600
+    with cache._connect() as db:
+        assert db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+
+def test_tokens(cache):
+    key = shared_cache.credentials_key('10.0.0.1', 'admin', 'admin')
+    assert key != shared_cache.credentials_key('10.0.0.1', 'admin', 'new')
+    cache.set_token(key, 'ABC', time.time() + 600)
+    assert cache.get_token(key)[0] == 'ABC'
+    cache.delete_token(key, 'OLD')
+    assert cache.get_token(key)[0] == 'ABC'
+    cache.delete_token(key, 'ABC')
+    assert cache.get_token(key) is None
+    cache.set_token(key, 'ABC', time.time() - 1)
+    assert cache.get_token(key) is None
+
+
+def test_device_facts(cache):
+    assert cache.get_device('10.0.0.1') is None
+    cache.set_version('10.0.0.1', '12.1.0')
+    assert cache.get_device('10.0.0.1')['modules'] is None
+    cache.set_capabilities(
+        '10.0.0.1', DeviceCapabilities('12.1.0', ['ltm'], discovered_at=5)
+    )
+    cache.set_version('10.0.0.1', '12.1.0')
+    assert cache.get_device('10.0.0.1') == {
+        'tmos_version': '12.1.0', 'modules': ['ltm'], 'discovered_at': 5
+    }
+    cache.set_version('10.0.0.1', '13.0.0')
+    assert cache.get_device('10.0.0.1')['modules'] is None
+
+
+def test_shared_between_processes(cache, cache_path):
+    cache.set_version('10.0.0.1', '12.1.0')
+    other = shared_cache.SharedCache(cache_path)
+    assert other.get_device('10.0.0.1')['tmos_version'] == '12.1.0'
+
+
+def test_errors_are_misses(cache, cache_path):
+    os.remove(cache_path)
+    os.mkdir(cache_path)
+    assert cache.get_device('10.0.0.1') is None
+
+
+def test_unusable_path_disables_cache(tmpdir):
+    CONF.set_override('cache_path', str(tmpdir.join('missing', 'db')),
+                      group='f5_heat')
+    try:
+        with mock.patch.object(shared_cache.LOG, 'warning') as warned:
+            assert shared_cache.get_shared_cache() is None
+            assert shared_cache.get_shared_cache() is None
+            with mock.patch.object(f5_bigip_connection,
+                                   'iControlRESTSession'):
+                connection = f5_bigip_connection.BigIPConnection(
+                    '10.0.0.1', 'admin', 'admin'
+                )
+    finally:
+        CONF.clear_override('cache_path', group='f5_heat')
+        shared_cache._CACHES.clear()
+    assert connection.shared_cache is None
+    assert warned.call_count == 1
+
+
+def test_accessed_off_the_hub(cache):
+    with mock.patch.object(shared_cache, 'offload') as offload:
+        cache.get_device('10.0.0.1')
+    assert offload.call_args[0][1:] == (cache, '10.0.0.1')
+
+
+def test_connection_starts_from_shared_facts(cache):
+    cache.set_capabilities(
+        '10.0.0.1', DeviceCapabilities('12.1.0', ['ltm'])
+    )
+    with mock.patch.object(f5_bigip_connection, 'iControlRESTSession') as \
+            mock_icrs:
+        connection = f5_bigip_connection.BigIPConnection(
+            '10.0.0.1', 'admin', 'admin'
+        )
+        capabilities = connection.get_capabilities()
+    assert connection.tmos_version == '12.1.0'
+    assert capabilities.modules == frozenset(['ltm'])
+    assert mock_icrs.return_value.get.call_count == 0
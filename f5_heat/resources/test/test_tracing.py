@@ -0,0 +1,207 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common import concurrency
+from f5_heat.resources.common.config import CONF
+from f5_heat.resources.common import config_sync
+from f5_heat.resources.common import f5_bigip_connection
+from f5_heat.resources.common import mixins
+from f5_heat.resources.common import tracing
+from requests.models import Response
+from requests import Request
+
+import eventlet
+import fcntl
+import json
+import mock
+import pytest
+
+
+@pytest.fixture
+def trace_dir(tmpdir):
+    CONF.set_override('trace_dir', str(tmpdir), group='f5_heat')
+    yield tmpdir
+    CONF.clear_override('trace_dir', group='f5_heat')
+
+
+class Resource(object):
+    name = 'device'
+    stack = mock.MagicMock(id='stack', root_stack_id='root', action='CREATE',
+                           current_traversal='traversal')
+
+    def type(self):
+        return 'F5::BigIP::Device'
+
+    @mixins.f5_handler
+    def handle_create(self, work=None):
+        if work is not None:
+            work()
+
+
+def response(status=200):
+    response = Response()
+    response.status_code = status
+    response._content = b'{}'
+    return response
+
+
+def spans(trace_dir):
+    [trace_file] = trace_dir.listdir()
+    with open(str(trace_file)) as traced:
+        return json.load(traced)
+
+
+def by_name(found):
+    return dict((span['name'], span) for span in found)
+
+
+def test_disabled_traces_nothing(tmpdir):
+    Resource().handle_create(work=lambda: tracing.current())
+    with tracing.span('outside') as span:
+        assert span is None
+    assert tmpdir.listdir() == []
+
+
+def test_span_outside_handler(trace_dir):
+    with tracing.span('outside') as span:
+        assert span is None
+    assert trace_dir.listdir() == []
+
+
+def test_handler_and_request_spans(trace_dir):
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10))
+
+    def work():
+        with tracing.span('get_bigip', device='10.0.0.1'):
+            pass
+        with mock.patch.object(f5_bigip_connection.HTTPAdapter, 'send',
+                               return_value=response()):
+            adapter.send(Request(
+                'GET', 'https://10.0.0.1/mgmt/tm/ltm/pool/~Common~web'
+            ).prepare())
+
+    Resource().handle_create(work=work)
+    found = by_name(spans(trace_dir))
+    root = found['F5::BigIP::Device handle_create']
+    lookup = found['get_bigip']
+    rest = found['GET /mgmt/tm/ltm/pool/{name}']
+    assert 'parentId' not in root
+    assert root['traceId'] == tracing.trace_id(Resource.stack)
+    assert root['tags']['heat.stack_id'] == 'stack'
+    assert lookup['parentId'] == rest['parentId'] == root['id']
+    assert lookup['tags'] == {'device': '10.0.0.1'}
+    assert rest['kind'] == 'CLIENT'
+    assert rest['remoteEndpoint'] == {
+        'serviceName': 'bigip', 'ipv4': '10.0.0.1', 'port': 443
+    }
+    assert rest['tags'] == {
+        'http.method': 'GET', 'http.path': '/mgmt/tm/ltm/pool/~Common~web',
+        'http.status_code': '200'
+    }
+    assert root['timestamp'] <= rest['timestamp']
+    assert root['duration'] >= rest['duration']
+    assert tracing.current() is None
+
+
+def test_runs_of_one_action_share_a_trace(trace_dir):
+    Resource().handle_create()
+    Resource().handle_create()
+    found = spans(trace_dir)
+    assert len(found) == 2
+    assert len(set(span['id'] for span in found)) == 2
+
+
+def test_error_tagged(trace_dir):
+    def fail():
+        raise ValueError('refused')
+
+    with pytest.raises(ValueError):
+        Resource().handle_create(work=fail)
+    [root] = spans(trace_dir)
+    assert root['tags']['error'] == 'ValueError: refused'
+
+
+def test_unicode_tagged(trace_dir):
+    class UnicodeResource(Resource):
+        name = u'p\u00f6\u00f6l'
+
+    def fail():
+        raise ValueError(u'r\u00e9fus\u00e9')
+
+    with pytest.raises(ValueError):
+        UnicodeResource().handle_create(work=fail)
+    [root] = spans(trace_dir)
+    assert root['tags']['heat.resource_name'] == u'p\u00f6\u00f6l'
+    assert root['tags']['error'] == u'ValueError: r\u00e9fus\u00e9'
+
+
+def test_executor_carries_span(trace_dir):
+    def member(name):
+        with tracing.span(name):
+            pass
+
+    def work():
+        concurrency.DeviceExecutor().map(member, ['member'])
+
+    Resource().handle_create(work=work)
+    found = by_name(spans(trace_dir))
+    assert found['member']['parentId'] == \
+        found['F5::BigIP::Device handle_create']['id']
+
+
+def test_config_sync_polls_traced(trace_dir):
+    bigip = mock.MagicMock()
+    statuses = iter(['Syncing', 'In Sync'])
+    coalescer = config_sync.SyncCoalescer('group', delay=0)
+
+    def work():
+        with mock.patch.object(config_sync, 'sync_status',
+                               side_effect=lambda bigip: next(statuses)):
+            with mock.patch.object(config_sync, 'SYNC_POLL_INTERVAL', 0):
+                coalescer.sync(bigip)
+
+    Resource().handle_create(work=work)
+    found = spans(trace_dir)
+    sync = by_name(found)['config_sync']
+    polls = [span for span in found if span['name'] == 'sync_status_poll']
+    assert sync['tags'] == {'device_group': 'group',
+                            'coalesced_requests': '1'}
+    assert [poll['tags']['status'] for poll in polls] == \
+        ['Syncing', 'In Sync']
+    assert all(poll['parentId'] == sync['id'] for poll in polls)
+
+
+def test_write_errors_logged(trace_dir):
+    CONF.set_override('trace_dir', str(trace_dir.join('missing')),
+                      group='f5_heat')
+    with mock.patch.object(tracing.LOG, 'exception') as logged:
+        Resource().handle_create()
+    assert logged.call_count == 1
+
+
+def test_write_waits_for_lock_off_the_hub(trace_dir):
+    span = mock.MagicMock()
+    span.to_zipkin.return_value = {'id': '1'}
+    with open(str(trace_dir.join('trace.json')), 'ab') as other:
+        fcntl.flock(other, fcntl.LOCK_EX)
+        writing = eventlet.spawn(tracing.write, 'trace', [span])
+        ran = eventlet.spawn(lambda: True)
+        assert ran.wait() is True
+        assert writing.dead is False
+        fcntl.flock(other, fcntl.LOCK_UN)
+    writing.wait()
+    assert spans(trace_dir) == [{'id': '1'}]
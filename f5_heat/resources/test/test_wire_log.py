@@ -0,0 +1,155 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.config import CONF
+from f5_heat.resources.common import f5_bigip_connection
+from f5_heat.resources.common import mixins
+from f5_heat.resources.common import request_context
+from f5_heat.resources.common import wire_log
+from requests import ConnectionError
+from requests.models import Response
+from requests import Request
+
+import json
+import mock
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    yield
+    for option in ('wire_log_enabled', 'wire_log_slow_threshold',
+                   'wire_log_sample_rate'):
+        CONF.clear_override(option, group='f5_heat')
+
+
+@pytest.fixture
+def logged():
+    CONF.set_override('wire_log_enabled', True, group='f5_heat')
+    CONF.set_override('wire_log_sample_rate', 0.0, group='f5_heat')
+    with mock.patch.object(wire_log, 'LOG') as log:
+        yield log
+
+
+def entries(log, level):
+    return [json.loads(call[0][0])
+            for call in getattr(log, level).call_args_list]
+
+
+def request(method='GET', path='tm/ltm/pool', body=None):
+    return Request(method, 'https://10.0.0.1/mgmt/' + path,
+                   data=body).prepare()
+
+
+def response(status=200, body=b'{"items": []}'):
+    response = Response()
+    response.status_code = status
+    response._content = body
+    return response
+
+
+def send(adapter, sent, *responses, **kwargs):
+    with mock.patch.object(f5_bigip_connection.HTTPAdapter, 'send',
+                           side_effect=list(responses)):
+        return adapter.send(sent, **kwargs)
+
+
+def test_disabled_logs_nothing():
+    with mock.patch.object(wire_log, 'LOG') as log:
+        send(f5_bigip_connection.DeviceAdapter((2, 10)), request(),
+             response())
+    assert log.method_calls == []
+
+
+def test_fast_requests_sampled(logged):
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10))
+    send(adapter, request(), response())
+    assert logged.method_calls == []
+    CONF.set_override('wire_log_sample_rate', 1.0, group='f5_heat')
+    send(adapter, request(), response())
+    [entry] = entries(logged, 'info')
+    assert entry['slow'] is False
+    assert entry['endpoint'] == '/mgmt/tm/ltm/pool'
+
+
+def test_slow_request_split(logged):
+    CONF.set_override('wire_log_slow_threshold', 1.0, group='f5_heat')
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10))
+    context = request_context.RequestContext(
+        stack_id='stack', resource_type='F5::Sys::iAppService',
+        handler='handle_create'
+    )
+    with mock.patch.object(wire_log, 'time') as mock_time:
+        # Exchange starts, attempt starts, headers, body read, logged.
+        mock_time.time.side_effect = [100.0, 100.5, 101.5, 101.75, 102.0]
+        with request_context.bind(context):
+            send(adapter, request('POST', 'tm/sys/application/service',
+                                  '{"name": "app"}'), response())
+    [entry] = entries(logged, 'warning')
+    assert entry == {
+        'method': 'POST', 'endpoint': '/mgmt/tm/sys/application/service',
+        'device': '10.0.0.1', 'status': 200, 'attempts': 1,
+        'sent_bytes': 15, 'received_bytes': 13, 'total_ms': 2000.0,
+        'device_ms': 1250.0, 'ttfb_ms': 1000.0, 'transfer_ms': 250.0,
+        'client_ms': 750.0, 'slow': True, 'stack_id': 'stack',
+        'resource_type': 'F5::Sys::iAppService', 'handler': 'handle_create'
+    }
+
+
+def test_retries_logged_once(logged):
+    CONF.set_override('wire_log_sample_rate', 1.0, group='f5_heat')
+    adapter = f5_bigip_connection.DeviceAdapter(
+        (2, 10), retry_policy=mixins.RetryPolicy()
+    )
+    with mock.patch.object(mixins.eventlet, 'sleep'):
+        send(adapter, request(), response(503), response())
+    [entry] = entries(logged, 'info')
+    assert entry['attempts'] == 2
+    assert entry['status'] == 200
+    assert 'error' not in entry
+
+
+def test_failure_logged(logged):
+    CONF.set_override('wire_log_sample_rate', 1.0, group='f5_heat')
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10))
+    with pytest.raises(ConnectionError):
+        send(adapter, request(), ConnectionError('unreachable'))
+    [entry] = entries(logged, 'info')
+    assert entry['error'] == 'ConnectionError'
+    assert entry['status'] is None
+    assert 'ttfb_ms' not in entry
+
+
+def test_logins_always_logged(logged):
+    adapter = f5_bigip_connection.DeviceAdapter((2, 10))
+    send(adapter, request('POST', 'shared/authn/login', '{}'), response())
+    [entry] = entries(logged, 'info')
+    assert entry['endpoint'] == '/mgmt/shared/authn/login'
+
+
+def test_streamed_body_not_read(logged):
+    CONF.set_override('wire_log_sample_rate', 1.0, group='f5_heat')
+    streamed = Response()
+    streamed.status_code = 200
+    streamed.headers['Content-Length'] = '4096'
+    streamed.raw = mock.MagicMock()
+    send(f5_bigip_connection.DeviceAdapter((2, 10)), request(), streamed,
+         stream=True)
+    [entry] = entries(logged, 'info')
+    assert entry['received_bytes'] == 4096
+    assert not streamed.raw.stream.called
+    assert wire_log.current() is None
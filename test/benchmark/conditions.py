@@ -0,0 +1,216 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Production-like network and device conditions for a FakeBigIP.
+
+:class:`NetworkConditions` decides, for every request a
+:class:`~fake_bigip.FakeBigIP` serves, how long it is delayed and whether
+it fails. It can apply:
+
+- latency drawn from a distribution, per endpoint, standing in for the
+  round trip over a WAN link and the time the device takes to answer;
+- a bandwidth cap, delaying each request by the time its bodies take to
+  transfer;
+- random 503s, and 503s whenever more requests are in flight than the
+  device is willing to serve;
+- random timeouts, where the device accepts a request and never answers;
+- the cost of authenticating, paid by every login and by every request
+  authenticated with a username and password rather than a token.
+
+Random choices come from a seeded generator, so a benchmark run can be
+repeated exactly.
+'''
+
+import collections
+import math
+import random
+import threading
+
+
+LOGIN_PATH = '/mgmt/shared/authn/login'
+
+# Seconds a request that times out is held before its connection is closed.
+DEFAULT_HANG = 60
+
+UNAVAILABLE = 'unavailable'
+TIMEOUT = 'timeout'
+
+# What happens to one request: seconds to delay it before it is served,
+# and the fault to inject, if any.
+Plan = collections.namedtuple('Plan', ['delay', 'fault'])
+
+
+def constant(seconds):
+    '''Latency of exactly seconds.'''
+
+    return lambda rng: seconds
+
+
+def uniform(low, high):
+    '''Latency spread evenly between low and high seconds.'''
+
+    return lambda rng: rng.uniform(low, high)
+
+
+def normal(mean, stddev):
+    '''Normally distributed latency, never below zero.'''
+
+    return lambda rng: max(0.0, rng.gauss(mean, stddev))
+
+
+def lognormal(median, sigma):
+    '''Latency with a long tail above its median, as WAN latency has.'''
+
+    return lambda rng: median * math.exp(rng.gauss(0.0, sigma))
+
+
+def _distribution(latency):
+    if latency is None or callable(latency):
+        return latency
+    return constant(latency)
+
+
+class _Rule(object):
+
+    def __init__(self, method=None, path=None, latency=None,
+                 error_rate=None, timeout_rate=None):
+        self.method = method
+        self.path = path
+        self.latency = _distribution(latency)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+
+    def matches(self, method, path):
+        return ((self.method is None or self.method == method) and
+                (self.path is None or
+                 path.startswith('/mgmt/' + self.path)))
+
+    def specificity(self):
+        return (len(self.path or ''), self.method is not None)
+
+
+class NetworkConditions(object):
+    '''Latency and faults for the requests served by a FakeBigIP.
+
+    The arguments apply to every request. :meth:`add_rule` overrides them
+    for the requests to one endpoint.
+
+    :param latency: seconds, or a distribution such as :func:`uniform`
+    :param bandwidth: bytes per second both ways, or None for no cap
+    :param error_rate: fraction of requests answered with a 503
+    :param timeout_rate: fraction of requests never answered
+    :param login_cost: seconds the device takes to authenticate a user
+    :param max_in_flight: requests the device serves at once before it
+                          answers 503, or None for no limit
+    :param hang: seconds a request that times out is held
+    :param seed: seed for the random choices
+    '''
+
+    def __init__(self, latency=None, bandwidth=None, error_rate=0.0,
+                 timeout_rate=0.0, login_cost=0.0, max_in_flight=None,
+                 hang=DEFAULT_HANG, seed=None):
+        self.default = _Rule(
+            latency=latency, error_rate=error_rate, timeout_rate=timeout_rate
+        )
+        self.bandwidth = bandwidth
+        self.login_cost = login_cost
+        self.max_in_flight = max_in_flight
+        self.hang = hang
+        self.rules = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def add_rule(self, method=None, path=None, latency=None,
+                 error_rate=None, timeout_rate=None):
+        '''Override conditions for the requests to one endpoint.
+
+        The most specific rule matching a request applies: the one with the
+        longest path, then one naming the method. What it leaves as None
+        comes from the conditions for every request.
+
+        :param method: HTTP method, or None for any
+        :param path: path below /mgmt/ the request starts with, such as
+                     'tm/ltm/pool', or None for any
+        :returns: self, so rules can be chained
+        '''
+
+        self.rules.append(
+            _Rule(method, path, latency, error_rate, timeout_rate)
+        )
+        return self
+
+    def _rule(self, method, path):
+        matching = [rule for rule in self.rules if rule.matches(method, path)]
+        if not matching:
+            return self.default
+        rule = max(matching, key=_Rule.specificity)
+        return _Rule(
+            latency=rule.latency or self.default.latency,
+            error_rate=(self.default.error_rate if rule.error_rate is None
+                        else rule.error_rate),
+            timeout_rate=(self.default.timeout_rate
+                          if rule.timeout_rate is None
+                          else rule.timeout_rate)
+        )
+
+    def plan(self, method, path, password_auth, in_flight):
+        '''Decide the delay and fault for one request.
+
+        :param password_auth: whether the device has to authenticate a
+                              user to serve the request
+        :param in_flight: requests in flight, including this one
+        :returns: Plan
+        '''
+
+        rule = self._rule(method, path)
+        with self._lock:
+            delay = rule.latency(self._random) if rule.latency else 0.0
+            draw = self._random.random()
+        if password_auth or path.startswith(LOGIN_PATH):
+            delay += self.login_cost
+        fault = None
+        if draw < rule.timeout_rate:
+            fault = TIMEOUT
+        elif draw < rule.timeout_rate + rule.error_rate:
+            fault = UNAVAILABLE
+        elif (self.max_in_flight is not None and
+                in_flight > self.max_in_flight):
+            fault = UNAVAILABLE
+        return Plan(delay, fault)
+
+    def transfer_time(self, size):
+        '''Seconds size bytes take to cross the link.'''
+
+        if not self.bandwidth:
+            return 0.0
+        return float(size) / self.bandwidth
+
+
+def wan(seed=None, **kwargs):
+    '''Conditions of a device behind a 50-150 ms WAN link under load.
+
+    Round trips take 50 to 150 ms, 1% of requests fail with a 503, and a
+    user takes 20 ms to authenticate. Keyword arguments override these.
+    '''
+
+    settings = {
+        'latency': uniform(0.05, 0.15),
+        'error_rate': 0.01,
+        'login_cost': 0.02
+    }
+    settings.update(kwargs)
+    return NetworkConditions(seed=seed, **settings)
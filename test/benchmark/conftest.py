@@ -0,0 +1,86 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import pytest
+
+from f5_heat.resources.common import f5_bigip_connection
+
+from benchmark.conditions import wan
+from benchmark.fake_bigip import FakeBigIP
+from benchmark import harness
+
+
+@pytest.fixture
+def fake_bigip():
+    '''A started FakeBigIP, with no connection to it cached afterwards.'''
+
+    with FakeBigIP() as device:
+        yield device
+    f5_bigip_connection.clear_connections()
+
+
+@pytest.fixture
+def wan_bigip():
+    '''A started FakeBigIP behind a WAN link, as described by wan().'''
+
+    with FakeBigIP(conditions=wan(seed=0)) as device:
+        yield device
+    f5_bigip_connection.clear_connections()
+
+
+@pytest.fixture
+def bigip_connection(fake_bigip):
+    '''A probed BigIPConnection to the fake_bigip.'''
+
+    return f5_bigip_connection.probe_connection(
+        fake_bigip.address, fake_bigip.username, fake_bigip.password
+    )
+
+
+def pytest_terminal_summary(terminalreporter):
+    if harness.MEMORY_RESULTS:
+        terminalreporter.section('Memory per 1000 resources')
+        terminalreporter.write_line('{0:<40} {1:>12} {2:>12}'.format(
+            'stacks', 'retained MiB', 'peak MiB'
+        ))
+        for subject, retained, peak in harness.MEMORY_RESULTS:
+            terminalreporter.write_line('{0:<40} {1:>12.1f} {2:>12.1f}'.format(
+                subject, retained / 1048576.0, peak / 1048576.0
+            ))
+    if harness.THROUGHPUT_RESULTS:
+        terminalreporter.section('Objects created per second')
+        terminalreporter.write_line('{0:<40} {1:>12} {2:>12}'.format(
+            'created', 'serial', 'concurrent'
+        ))
+        for subject, serial, concurrent in harness.THROUGHPUT_RESULTS:
+            terminalreporter.write_line('{0:<40} {1:>12.1f} {2:>12.1f}'.format(
+                subject, serial, concurrent
+            ))
+    if not harness.RESULTS:
+        return
+    terminalreporter.section('REST request usage')
+    terminalreporter.write_line('{0:<40} {1:<7} {2:<10} {3:>6} {4:>8} '
+                                '{5:>6} {6:>9} {7:>9}'.format(
+                                    'resource', 'handler', 'path', 'size',
+                                    'requests', 'logins', 'bytes', 'ms'))
+    for subject, handler, path, size, usage in harness.RESULTS:
+        terminalreporter.write_line(
+            '{0:<40} {1:<7} {2:<10} {3:>6} {4:>8} {5:>6} {6:>9} '
+            '{7:>9.1f}'.format(subject, handler, path, size,
+                               usage.requests, usage.logins, usage.bytes,
+                               usage.seconds * 1000)
+        )
@@ -0,0 +1,815 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''In-process stand-in for the iControl® REST API of a BIG-IP® device.
+
+:class:`FakeBigIP` serves HTTPS on a loopback port and models the parts of
+the API the plugins use: login tokens, folders, pools and their members,
+virtual servers, iApp® templates and services, device groups, sync and
+failover status, config save, config-sync and transactions. Objects are
+validated the way the device validates them, and failures carry the status
+codes the device returns: 401 for bad credentials, 404 for a missing
+object, 409 for a duplicate and 400 for a broken reference or an object
+still in use.
+
+Every request is recorded, so tests and benchmarks can count the requests
+a handler costs and how long they took, without a device. Give it
+:class:`~conditions.NetworkConditions` to serve them with the latency and
+faults of a device in production.
+'''
+
+import base64
+import binascii
+import collections
+import contextlib
+import copy
+import itertools
+import json
+import os
+import socket
+import ssl
+import sys
+import threading
+import time
+import uuid
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+from six.moves.urllib import parse as urlparse
+
+from benchmark.conditions import NetworkConditions
+from benchmark.conditions import TIMEOUT
+from benchmark.conditions import UNAVAILABLE
+
+
+CERTFILE = os.path.join(os.path.dirname(__file__), 'fake_bigip.pem')
+
+TMOS_VERSION = '12.1.0'
+TOKEN_HEADER = 'X-F5-Auth-Token'
+TRANSACTION_HEADER = 'X-F5-REST-Coordination-Id'
+DEFAULT_TOKEN_TIMEOUT = 1200
+
+SYNC_STATUS_ENTRY = 'https://localhost/mgmt/tm/cm/sync-status/0'
+FAILOVER_STATUS_ENTRY = 'https://localhost/mgmt/tm/cm/failover-status/0'
+
+# Collections of configuration objects, by path below /mgmt/tm/, with the
+# kind of their objects and the name the device gives them in errors.
+COLLECTIONS = collections.OrderedDict([
+    ('sys/application/template', (
+        'tm:sys:application:template:templatestate', 'template'
+    )),
+    ('sys/application/service', (
+        'tm:sys:application:service:servicestate', 'application service'
+    )),
+    ('cm/device-group', ('tm:cm:device-group:device-groupstate',
+                         'device group')),
+    ('ltm/virtual', ('tm:ltm:virtual:virtualstate', 'Virtual Server')),
+    ('ltm/pool', ('tm:ltm:pool:poolstate', 'Pool')),
+    ('sys/folder', ('tm:sys:folder:folderstate', 'folder'))
+])
+MEMBER_KIND = 'tm:ltm:pool:members:membersstate'
+MEMBERS_KIND = 'tm:ltm:pool:members:memberscollectionstate'
+
+# One record per request served, with the size of its bodies in bytes.
+Request = collections.namedtuple(
+    'Request',
+    ['method', 'path', 'status', 'started', 'elapsed', 'received', 'sent']
+)
+
+
+class RESTError(Exception):
+    '''A request the device refuses, with its status code.'''
+
+    def __init__(self, code, message):
+        super(RESTError, self).__init__(message)
+        self.code = code
+        self.message = message
+
+    def payload(self):
+        return {'code': self.code, 'message': self.message, 'errorStack': []}
+
+
+def _self_link(path):
+    return 'https://localhost/mgmt/tm/{0}?ver={1}'.format(path, TMOS_VERSION)
+
+
+def _stats(entry, **descriptions):
+    return {
+        entry: {
+            'nestedStats': {
+                'entries': dict(
+                    (key, {'description': value})
+                    for key, value in descriptions.items()
+                )
+            }
+        }
+    }
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response in one write, so that time measured is not spent
+    # on Nagle's algorithm waiting for delayed ACKs between header lines.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _serve(self):
+        device = self.server.device
+        started = time.time()
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        with device.serving() as in_flight:
+            plan = device.conditions.plan(
+                self.command,
+                self.path,
+                self.headers.get(TOKEN_HEADER) is None and
+                self.headers.get('Authorization') is not None,
+                in_flight
+            )
+            if plan.fault == TIMEOUT:
+                device.wait(device.conditions.hang)
+                self.close_connection = True
+                device.record(self.command, self.path, None, started,
+                              time.time() - started, len(body))
+                return
+            device.wait(plan.delay)
+            if plan.fault == UNAVAILABLE:
+                status, payload = 503, RESTError(
+                    503, 'Service Unavailable'
+                ).payload()
+            else:
+                status, payload = device.handle(
+                    self.command, self.path, self.headers, body
+                )
+            data = b'' if payload is None else json.dumps(payload).encode()
+            device.wait(
+                device.conditions.transfer_time(len(body) + len(data))
+            )
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        device.record(self.command, self.path, status, started,
+                      time.time() - started, len(body), len(data))
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _serve
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop pooled connections without closing TLS first.
+        if not isinstance(sys.exc_info()[1], socket.error):
+            BaseHTTPServer.HTTPServer.handle_error(
+                self, request, client_address
+            )
+
+
+class FakeBigIP(object):
+    '''A BIG-IP® REST API served from the test process.
+
+    Use it as a context manager, or call :meth:`start` and :meth:`stop`.
+    Connect to it at :attr:`address` with the username and password it was
+    created with.
+    '''
+
+    def __init__(self, username='admin', password='admin',
+                 tmos_version=TMOS_VERSION, modules=('ltm',),
+                 token_timeout=DEFAULT_TOKEN_TIMEOUT, conditions=None):
+        self.username = username
+        self.password = password
+        self.tmos_version = tmos_version
+        self.modules = modules
+        self.token_timeout = token_timeout
+        self.failover_status = 'ACTIVE'
+        self.sync_status = 'In Sync'
+        self.saves = 0
+        self.log = []
+        self._tokens = {}
+        self._transactions = {}
+        self._transaction_ids = itertools.count(1)
+        self._objects = dict(
+            (collection, collections.OrderedDict())
+            for collection in COLLECTIONS
+        )
+        self._members = {}
+        self._objects['sys/folder']['/Common'] = self._object(
+            'sys/folder', '/Common', {'name': 'Common', 'subPath': '/'}
+        )
+        self.conditions = conditions or NetworkConditions()
+        self._in_flight = 0
+        self._stopped = threading.Event()
+        self._lock = threading.RLock()
+        self._server = None
+
+    def start(self):
+        '''Listen on an ephemeral loopback port and serve in a thread.'''
+
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.device = self
+        context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        context.load_cert_chain(CERTFILE)
+        self._server.socket = context.wrap_socket(
+            self._server.socket, server_side=True
+        )
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def address(self):
+        '''host:port to give the plugins as the device ip.'''
+
+        return '127.0.0.1:{0}'.format(self._server.server_address[1])
+
+    @contextlib.contextmanager
+    def serving(self):
+        '''Count a request in flight while it is served.
+
+        :returns: requests in flight, including this one
+        '''
+
+        with self._lock:
+            self._in_flight += 1
+            in_flight = self._in_flight
+        try:
+            yield in_flight
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def wait(self, seconds):
+        '''Delay a request, unless the device is stopped meanwhile.'''
+
+        if seconds > 0:
+            self._stopped.wait(seconds)
+
+    def record(self, method, path, status, started, elapsed, received=0,
+               sent=0):
+        '''Log a request served; status is None if it was never answered.'''
+
+        with self._lock:
+            self.log.append(Request(
+                method, path, status, started, elapsed, received, sent
+            ))
+
+    def count(self, method=None, path=None):
+        '''Count the requests served, by method and path below /mgmt/.
+
+        :param path: count only requests whose path starts with this
+        '''
+
+        with self._lock:
+            return sum(
+                1 for request in self.log
+                if (method is None or request.method == method) and
+                (path is None or
+                 request.path.startswith('/mgmt/' + path))
+            )
+
+    def reset_log(self):
+        with self._lock:
+            del self.log[:]
+
+    def create(self, collection, **body):
+        '''Create an object directly, as if it had been configured already.
+
+        :raises: RESTError
+        '''
+
+        with self._lock:
+            return copy.deepcopy(self._collection('POST', collection, body)[1])
+
+    def get(self, collection, full_path):
+        '''Return a copy of an object, or None if it does not exist.'''
+
+        with self._lock:
+            return copy.deepcopy(self._objects[collection].get(full_path))
+
+    def members(self, pool):
+        '''Return the names of the members of a pool, by its full path.'''
+
+        with self._lock:
+            return list(self._members.get(pool, ()))
+
+    def handle(self, method, path, headers, body):
+        '''Serve one request.
+
+        :returns: status code and JSON payload, or None for an empty body
+        '''
+
+        url = urlparse.urlsplit(path)
+        with self._lock:
+            try:
+                try:
+                    body = json.loads(body.decode('utf-8')) if body else {}
+                except ValueError:
+                    raise RESTError(
+                        400, 'Found invalid JSON body in the request.'
+                    )
+                if url.path.rstrip('/') == '/mgmt/shared/authn/login':
+                    if method != 'POST':
+                        raise RESTError(405, 'Method not allowed')
+                    return 200, self._login(body)
+                self._authenticate(headers)
+                transaction = headers.get(TRANSACTION_HEADER)
+                if (transaction and method != 'GET' and
+                        not url.path.startswith('/mgmt/tm/transaction')):
+                    return 200, self._enqueue(
+                        transaction, method, url.path, body
+                    )
+                return self._route(method, url.path, body)
+            except RESTError as ex:
+                return ex.code, ex.payload()
+
+    def _login(self, body):
+        if (body.get('username') != self.username or
+                body.get('password') != self.password):
+            raise RESTError(401, 'Authentication failed.')
+        token = uuid.uuid4().hex.upper()[:26]
+        self._tokens[token] = time.time() + self.token_timeout
+        return {
+            'username': self.username,
+            'loginProviderName': body.get('loginProviderName', 'tmos'),
+            'token': {
+                'token': token,
+                'name': token,
+                'userName': self.username,
+                'timeout': self.token_timeout,
+                'expirationMicros': int(
+                    self._tokens[token] * 1000000
+                ),
+                'kind': 'shared:authz:tokens:authtokenitemstate'
+            }
+        }
+
+    def _authenticate(self, headers):
+        token = headers.get(TOKEN_HEADER)
+        if token is not None:
+            if self._tokens.get(token, 0) > time.time():
+                return
+            raise RESTError(401, 'X-F5-Auth-Token has expired.')
+        authorization = headers.get('Authorization') or ''
+        scheme, _, credentials = authorization.partition(' ')
+        if scheme.lower() == 'basic':
+            try:
+                decoded = _b64decode(credentials)
+            except ValueError:
+                decoded = ''
+            if decoded == '{0}:{1}'.format(self.username, self.password):
+                return
+        raise RESTError(401, 'Authorization failed: no user authentication '
+                             'header or token detected.')
+
+    def _route(self, method, path, body):
+        if not path.startswith('/mgmt/tm/'):
+            raise RESTError(404, 'Public URI path not registered: ' +
+                            path[len('/mgmt'):])
+        resource = path[len('/mgmt/tm/'):].rstrip('/')
+        if resource == 'transaction' or resource.startswith('transaction/'):
+            return self._transaction(method, resource, body)
+        route = {
+            ('GET', 'sys'): self._sys,
+            ('GET', 'sys/version'): self._version,
+            ('GET', 'sys/provision'): self._provision,
+            ('GET', 'cm/sync-status'): self._sync_status,
+            ('GET', 'cm/failover-status'): self._failover,
+            ('POST', 'cm'): self._cm_command,
+            ('POST', 'sys/config'): self._config_command
+        }.get((method, resource))
+        if route is not None:
+            return 200, route(body)
+        for collection in COLLECTIONS:
+            if resource == collection:
+                return self._collection(method, collection, body)
+            if resource.startswith(collection + '/'):
+                return self._item(
+                    method, collection, resource[len(collection) + 1:], body
+                )
+        raise RESTError(404, 'Public URI path not registered: /tm/' + resource)
+
+    def _sys(self, body):
+        return {'kind': 'tm:sys:syscollectionstate',
+                'selfLink': _self_link('sys'),
+                'items': []}
+
+    def _version(self, body):
+        return {
+            'kind': 'tm:sys:version:versionstats',
+            'selfLink': _self_link('sys/version'),
+            'entries': _stats(
+                'https://localhost/mgmt/tm/sys/version/0',
+                Product='BIG-IP',
+                Version=self.tmos_version
+            )
+        }
+
+    def _provision(self, body):
+        return {
+            'kind': 'tm:sys:provision:provisioncollectionstate',
+            'selfLink': _self_link('sys/provision'),
+            'items': [
+                {'name': module, 'level': 'nominal'}
+                for module in self.modules
+            ]
+        }
+
+    def _sync_status(self, body):
+        return {
+            'kind': 'tm:cm:sync-status:sync-statusstats',
+            'selfLink': _self_link('cm/sync-status'),
+            'entries': _stats(
+                SYNC_STATUS_ENTRY,
+                status=self.sync_status,
+                color='green' if self.sync_status == 'In Sync' else 'yellow'
+            )
+        }
+
+    def _failover(self, body):
+        return {
+            'kind': 'tm:cm:failover-status:failover-statusstats',
+            'selfLink': _self_link('cm/failover-status'),
+            'entries': _stats(FAILOVER_STATUS_ENTRY,
+                              status=self.failover_status)
+        }
+
+    def _cm_command(self, body):
+        args = body.get('utilCmdArgs', '')
+        if body.get('command') != 'run' or \
+                not args.startswith('config-sync to-group '):
+            raise RESTError(400, 'Unsupported command: ' + json.dumps(body))
+        group = args[len('config-sync to-group '):].strip()
+        if not any(path.split('/')[-1] == group
+                   for path in self._objects['cm/device-group']):
+            raise RESTError(
+                400, '01070734:3: Configuration error: Device group ' +
+                group + ' not found'
+            )
+        self.sync_status = 'In Sync'
+        return dict(body, kind='tm:cm:runstate')
+
+    def _config_command(self, body):
+        if body.get('command') != 'save':
+            raise RESTError(400, 'Unsupported command: ' + json.dumps(body))
+        self.saves += 1
+        return dict(body, kind='tm:sys:config:savestate')
+
+    def _changed(self):
+        if self._objects['cm/device-group']:
+            self.sync_status = 'Changes Pending'
+
+    @staticmethod
+    def _full_path(collection, identifier):
+        '''Full path of an object from its identifier in a URI.'''
+
+        full_path = identifier.replace('~', '/')
+        if full_path.startswith('/'):
+            return full_path
+        if collection == 'sys/folder':
+            return '/' + full_path
+        return '/Common/' + full_path
+
+    def _object(self, collection, full_path, body):
+        obj = dict(body)
+        obj.update({
+            'kind': COLLECTIONS[collection][0],
+            'fullPath': full_path,
+            'generation': 1,
+            'selfLink': _self_link(
+                collection + '/' + full_path.replace('/', '~')
+            )
+        })
+        return obj
+
+    def _missing(self, collection, full_path):
+        return RESTError(404, '01020036:3: The requested {0} ({1}) was not '
+                              'found.'.format(COLLECTIONS[collection][1],
+                                              full_path))
+
+    def _lookup(self, collection, full_path):
+        try:
+            return self._objects[collection][full_path]
+        except KeyError:
+            raise self._missing(collection, full_path)
+
+    def _require_folder(self, folder):
+        if folder not in self._objects['sys/folder']:
+            raise self._missing('sys/folder', folder)
+
+    def _collection(self, method, collection, body):
+        if method == 'GET':
+            return 200, {
+                'kind': COLLECTIONS[collection][0].replace(
+                    'state', 'collectionstate'
+                ),
+                'selfLink': _self_link(collection),
+                'items': list(self._objects[collection].values())
+            }
+        if method != 'POST':
+            raise RESTError(405, 'Method not allowed')
+        name = body.get('name')
+        if not name:
+            raise RESTError(400, "'name' is a required property")
+        if collection == 'sys/folder':
+            parent = body.get('subPath') or '/'
+            if parent != '/':
+                self._require_folder(parent.rstrip('/'))
+            full_path = parent.rstrip('/') + '/' + name
+            body = dict(body, subPath=parent)
+        else:
+            partition = body.get('partition') or 'Common'
+            self._require_folder('/' + partition)
+            full_path = '/{0}/{1}'.format(partition, name)
+            if collection == 'sys/application/service':
+                full_path = '/{0}/{1}.app/{1}'.format(partition, name)
+            body = dict(body, partition=partition)
+        if full_path in self._objects[collection]:
+            raise RESTError(409, '01020066:3: The requested {0} ({1}) '
+                                 'already exists.'.format(
+                                     COLLECTIONS[collection][1], full_path))
+        members = body.pop('members', None) or []
+        self._check_references(collection, body)
+        if collection == 'ltm/pool':
+            members = [self._member(full_path, body, member)
+                       for member in members]
+            if len(set(m['fullPath'] for m in members)) != len(members):
+                raise RESTError(409, '01020066:3: The requested Pool Member '
+                                     'already exists.')
+        obj = self._object(collection, full_path, body)
+        self._objects[collection][full_path] = obj
+        if collection == 'ltm/pool':
+            self._members[full_path] = collections.OrderedDict(
+                (member['fullPath'], member) for member in members
+            )
+        self._changed()
+        return 200, obj
+
+    def _check_references(self, collection, body):
+        partition = body.get('partition', 'Common')
+        referenced = {
+            'ltm/virtual': ('ltm/pool', 'pool'),
+            'sys/application/service': ('sys/application/template',
+                                        'template')
+        }.get(collection)
+        if referenced is None:
+            return
+        target, key = referenced
+        if not body.get(key):
+            if collection == 'sys/application/service':
+                raise RESTError(400, "'template' is a required property")
+            return
+        full_path = _reference(body[key], partition)
+        if full_path not in self._objects[target]:
+            raise RESTError(400, '01070226:3: {0} {1} does not '
+                                 'exist.'.format(COLLECTIONS[target][1],
+                                                 full_path))
+
+    def _in_use(self, collection, full_path):
+        '''Return the full path of an object using this one, or None.'''
+
+        if collection == 'sys/folder':
+            for objects in self._objects.values():
+                for other in objects:
+                    if other.startswith(full_path + '/'):
+                        return other
+        references = {
+            'ltm/pool': ('ltm/virtual', 'pool'),
+            'sys/application/template': ('sys/application/service',
+                                         'template')
+        }.get(collection)
+        if references is not None:
+            referrers, key = references
+            for other, obj in self._objects[referrers].items():
+                if obj.get(key) and _reference(
+                        obj[key], obj['partition']) == full_path:
+                    return other
+        return None
+
+    def _item(self, method, collection, rest, body):
+        identifier, _, sub = rest.partition('/')
+        full_path = self._full_path(collection, identifier)
+        if sub:
+            if collection == 'ltm/pool' and (
+                    sub == 'members' or sub.startswith('members/')):
+                return self._members_request(
+                    method, full_path, sub[len('members/'):], body
+                )
+            raise RESTError(404, 'Public URI path not registered: /tm/' +
+                            collection + '/' + rest)
+        obj = self._lookup(collection, full_path)
+        if method == 'GET':
+            return 200, obj
+        if method in ('PUT', 'PATCH'):
+            for key in ('name', 'partition', 'fullPath', 'kind'):
+                body.pop(key, None)
+            self._check_references(collection, dict(obj, **body))
+            obj.update(body)
+            obj['generation'] += 1
+            self._changed()
+            return 200, obj
+        if method == 'DELETE':
+            if full_path == '/Common':
+                raise RESTError(400, '01070829:3: Cannot delete the Common '
+                                     'folder.')
+            user = self._in_use(collection, full_path)
+            if user is not None:
+                raise RESTError(400, '01070265:3: The {0} ({1}) cannot be '
+                                     'deleted because it is in use by '
+                                     '({2}).'.format(
+                                         COLLECTIONS[collection][1],
+                                         full_path, user))
+            del self._objects[collection][full_path]
+            self._members.pop(full_path, None)
+            self._changed()
+            return 200, None
+        raise RESTError(405, 'Method not allowed')
+
+    def _member(self, pool, pool_body, body):
+        name = body.get('name') or ''
+        address, _, port = name.rpartition(':')
+        if not address or not port.isdigit():
+            raise RESTError(400, '01070587:3: The requested pool member '
+                                 '({0}) must have a port.'.format(name))
+        partition = body.get('partition') or pool_body['partition']
+        full_path = '/{0}/{1}'.format(partition, name)
+        member = dict(body)
+        member.update({
+            'kind': MEMBER_KIND,
+            'partition': partition,
+            'address': body.get('address') or address,
+            'fullPath': full_path,
+            'generation': 1,
+            'selfLink': _self_link('ltm/pool/{0}/members/{1}'.format(
+                pool.replace('/', '~'), full_path.replace('/', '~')
+            ))
+        })
+        return member
+
+    def _members_request(self, method, pool, identifier, body):
+        pool_body = self._lookup('ltm/pool', pool)
+        members = self._members[pool]
+        if not identifier:
+            if method == 'GET':
+                return 200, {
+                    'kind': MEMBERS_KIND,
+                    'selfLink': _self_link(
+                        'ltm/pool/{0}/members'.format(pool.replace('/', '~'))
+                    ),
+                    'items': list(members.values())
+                }
+            if method != 'POST':
+                raise RESTError(405, 'Method not allowed')
+            member = self._member(pool, pool_body, body)
+            if member['fullPath'] in members:
+                raise RESTError(409, '01020066:3: The requested Pool Member '
+                                     '({0} {1}) already exists.'.format(
+                                         pool, member['fullPath']))
+            members[member['fullPath']] = member
+            self._changed()
+            return 200, member
+        full_path = self._full_path('ltm/pool', identifier)
+        if full_path not in members:
+            raise RESTError(404, '01020036:3: The requested Pool Member '
+                                 '({0} {1}) was not found.'.format(
+                                     pool, full_path))
+        if method == 'GET':
+            return 200, members[full_path]
+        if method in ('PUT', 'PATCH'):
+            members[full_path].update(body)
+            members[full_path]['generation'] += 1
+            self._changed()
+            return 200, members[full_path]
+        if method == 'DELETE':
+            del members[full_path]
+            self._changed()
+            return 200, None
+        raise RESTError(405, 'Method not allowed')
+
+    def _transaction_body(self, transaction_id):
+        transaction = self._transactions[transaction_id]
+        return {
+            'kind': 'tm:transactionstate',
+            'transId': transaction_id,
+            'state': transaction['state'],
+            'timeoutSeconds': 120,
+            'selfLink': _self_link('transaction/{0}'.format(transaction_id))
+        }
+
+    def _transaction(self, method, resource, body):
+        parts = resource.split('/')
+        if len(parts) == 1:
+            if method != 'POST':
+                raise RESTError(405, 'Method not allowed')
+            transaction_id = next(self._transaction_ids)
+            self._transactions[transaction_id] = {
+                'state': 'STARTED', 'commands': []
+            }
+            return 200, self._transaction_body(transaction_id)
+        transaction_id = self._transaction_id(parts[1])
+        transaction = self._transactions[transaction_id]
+        if len(parts) == 3 and parts[2] == 'commands' and method == 'GET':
+            return 200, {
+                'kind': 'tm:transaction:commandscollectionstate',
+                'items': transaction['commands']
+            }
+        if len(parts) != 2:
+            raise RESTError(404, 'Public URI path not registered: /tm/' +
+                            resource)
+        if method == 'GET':
+            return 200, self._transaction_body(transaction_id)
+        if method == 'DELETE':
+            del self._transactions[transaction_id]
+            return 200, None
+        if method == 'PATCH' and body.get('state') == 'VALIDATING':
+            return self._commit(transaction_id)
+        raise RESTError(400, 'Unsupported transaction request: ' +
+                        json.dumps(body))
+
+    def _transaction_id(self, identifier):
+        try:
+            transaction_id = int(identifier)
+        except ValueError:
+            transaction_id = None
+        if transaction_id not in self._transactions:
+            raise RESTError(404, 'Transaction with ID {0} not found.'.format(
+                identifier))
+        return transaction_id
+
+    def _enqueue(self, identifier, method, path, body):
+        transaction = self._transactions[self._transaction_id(identifier)]
+        if transaction['state'] != 'STARTED':
+            raise RESTError(400, 'Transaction {0} is {1}.'.format(
+                identifier, transaction['state']))
+        command = {
+            'kind': 'tm:transaction:commandsstate',
+            'commandId': len(transaction['commands']) + 1,
+            'method': method,
+            'uri': path,
+            'body': body
+        }
+        transaction['commands'].append(command)
+        return command
+
+    def _commit(self, transaction_id):
+        transaction = self._transactions[transaction_id]
+        saved = copy.deepcopy(
+            (self._objects, self._members, self.sync_status)
+        )
+        try:
+            for command in transaction['commands']:
+                self._route(
+                    command['method'], command['uri'], dict(command['body'])
+                )
+        except RESTError as ex:
+            self._objects, self._members, self.sync_status = saved
+            transaction['state'] = 'FAILED'
+            raise RESTError(400, 'Transaction failed:' + ex.message)
+        transaction['state'] = 'COMPLETED'
+        return 200, self._transaction_body(transaction_id)
+
+
+def _reference(name, partition):
+    '''Full path of an object referenced by name from a partition.'''
+
+    if name.startswith('/'):
+        return name
+    return '/{0}/{1}'.format(partition, name)
+
+
+def _b64decode(credentials):
+    try:
+        return base64.b64decode(credentials).decode('utf-8')
+    except (binascii.Error, TypeError, UnicodeDecodeError):
+        raise ValueError(credentials)
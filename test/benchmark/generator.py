@@ -0,0 +1,208 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Generate HOT templates of large stacks for the load benchmark.
+
+The templates take the same parameters as the success.yaml templates under
+test/functional: the device is given by bigip_ip, bigip_un and bigip_pw.
+Its partitions, pools, members and virtual servers are spread evenly:
+pool i goes in partition i % partitions and virtual server i sends its
+traffic to pool i % pools. The stacks generated for different stack
+numbers have partitions of their own and no addresses in common, so many
+of them can be created on one device at once.
+
+To write one to a file, from the test directory:
+
+    python -m benchmark.generator --preset large > large.yaml
+'''
+
+import argparse
+import collections
+import sys
+
+import yaml
+
+
+TEMPLATE_VERSION = '2015-04-30'
+
+# How large a stack is.
+Scale = collections.namedtuple(
+    'Scale', ['partitions', 'pools', 'members', 'virtual_servers']
+)
+
+PRESETS = {
+    'small': Scale(partitions=2, pools=10, members=50, virtual_servers=10),
+    'medium': Scale(partitions=10, pools=200, members=5000,
+                    virtual_servers=200),
+    'large': Scale(partitions=50, pools=2000, members=100000,
+                   virtual_servers=2000)
+}
+
+DEVICE = 'bigip_rsrc'
+
+
+def _address(network, i):
+    # The i-th host address of a /8, skipping the network address.
+    i += 1
+    return '{0}.{1}.{2}.{3}'.format(
+        network, i // 65536 % 256, i // 256 % 256, i % 256
+    )
+
+
+def partition_name(stack, i):
+    return 'stack{0:03d}_partition{1:03d}'.format(stack, i)
+
+
+def pool_name(i):
+    return 'pool{0:05d}'.format(i)
+
+
+def virtual_server_name(i):
+    return 'vs{0:05d}'.format(i)
+
+
+def _pool_members(scale, stack, pool):
+    # Members are dealt out one at a time, so pool sizes differ by one.
+    count = scale.members // scale.pools + (
+        1 if pool < scale.members % scale.pools else 0
+    )
+    first = stack * scale.members + pool * (
+        scale.members // scale.pools
+    ) + min(pool, scale.members % scale.pools)
+    return [
+        {'member_ip': _address(10, first + member), 'member_port': 80}
+        for member in range(count)
+    ]
+
+
+def generate(scale, stack=0, description=None):
+    '''A HOT template, as a dict, of one stack of the given scale.
+
+    :param scale: Scale
+    :param stack: number of the stack among those created together
+    :returns: dict
+    '''
+
+    if scale.partitions < 1 or (scale.virtual_servers and not scale.pools):
+        raise ValueError(
+            'A stack needs a partition, and a pool for its virtual servers.'
+        )
+    resources = collections.OrderedDict()
+    resources[DEVICE] = {
+        'type': 'F5::BigIP::Device',
+        'properties': {
+            'ip': {'get_param': 'bigip_ip'},
+            'username': {'get_param': 'bigip_un'},
+            'password': {'get_param': 'bigip_pw'}
+        }
+    }
+    for i in range(scale.partitions):
+        resources[partition_name(stack, i)] = {
+            'type': 'F5::Sys::Partition',
+            'depends_on': DEVICE,
+            'properties': {
+                'name': partition_name(stack, i),
+                'bigip_server': {'get_resource': DEVICE}
+            }
+        }
+    for i in range(scale.pools):
+        resources[pool_name(i)] = {
+            'type': 'F5::LTM::Pool',
+            'properties': {
+                'name': pool_name(i),
+                'bigip_server': {'get_resource': DEVICE},
+                'partition': {
+                    'get_resource': partition_name(
+                        stack, i % scale.partitions
+                    )
+                },
+                'members': _pool_members(scale, stack, i)
+            }
+        }
+    for i in range(scale.virtual_servers):
+        pool = i % scale.pools
+        resources[virtual_server_name(i)] = {
+            'type': 'F5::LTM::VirtualServer',
+            'depends_on': pool_name(pool),
+            'properties': {
+                'name': virtual_server_name(i),
+                'bigip_server': {'get_resource': DEVICE},
+                'partition': {
+                    'get_resource': partition_name(
+                        stack, pool % scale.partitions
+                    )
+                },
+                'ip': _address(172, stack * scale.virtual_servers + i),
+                'port': 80,
+                'default_pool': pool_name(pool)
+            }
+        }
+    return collections.OrderedDict([
+        ('heat_template_version', TEMPLATE_VERSION),
+        ('description', description or (
+            'Load test of {0.partitions} partitions, {0.pools} pools, '
+            '{0.members} members and {0.virtual_servers} virtual servers '
+            'on an existing BIG-IP'.format(scale)
+        )),
+        ('parameters', collections.OrderedDict([
+            ('bigip_ip', {'type': 'string', 'label': 'VE Instance IP',
+                          'description': 'IP of existing VE'}),
+            ('bigip_un', {'type': 'string',
+                          'label': 'BigIP Login Username'}),
+            ('bigip_pw', {'type': 'string', 'label': 'BigIP Login Password',
+                          'hidden': True})
+        ])),
+        ('resources', resources)
+    ])
+
+
+class _Dumper(yaml.SafeDumper):
+    pass
+
+
+_Dumper.add_representer(
+    collections.OrderedDict,
+    lambda dumper, data: dumper.represent_dict(data.items())
+)
+
+
+def dump(template, stream=None):
+    '''Write a template as YAML, keeping the order of its sections.'''
+
+    return yaml.dump(template, stream, Dumper=_Dumper,
+                     default_flow_style=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small')
+    parser.add_argument('--stack', type=int, default=0,
+                        help='number of the stack among those created '
+                             'together')
+    for field in Scale._fields:
+        parser.add_argument('--' + field.replace('_', '-'), type=int,
+                            help='overrides the preset')
+    args = parser.parse_args(argv)
+    scale = PRESETS[args.preset]._replace(**dict(
+        (field, getattr(args, field)) for field in Scale._fields
+        if getattr(args, field) is not None
+    ))
+    dump(generate(scale, args.stack), sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Run plugin resource handlers against FakeBigIPs and measure their cost.
+
+A :class:`BenchmarkStack` holds real plugin resources, built from their
+Heat resource types and properties, on a stand-in for a Heat stack. Its
+devices point at :class:`~fake_bigip.FakeBigIP` instances, so running a
+handler sends real requests through the plugins' connection stack.
+
+:func:`measure` counts what the handlers run inside it cost those devices.
+'''
+
+import collections
+import contextlib
+import time
+import uuid
+
+from heat.engine import rsrc_defn
+import mock
+
+from f5_heat.resources.common import config_sync
+from f5_heat.resources.common import f5_bigip_connection
+from f5_heat.resources.common import prewarm
+from f5_heat.resources import f5_bigip_device
+from f5_heat.resources import f5_bigip_device_pair
+from f5_heat.resources import f5_cm_cluster
+from f5_heat.resources import f5_cm_sync
+from f5_heat.resources import f5_ltm_pool
+from f5_heat.resources import f5_ltm_virtualserver
+from f5_heat.resources import f5_sys_iappcompositetemplate
+from f5_heat.resources import f5_sys_iappfulltemplate
+from f5_heat.resources import f5_sys_iappservice
+from f5_heat.resources import f5_sys_partition
+from f5_heat.resources import f5_sys_save
+
+
+PLUGINS = (
+    f5_bigip_device,
+    f5_bigip_device_pair,
+    f5_cm_cluster,
+    f5_cm_sync,
+    f5_ltm_pool,
+    f5_ltm_virtualserver,
+    f5_sys_iappcompositetemplate,
+    f5_sys_iappfulltemplate,
+    f5_sys_iappservice,
+    f5_sys_partition,
+    f5_sys_save
+)
+
+RESOURCE_TYPES = dict(
+    (resource_type, resource_class)
+    for plugin in PLUGINS
+    for resource_type, resource_class in plugin.resource_mapping().items()
+)
+
+LOGIN_PATH = 'shared/authn/login'
+
+# What handlers cost the devices they ran against.
+Usage = collections.namedtuple(
+    'Usage', ['requests', 'logins', 'bytes', 'seconds']
+)
+
+# Usage reported by the benchmarks run, summarized at the end of the run.
+RESULTS = []
+# Memory per thousand resources reported by the load benchmarks, likewise.
+MEMORY_RESULTS = []
+# Objects per second, serially and concurrently, likewise.
+THROUGHPUT_RESULTS = []
+
+
+class Measurement(object):
+    '''Filled in with the Usage of a measure() block when it ends.'''
+
+    usage = None
+
+    def __getattr__(self, name):
+        return getattr(self.usage, name)
+
+
+@contextlib.contextmanager
+def measure(*devices):
+    '''Measure the requests served by devices during the block.
+
+    :param devices: FakeBigIP instances
+    :returns: Measurement
+    '''
+
+    marks = [len(device.log) for device in devices]
+    measurement = Measurement()
+    started = time.time()
+    yield measurement
+    seconds = time.time() - started
+    served = [
+        request
+        for device, mark in zip(devices, marks)
+        for request in device.log[mark:]
+    ]
+    measurement.usage = Usage(
+        requests=len(served),
+        logins=sum(
+            1 for request in served
+            if request.path.startswith('/mgmt/' + LOGIN_PATH)
+        ),
+        bytes=sum(request.received + request.sent for request in served),
+        seconds=seconds
+    )
+
+
+def report(subject, handler, path, size, usage):
+    '''Record the usage of a handler for the summary of the run.
+
+    :param subject: what was measured, such as a resource type
+    :param path: how the handler reached the device, such as 'fast path'
+    :param size: size of its input
+    '''
+
+    RESULTS.append((subject, handler, path, size, usage.usage))
+
+
+def report_memory(subject, retained, peak):
+    '''Record the memory per thousand resources of a load run.
+
+    :param retained: bytes the created resources hold on to
+    :param peak: bytes the peak memory grew by
+    '''
+
+    MEMORY_RESULTS.append((subject, retained, peak))
+
+
+def report_throughput(subject, serial, concurrent):
+    '''Record the objects created per second, serially and concurrently.
+
+    :param serial: objects per second with one request at a time
+    :param concurrent: objects per second with requests sent at once
+    '''
+
+    THROUGHPUT_RESULTS.append((subject, serial, concurrent))
+
+
+def clear_state():
+    '''Forget every connection, warmed stack and pending config-sync.'''
+
+    f5_bigip_connection.clear_connections()
+    prewarm.clear_warmed()
+    config_sync.clear_coalescers()
+
+
+class BenchmarkStack(object):
+    '''Plugin resources on a stand-in for a Heat stack.
+
+    Resources refer to each other by name, as in a template's get_resource.
+    '''
+
+    def __init__(self, name='benchmark'):
+        self.resources = collections.OrderedDict()
+        self.stack = mock.MagicMock(
+            id=str(uuid.uuid4()),
+            root_stack_id=None,
+            action='CREATE',
+            current_traversal=str(uuid.uuid4()),
+            created_time=time.time(),
+            updated_time=None
+        )
+        self.stack.name = name
+        self.stack.resource_by_refid.side_effect = self.resources.get
+        self.stack.values.side_effect = lambda: list(self.resources.values())
+
+    def add(self, name, resource_type, properties):
+        '''Build a resource of a plugin type; it is not created yet.
+
+        :param properties: dict of its properties
+        '''
+
+        resource = RESOURCE_TYPES[resource_type](
+            name,
+            rsrc_defn.ResourceDefinition(
+                name, resource_type, properties=properties
+            ),
+            self.stack
+        )
+        resource.uuid = str(uuid.uuid4())
+        self.resources[name] = resource
+        return resource
+
+    def add_device(self, name, fake, **properties):
+        '''Add an F5::BigIP::Device for a FakeBigIP.
+
+        :param properties: other properties of the device
+        '''
+
+        properties.update({
+            'ip': fake.address,
+            'username': fake.username,
+            'password': fake.password
+        })
+        return self.add(name, 'F5::BigIP::Device', properties)
+
+    def _run(self, name, action):
+        # As Heat does: call the handler, then poll its check until done.
+        resource = self.resources[name]
+        token = getattr(resource, 'handle_' + action.lower())()
+        check = getattr(resource, 'check_{0}_complete'.format(action.lower()),
+                        None)
+        while check is not None and not check(token):
+            pass
+        resource.action = action
+        resource.status = resource.COMPLETE
+        return resource
+
+    def create(self, name):
+        '''Run a resource's create handler until it is complete.'''
+
+        return self._run(name, 'CREATE')
+
+    def delete(self, name):
+        '''Run a resource's delete handler until it is complete.'''
+
+        return self._run(name, 'DELETE')
@@ -0,0 +1,448 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Create and delete whole stacks against a FakeBigIP and measure throughput.
+
+:func:`run` takes HOT templates, such as those from
+:mod:`~generator`, and puts each of their stacks through the lifecycle
+Heat gives it: every resource is created once the resources it depends on
+are, then every resource is deleted once the resources depending on it
+are. The handlers of all the stacks share a pool of greenthreads, as they
+share the workers of a heat-engine.
+
+It reports the objects created on the device per second, the median and
+99th percentile latency of each handler, and per thousand resources, the
+memory the created stacks retain and the peak memory of the run. Run from
+the command line, the FakeBigIP is served by a process of its own, so that
+memory is the handlers' alone. Where tracemalloc is available, --snapshot
+also reports which resource types and methods the retained memory was
+allocated by (see :mod:`~f5_heat.resources.common.memory`).
+
+To run the large stack, or 100 small stacks at once, from the test
+directory, with the top of the repository on the PYTHONPATH:
+
+    python -m benchmark.load --preset large --fast-path
+    python -m benchmark.load --preset small --stacks 100
+
+--wan serves the FakeBigIP behind the link :func:`~conditions.wan`
+describes, and --max-concurrency sets how many requests the devices of the
+stacks send at once; at 1, every request, pool members included, is sent
+serially.
+'''
+
+import argparse
+import collections
+import gc
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import eventlet
+import eventlet.event
+import yaml
+
+from f5_heat.resources.common import memory
+
+from benchmark.conditions import wan
+from benchmark.fake_bigip import FakeBigIP
+from benchmark import generator
+from benchmark.harness import BenchmarkStack
+from benchmark.harness import clear_state
+
+
+# Greenthreads running handlers at once, across all the stacks.
+DEFAULT_WORKERS = 64
+
+DEVICE_TYPE = 'F5::BigIP::Device'
+
+TEST_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Attributed memory listed by the summary of a run with a snapshot.
+SNAPSHOT_TOP = 10
+
+# What a load run cost and how long it took.
+LoadResult = collections.namedtuple(
+    'LoadResult', ['stacks', 'resources', 'objects', 'seconds', 'latencies',
+                   'failures', 'peak_memory', 'baseline_memory',
+                   'retained_memory', 'attribution']
+)
+
+
+def objects_per_second(result):
+    '''Objects created and deleted on the device per second.'''
+
+    return 2 * result.objects / result.seconds if result.seconds else 0.0
+
+
+def percentile(samples, fraction):
+    '''The sample below which fraction of the samples fall.'''
+
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def peak_memory():
+    '''Peak resident memory of the process so far, in bytes.'''
+
+    # Linux reports ru_maxrss in KiB.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def current_memory():
+    '''Resident memory of the process now, in bytes.'''
+
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize()
+
+
+def per_thousand(result, amount):
+    '''An amount of memory per thousand resources of a LoadResult.'''
+
+    return 1000.0 * amount / result.resources if result.resources else 0.0
+
+
+def peak_growth(result):
+    '''How far the peak memory of a run rose above its baseline.'''
+
+    return max(0, result.peak_memory - result.baseline_memory)
+
+
+def _resolve(value, parameters):
+    # Resources refer to each other by name on a BenchmarkStack.
+    if isinstance(value, dict) and len(value) == 1:
+        function, argument = list(value.items())[0]
+        if function == 'get_param':
+            return parameters[argument]
+        if function == 'get_resource':
+            return argument
+    if isinstance(value, dict):
+        return dict(
+            (key, _resolve(item, parameters)) for key, item in value.items()
+        )
+    if isinstance(value, list):
+        return [_resolve(item, parameters) for item in value]
+    return value
+
+
+def _references(value):
+    if isinstance(value, dict):
+        if list(value.keys()) == ['get_resource']:
+            return set([value['get_resource']])
+        return set().union(*[_references(item) for item in value.values()])
+    if isinstance(value, list):
+        return set().union(*[_references(item) for item in value])
+    return set()
+
+
+def dependencies(template):
+    '''The resources each resource of a template depends on.
+
+    :returns: dict of resource name to set of resource names
+    '''
+
+    graph = collections.OrderedDict()
+    for name, definition in template['resources'].items():
+        depends_on = definition.get('depends_on') or []
+        if not isinstance(depends_on, list):
+            depends_on = [depends_on]
+        graph[name] = set(depends_on) | _references(
+            definition.get('properties', {})
+        )
+    return graph
+
+
+def _ordered(graph):
+    # Resources before the resources that depend on them.
+    ordered = []
+    done = set()
+    while len(ordered) < len(graph):
+        ready = [name for name, needs in graph.items()
+                 if name not in done and needs <= done]
+        if not ready:
+            raise ValueError('The template has a dependency loop.')
+        ordered.extend(ready)
+        done.update(ready)
+    return ordered
+
+
+def _objects(template):
+    # What a stack creates on the device: every resource but the device
+    # itself, and every pool member.
+    count = 0
+    for definition in template['resources'].values():
+        if definition['type'] != DEVICE_TYPE:
+            count += 1 + len(
+                definition.get('properties', {}).get('members') or []
+            )
+    return count
+
+
+class _Stack(object):
+
+    def __init__(self, name, template, parameters):
+        defaults = dict(
+            (key, schema['default'])
+            for key, schema in template.get('parameters', {}).items()
+            if 'default' in schema
+        )
+        defaults.update(parameters)
+        self.benchmark = BenchmarkStack(name)
+        for resource_name, definition in template['resources'].items():
+            self.benchmark.add(
+                resource_name,
+                definition['type'],
+                _resolve(definition.get('properties', {}), defaults)
+            )
+        self.graph = dependencies(template)
+        self.order = _ordered(self.graph)
+        self.dependents = dict((name, set()) for name in self.graph)
+        for name, needs in self.graph.items():
+            for need in needs:
+                self.dependents[need].add(name)
+
+
+def _phase(pool, stacks, action, latencies, failures):
+    # Run one handler of every resource, each after those it waits for.
+    for stack in stacks:
+        waits_for = stack.graph if action == 'create' else stack.dependents
+        order = stack.order if action == 'create' else stack.order[::-1]
+        events = dict((name, eventlet.event.Event()) for name in order)
+        for name in order:
+            pool.spawn_n(_handle, stack, name, action, waits_for[name],
+                         events, latencies, failures)
+    pool.waitall()
+
+
+def _handle(stack, name, action, waits_for, events, latencies, failures):
+    succeeded = False
+    try:
+        if all([events[other].wait() for other in waits_for]):
+            started = time.time()
+            getattr(stack.benchmark, action)(name)
+            resource_type = stack.benchmark.resources[name].type()
+            latencies[(resource_type, action)].append(
+                time.time() - started
+            )
+            succeeded = True
+        else:
+            failures.append((stack.benchmark.stack.name, name, action,
+                             'a resource it waits for failed'))
+    except Exception as error:
+        failures.append((stack.benchmark.stack.name, name, action, error))
+    finally:
+        events[name].send(succeeded)
+
+
+def run(templates, fake, workers=DEFAULT_WORKERS, snapshot=False):
+    '''Create, then delete, a stack of each template on fake.
+
+    The stacks are created at the same time, then deleted at the same time.
+    The memory retained is measured between the two.
+
+    :param templates: HOT templates as dicts, whose device parameters are
+                      those of the test/functional templates
+    :param fake: FakeBigIP every stack's device points at, or anything
+                 with its address, username and password
+    :param workers: greenthreads running handlers at once
+    :param snapshot: whether to trace allocations and attribute the memory
+                     the created stacks retain; needs tracemalloc
+    :returns: LoadResult
+    '''
+
+    parameters = {
+        'bigip_ip': fake.address,
+        'bigip_un': fake.username,
+        'bigip_pw': fake.password
+    }
+    stacks = [_Stack('load{0:03d}'.format(i), template, parameters)
+              for i, template in enumerate(templates)]
+    latencies = collections.defaultdict(list)
+    failures = []
+    pool = eventlet.GreenPool(workers)
+    attribution = None
+    if snapshot:
+        memory.start()
+    gc.collect()
+    baseline = current_memory()
+    started = time.time()
+    try:
+        _phase(pool, stacks, 'create', latencies, failures)
+        gc.collect()
+        retained = current_memory() - baseline
+        if snapshot:
+            attribution = memory.attribute(memory.take())
+        _phase(pool, stacks, 'delete', latencies, failures)
+    finally:
+        clear_state()
+    return LoadResult(
+        stacks=len(stacks),
+        resources=sum(len(stack.order) for stack in stacks),
+        objects=sum(_objects(template) for template in templates),
+        seconds=time.time() - started,
+        latencies=dict(latencies),
+        failures=failures,
+        peak_memory=peak_memory(),
+        baseline_memory=baseline,
+        retained_memory=retained,
+        attribution=attribution
+    )
+
+
+def summary(result):
+    '''Lines describing a LoadResult.'''
+
+    lines = [
+        '{0} stacks, {1} resources, {2} objects on the device'.format(
+            result.stacks, result.resources, result.objects
+        ),
+        'created and deleted in {0:.1f} s: {1:.1f} objects/s'.format(
+            result.seconds, objects_per_second(result)
+        ),
+        'peak memory {0:.1f} MiB, {1} failures'.format(
+            result.peak_memory / 1048576.0, len(result.failures)
+        ),
+        'per 1000 resources: {0:.1f} MiB retained, {1:.1f} MiB peak '
+        'growth'.format(
+            per_thousand(result, result.retained_memory) / 1048576.0,
+            per_thousand(result, peak_growth(result)) / 1048576.0
+        ),
+        '{0:<24} {1:<7} {2:>7} {3:>9} {4:>9}'.format(
+            'resource', 'handler', 'count', 'p50 ms', 'p99 ms'
+        )
+    ]
+    for (resource_type, action), samples in sorted(result.latencies.items()):
+        lines.append('{0:<24} {1:<7} {2:>7} {3:>9.1f} {4:>9.1f}'.format(
+            resource_type, action, len(samples),
+            percentile(samples, 0.5) * 1000, percentile(samples, 0.99) * 1000
+        ))
+    if result.attribution is not None:
+        lines.append('{0:<32} {1:<24} {2:>10}'.format(
+            'allocated by', 'method', 'KiB'
+        ))
+        usage = sorted(result.attribution.items(),
+                       key=lambda item: -item[1].size)
+        for (resource_type, method), (size, _) in usage[:SNAPSHOT_TOP]:
+            lines.append('{0:<32} {1:<24} {2:>10.1f}'.format(
+                resource_type or '-', method, size / 1024.0
+            ))
+    return lines
+
+
+class _Device(collections.namedtuple(
+        '_Device', ['address', 'username', 'password'])):
+    '''How to reach a FakeBigIP served by another process.'''
+
+
+def _serve(connection, behind_wan=False):
+    with FakeBigIP(conditions=wan(seed=0) if behind_wan else None) as fake:
+        connection.send(_Device(fake.address, fake.username, fake.password))
+        connection.recv()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--preset', choices=sorted(generator.PRESETS),
+                        default='small')
+    for field in generator.Scale._fields:
+        parser.add_argument('--' + field.replace('_', '-'), type=int,
+                            help='overrides the preset')
+    parser.add_argument('--template', action='append',
+                        help='run this HOT template instead of generating '
+                             'one; may be given more than once')
+    parser.add_argument('--stacks', type=int, default=1,
+                        help='stacks of the preset to run at once')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--fast-path', action='store_true',
+                        help='turn on the REST fast path of the devices')
+    parser.add_argument('--max-concurrency', type=int,
+                        help='requests the devices send at once')
+    parser.add_argument('--wan', action='store_true',
+                        help='serve the device behind a 50-150 ms WAN link')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='attribute the memory the stacks retain to '
+                             'resource types and methods')
+    args = parser.parse_args(argv)
+    if args.snapshot and not memory.available():
+        parser.error('--snapshot needs tracemalloc, from Python 3.4')
+
+    # Serve the device before monkey patching, which eventlet's green SSL
+    # server sockets do not survive.
+    connection, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_serve, args=(child, args.wan))
+    server.daemon = True
+    server.start()
+    device = connection.recv()
+    # As heat-engine does, so the handlers wait on the device concurrently.
+    eventlet.monkey_patch()
+    if args.template:
+        templates = []
+        for path in args.template:
+            with open(path) as template:
+                templates.append(yaml.safe_load(template))
+    else:
+        scale = generator.PRESETS[args.preset]._replace(**dict(
+            (field, getattr(args, field)) for field in generator.Scale._fields
+            if getattr(args, field) is not None
+        ))
+        templates = [generator.generate(scale, stack)
+                     for stack in range(args.stacks)]
+    for template in templates:
+        for definition in template['resources'].values():
+            if definition['type'] != DEVICE_TYPE:
+                continue
+            if args.fast_path:
+                definition['properties']['rest_fast_path'] = True
+            if args.max_concurrency:
+                definition['properties']['max_concurrency'] = \
+                    args.max_concurrency
+    try:
+        result = run(templates, device, args.workers, args.snapshot)
+    finally:
+        connection.send(None)
+        server.join()
+    for line in summary(result):
+        print(line)
+    for failure in result.failures[:10]:
+        print('failed: {0}'.format(failure))
+    return 1 if result.failures else 0
+
+
+def run_cli(scale, *options):
+    '''Run the load CLI on a stack of scale in a fresh interpreter.
+
+    :param options: further command line arguments
+    :returns: what it printed
+    '''
+
+    args = [sys.executable, '-m', 'benchmark.load']
+    for field, value in scale._asdict().items():
+        args += ['--' + field.replace('_', '-'), str(value)]
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [os.path.dirname(TEST_DIR), TEST_DIR]
+    ))
+    output = subprocess.check_output(args + list(options), cwd=TEST_DIR,
+                                     env=environment)
+    return output.decode('utf-8')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
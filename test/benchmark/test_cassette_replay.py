@@ -0,0 +1,63 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''A stack recorded against a FakeBigIP replays with the device gone.'''
+
+import pytest
+
+from f5_heat.resources.common import cassette
+from f5_heat.resources.common.config import CONF
+
+from benchmark.fake_bigip import FakeBigIP
+from benchmark import generator
+from benchmark import load
+
+
+SCALE = generator.Scale(partitions=2, pools=4, members=10,
+                        virtual_servers=3)
+
+
+@pytest.fixture
+def cassette_path(tmpdir):
+    yield str(tmpdir.join('stack.json.gz'))
+    for option in ('cassette_path', 'cassette_mode',
+                   'cassette_timing_scale'):
+        CONF.clear_override(option, group='f5_heat')
+    cassette.clear_cassettes()
+
+
+def configure(path, mode, timing_scale=1.0):
+    CONF.set_override('cassette_path', path, group='f5_heat')
+    CONF.set_override('cassette_mode', mode, group='f5_heat')
+    CONF.set_override('cassette_timing_scale', timing_scale,
+                      group='f5_heat')
+
+
+@pytest.mark.parametrize('stacks', [1, 3])
+def test_replay_without_device(cassette_path, stacks):
+    templates = [generator.generate(SCALE, stack) for stack in range(stacks)]
+    configure(cassette_path, 'record')
+    with FakeBigIP() as fake:
+        recorded = load.run(templates, fake)
+    assert recorded.failures == []
+
+    configure(cassette_path, 'replay', 0)
+    replayed = load.run(templates, fake)
+    assert replayed.failures == []
+    assert sorted(replayed.latencies) == sorted(recorded.latencies)
+    assert cassette.get_cassette() is not None
+    assert len(cassette.get_cassette()) > 0
@@ -0,0 +1,112 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from requests import ConnectionError
+from requests import ReadTimeout
+
+import pytest
+import requests
+import time
+
+from benchmark.conditions import constant
+from benchmark.conditions import lognormal
+from benchmark.conditions import NetworkConditions
+from benchmark.conditions import TIMEOUT
+from benchmark.conditions import UNAVAILABLE
+from benchmark.conditions import uniform
+
+
+def get(device, path='tm/ltm/pool', timeout=5, **kwargs):
+    return requests.get(
+        'https://{0}/mgmt/{1}'.format(device.address, path),
+        auth=('admin', 'admin'),
+        verify=False,
+        timeout=timeout,
+        **kwargs
+    )
+
+
+def test_distributions_repeatable():
+    first = NetworkConditions(latency=lognormal(0.1, 0.5), seed=1)
+    second = NetworkConditions(latency=lognormal(0.1, 0.5), seed=1)
+    delays = [first.plan('GET', '/mgmt/tm', False, 1).delay
+              for _ in range(20)]
+    assert delays == [second.plan('GET', '/mgmt/tm', False, 1).delay
+                      for _ in range(20)]
+    ranged = NetworkConditions(latency=uniform(0.05, 0.15), seed=1)
+    assert all(0.05 <= ranged.plan('GET', '/mgmt/tm', False, 1).delay <= 0.15
+               for _ in range(20))
+
+
+def test_most_specific_rule_applies():
+    conditions = NetworkConditions(latency=0.1, error_rate=0.5)
+    conditions.add_rule(path='tm/ltm', latency=0.2)
+    conditions.add_rule(method='POST', path='tm/ltm/pool', latency=0.3,
+                        error_rate=0.0)
+    assert conditions.plan('GET', '/mgmt/tm/sys', False, 1).delay == 0.1
+    assert conditions.plan('GET', '/mgmt/tm/ltm/pool', False, 1).delay == 0.2
+    for _ in range(20):
+        plan = conditions.plan('POST', '/mgmt/tm/ltm/pool', False, 1)
+        assert plan == (0.3, None)
+
+
+def test_faults_and_login_cost():
+    conditions = NetworkConditions(login_cost=0.5, max_in_flight=2)
+    assert conditions.plan('GET', '/mgmt/tm', True, 1) == (0.5, None)
+    assert conditions.plan('GET', '/mgmt/tm', False, 1) == (0.0, None)
+    assert conditions.plan(
+        'POST', '/mgmt/shared/authn/login', False, 1
+    ) == (0.5, None)
+    assert conditions.plan('GET', '/mgmt/tm', False, 3).fault == UNAVAILABLE
+    conditions.add_rule(path='tm/sys', timeout_rate=1.0)
+    assert conditions.plan('GET', '/mgmt/tm/sys', False, 1).fault == TIMEOUT
+
+
+def test_transfer_time():
+    assert NetworkConditions().transfer_time(10 ** 6) == 0.0
+    assert NetworkConditions(bandwidth=1000).transfer_time(500) == 0.5
+
+
+def test_served_with_latency(fake_bigip):
+    fake_bigip.conditions = NetworkConditions(latency=constant(0.2))
+    started = time.time()
+    assert get(fake_bigip).status_code == 200
+    assert time.time() - started >= 0.2
+    assert fake_bigip.log[-1].elapsed >= 0.2
+
+
+def test_random_503s(fake_bigip):
+    fake_bigip.conditions = NetworkConditions(error_rate=1.0)
+    response = get(fake_bigip)
+    assert response.status_code == 503
+    assert response.json()['code'] == 503
+
+
+def test_timeouts(fake_bigip):
+    fake_bigip.conditions = NetworkConditions(timeout_rate=1.0, hang=0.5)
+    with pytest.raises(ReadTimeout):
+        get(fake_bigip, timeout=0.1)
+    fake_bigip.conditions.hang = 0
+    with pytest.raises(ConnectionError):
+        get(fake_bigip)
+    assert fake_bigip.log[-1].status is None
+
+
+def test_wan(wan_bigip):
+    started = time.time()
+    get(wan_bigip)
+    assert time.time() - started >= 0.05
@@ -0,0 +1,165 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_heat.resources.common.icontrol_rest import iControlRESTClient
+from requests import HTTPError
+
+import pytest
+import requests
+
+
+def rest(device, method, path, auth=('admin', 'admin'), **kwargs):
+    return requests.request(
+        method,
+        'https://{0}/mgmt/{1}'.format(device.address, path),
+        auth=auth,
+        verify=False,
+        **kwargs
+    )
+
+
+def test_authentication(fake_bigip):
+    assert rest(fake_bigip, 'GET', 'tm/sys/version').status_code == 200
+    assert rest(fake_bigip, 'GET', 'tm/sys/version',
+                auth=('admin', 'wrong')).status_code == 401
+    assert rest(fake_bigip, 'GET', 'tm/sys/version',
+                auth=None).status_code == 401
+
+
+def test_login_token(fake_bigip):
+    assert rest(fake_bigip, 'POST', 'shared/authn/login', auth=None,
+                json={'username': 'admin', 'password': 'wrong'}
+                ).status_code == 401
+    token = rest(fake_bigip, 'POST', 'shared/authn/login', auth=None,
+                 json={'username': 'admin', 'password': 'admin'}
+                 ).json()['token']['token']
+    headers = {'X-F5-Auth-Token': token}
+    assert rest(fake_bigip, 'GET', 'tm/ltm/pool', auth=None,
+                headers=headers).status_code == 200
+    headers = {'X-F5-Auth-Token': 'stale'}
+    assert rest(fake_bigip, 'GET', 'tm/ltm/pool', auth=None,
+                headers=headers).status_code == 401
+
+
+def test_status_codes(fake_bigip):
+    pool = {'name': 'pool', 'partition': 'tenant'}
+    assert rest(fake_bigip, 'POST', 'tm/ltm/pool',
+                json=pool).status_code == 404
+    assert rest(fake_bigip, 'POST', 'tm/sys/folder',
+                json={'name': 'tenant', 'subPath': '/'}).status_code == 200
+    assert rest(fake_bigip, 'POST', 'tm/ltm/pool',
+                json=pool).status_code == 200
+    assert rest(fake_bigip, 'POST', 'tm/ltm/pool',
+                json=pool).status_code == 409
+    assert rest(fake_bigip, 'POST', 'tm/ltm/virtual', json={
+        'name': 'vs', 'partition': 'tenant', 'pool': 'missing'
+    }).status_code == 400
+    assert rest(fake_bigip, 'POST', 'tm/ltm/virtual', json={
+        'name': 'vs', 'partition': 'tenant', 'pool': 'pool'
+    }).status_code == 200
+    assert rest(fake_bigip, 'DELETE',
+                'tm/ltm/pool/~tenant~pool').status_code == 400
+    assert rest(fake_bigip, 'DELETE',
+                'tm/sys/folder/~tenant').status_code == 400
+    assert rest(fake_bigip, 'DELETE',
+                'tm/ltm/virtual/~tenant~vs').status_code == 200
+    assert rest(fake_bigip, 'DELETE',
+                'tm/ltm/pool/~tenant~pool').status_code == 200
+    assert rest(fake_bigip, 'GET',
+                'tm/ltm/pool/~tenant~pool').status_code == 404
+    assert rest(fake_bigip, 'GET', 'tm/ltm/nope').status_code == 404
+
+
+def test_sdk_pool_and_members(fake_bigip, bigip_connection):
+    pools = bigip_connection.bigip.tm.ltm.pools
+    pool = pools.pool.create(name='pool', partition='Common')
+    pool.members_s.members.create(
+        name='10.0.0.1:80', partition='Common', address='10.0.0.1'
+    )
+    assert pools.pool.exists(name='pool', partition='Common')
+    assert fake_bigip.members('/Common/pool') == ['/Common/10.0.0.1:80']
+    with pytest.raises(HTTPError) as ex:
+        pool.members_s.members.create(name='10.0.0.1:80', partition='Common')
+    assert ex.value.response.status_code == 409
+    pools.pool.load(name='pool', partition='Common').delete()
+    assert not pools.pool.exists(name='pool', partition='Common')
+
+
+def test_fast_path_iapp(fake_bigip, bigip_connection):
+    client = iControlRESTClient(bigip_connection)
+    client.create_template(name='tmpl', partition='Common')
+    client.create_service(name='svc', partition='Common', template='tmpl')
+    assert fake_bigip.get('sys/application/service',
+                          '/Common/svc.app/svc') is not None
+    with pytest.raises(HTTPError):
+        client.delete_template('tmpl', 'Common')
+    assert client.delete_service('svc', 'Common')
+    assert not client.delete_service('svc', 'Common')
+    assert client.delete_template('tmpl', 'Common')
+
+
+def test_commands_and_sync_status(fake_bigip, bigip_connection):
+    bigip = bigip_connection.bigip
+    bigip.tm.cm.device_groups.device_group.create(
+        name='cluster', partition='Common'
+    )
+    bigip.tm.ltm.pools.pool.create(name='pool', partition='Common')
+    status = bigip.tm.cm.sync_status
+    status.refresh()
+    assert fake_bigip.sync_status == 'Changes Pending'
+    bigip.tm.cm.exec_cmd('run', utilCmdArgs='config-sync to-group cluster')
+    assert fake_bigip.sync_status == 'In Sync'
+    bigip.tm.sys.config.exec_cmd('save')
+    assert fake_bigip.saves == 1
+
+
+def test_transaction(fake_bigip):
+    def start():
+        return {'X-F5-REST-Coordination-Id': str(rest(
+            fake_bigip, 'POST', 'tm/transaction', json={}
+        ).json()['transId'])}
+
+    def commit(headers):
+        return rest(fake_bigip, 'PATCH', 'tm/transaction/' +
+                    headers['X-F5-REST-Coordination-Id'],
+                    json={'state': 'VALIDATING'})
+
+    headers = start()
+    rest(fake_bigip, 'POST', 'tm/ltm/pool', headers=headers,
+         json={'name': 'pool'})
+    rest(fake_bigip, 'POST', 'tm/ltm/virtual', headers=headers,
+         json={'name': 'vs', 'pool': 'missing'})
+    assert commit(headers).status_code == 400
+    assert fake_bigip.get('ltm/pool', '/Common/pool') is None
+
+    headers = start()
+    rest(fake_bigip, 'POST', 'tm/ltm/pool', headers=headers,
+         json={'name': 'pool'})
+    rest(fake_bigip, 'POST', 'tm/ltm/virtual', headers=headers,
+         json={'name': 'vs', 'pool': 'pool'})
+    assert commit(headers).json()['state'] == 'COMPLETED'
+    assert fake_bigip.get('ltm/virtual', '/Common/vs') is not None
+
+
+def test_token_auth_connection(fake_bigip):
+    from f5_heat.resources.common import f5_bigip_connection
+    connection = f5_bigip_connection.probe_connection(
+        fake_bigip.address, 'admin', 'admin', token_auth=True
+    )
+    connection.get_capabilities()
+    assert fake_bigip.count('POST', 'shared/authn/login') == 1
+    assert fake_bigip.count('GET', 'tm/sys/provision') == 1
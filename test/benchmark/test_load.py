@@ -0,0 +1,207 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import collections
+import json
+import os
+
+import pytest
+import yaml
+
+from f5_heat.resources.common.config import CONF
+from f5_heat.resources.common import instrumentation
+from f5_heat.resources.common import metrics
+
+from benchmark import generator
+from benchmark import load
+
+
+FUNCTIONAL_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+    'functional'
+)
+
+SCALE = generator.Scale(partitions=2, pools=4, members=10,
+                        virtual_servers=3)
+
+
+def resources_of_type(template, resource_type):
+    return [name for name, definition in template['resources'].items()
+            if definition['type'] == resource_type]
+
+
+def test_generate_spreads_objects():
+    template = generator.generate(SCALE)
+    resources = template['resources']
+    pools = resources_of_type(template, 'F5::LTM::Pool')
+    assert len(resources_of_type(template, 'F5::Sys::Partition')) == 2
+    assert len(pools) == 4
+    assert len(resources_of_type(template, 'F5::LTM::VirtualServer')) == 3
+    sizes = [len(resources[pool]['properties']['members'])
+             for pool in pools]
+    assert sizes == [3, 3, 2, 2]
+    addresses = [member['member_ip'] for pool in pools
+                 for member in resources[pool]['properties']['members']]
+    assert len(set(addresses)) == 10
+    assert resources['vs00002']['properties']['default_pool'] == 'pool00002'
+    assert resources['vs00002']['depends_on'] == 'pool00002'
+
+
+def test_generate_stacks_do_not_collide():
+    first, second = [generator.generate(SCALE, stack) for stack in (0, 1)]
+
+    def names_and_addresses(template):
+        found = set()
+        for definition in template['resources'].values():
+            properties = definition['properties']
+            if definition['type'] == 'F5::Sys::Partition':
+                found.add(properties['name'])
+            found.update(member['member_ip']
+                         for member in properties.get('members', []))
+            if 'port' in properties:
+                found.add(properties['ip'])
+        return found
+
+    assert not names_and_addresses(first) & names_and_addresses(second)
+
+
+def test_generate_takes_functional_parameters():
+    with open(os.path.join(FUNCTIONAL_DIR, 'f5_ltm_pool',
+                           'success.yaml')) as functional:
+        parameters = yaml.safe_load(functional)['parameters']
+    template = generator.generate(SCALE)
+    assert set(template['parameters']) <= set(parameters)
+
+
+def test_dump_round_trips():
+    template = generator.generate(SCALE)
+    assert yaml.safe_load(generator.dump(template)) == template
+
+
+def test_generate_needs_a_partition():
+    with pytest.raises(ValueError):
+        generator.generate(SCALE._replace(partitions=0))
+
+
+def test_dependencies():
+    graph = load.dependencies(generator.generate(SCALE))
+    assert graph['stack000_partition000'] == set(['bigip_rsrc'])
+    assert graph['vs00001'] == set(
+        ['bigip_rsrc', 'stack000_partition001', 'pool00001']
+    )
+
+
+def test_dependency_loop():
+    template = {'resources': {
+        'a': {'type': 'F5::Sys::Save', 'depends_on': 'b'},
+        'b': {'type': 'F5::Sys::Save', 'depends_on': 'a'}
+    }}
+    with pytest.raises(ValueError):
+        load._ordered(load.dependencies(template))
+
+
+def test_percentile():
+    samples = [float(sample) for sample in range(100, 0, -1)]
+    assert load.percentile(samples, 0.5) == 51.0
+    assert load.percentile(samples, 0.99) == 100.0
+    assert load.percentile([], 0.5) == 0.0
+
+
+def test_run_stack(fake_bigip):
+    result = load.run([generator.generate(SCALE)], fake_bigip)
+    assert result.failures == []
+    assert result.resources == 10
+    assert result.objects == 19
+    assert len(result.latencies[('F5::LTM::Pool', 'create')]) == 4
+    assert len(result.latencies[('F5::LTM::VirtualServer', 'delete')]) == 3
+    # Through the f5-sdk: a POST for each pool and for each member.
+    assert fake_bigip.count('POST', 'tm/ltm/pool') == 4 + 10
+    assert fake_bigip.get('ltm/pool',
+                          '/stack000_partition000/pool00000') is None
+    assert load.objects_per_second(result) > 0
+    assert result.peak_memory > 0
+    assert len(load.summary(result)) == 5 + len(result.latencies)
+
+
+def test_run_concurrent_stacks(fake_bigip):
+    result = load.run(
+        [generator.generate(SCALE, stack) for stack in range(3)], fake_bigip
+    )
+    assert result.failures == []
+    assert result.stacks == 3
+    assert result.objects == 3 * 19
+    assert fake_bigip.count('DELETE', 'tm/sys/folder') == 6
+
+
+def test_run_functional_template(fake_bigip):
+    with open(os.path.join(FUNCTIONAL_DIR, 'f5_ltm_pool',
+                           'success.yaml')) as functional:
+        template = yaml.safe_load(functional)
+    result = load.run([template], fake_bigip)
+    assert result.failures == []
+    assert fake_bigip.count('POST', 'tm/ltm/pool') == 3
+
+
+def test_run_reports_failures(fake_bigip):
+    template = generator.generate(SCALE)
+    template['resources']['pool00000']['properties']['partition'] = \
+        'missing'
+    result = load.run([template], fake_bigip)
+    failed = collections.Counter(
+        (name, action) for _, name, action, _ in result.failures
+    )
+    assert failed[('pool00000', 'create')] == 1
+    assert failed[('vs00000', 'create')] == 1
+    assert result.latencies[('F5::LTM::Pool', 'create')]
+
+
+def test_run_stack_with_metrics(fake_bigip):
+    CONF.set_override('metrics_enabled', True, group='f5_heat')
+    try:
+        result = load.run([generator.generate(SCALE)], fake_bigip)
+        snapshot = metrics.REGISTRY.snapshot()
+    finally:
+        CONF.clear_override('metrics_enabled', group='f5_heat')
+        metrics.REGISTRY.reset()
+    assert result.failures == []
+    requests = sum(
+        value for (name, _), value in snapshot['counters'].items()
+        if name == instrumentation.HANDLER_REQUESTS
+    )
+    assert requests == len(fake_bigip.log)
+    pool_creates = snapshot['histograms'][(
+        instrumentation.HANDLER_DURATION,
+        (('handler', 'handle_create'), ('outcome', 'success'),
+         ('resource_type', 'F5::LTM::Pool'))
+    )]
+    assert pool_creates[2] == 4
+
+
+def test_run_stack_traced(fake_bigip, tmpdir):
+    CONF.set_override('trace_dir', str(tmpdir), group='f5_heat')
+    try:
+        result = load.run([generator.generate(SCALE)], fake_bigip)
+    finally:
+        CONF.clear_override('trace_dir', group='f5_heat')
+    assert result.failures == []
+    [trace_file] = tmpdir.listdir()
+    with open(str(trace_file)) as traced:
+        spans = json.load(traced)
+    ids = set(span['id'] for span in spans)
+    assert all(span.get('parentId', span['id']) in ids for span in spans)
+    requests = [span for span in spans if span.get('kind') == 'CLIENT']
+    assert len(requests) == len(fake_bigip.log)
@@ -0,0 +1,82 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Memory held by large stacks, per thousand resources.
+
+Each size is created by the load CLI in a fresh interpreter, since a
+process that has already run stacks reuses the memory they freed. The cost
+per thousand resources is taken between two sizes, so what the first
+stack costs once (imports, connections, caches) is left out of it.
+'''
+
+import re
+
+import pytest
+
+from f5_heat.resources.common import memory
+
+from benchmark import generator
+from benchmark.harness import report_memory
+from benchmark import load
+
+
+SMALL = generator.Scale(partitions=2, pools=50, members=500,
+                        virtual_servers=50)
+LARGE = generator.Scale(partitions=8, pools=400, members=2000,
+                        virtual_servers=400)
+
+# Measured at about 17 MiB retained and 21 MiB of peak growth per thousand
+# resources, with a pool of members to every virtual server.
+RETAINED_BUDGET = 32 * 1048576
+PEAK_BUDGET = 40 * 1048576
+
+_RESOURCES = re.compile(r'(\d+) resources')
+_PER_THOUSAND = re.compile(
+    r'per 1000 resources: (-?[\d.]+) MiB retained, (-?[\d.]+) MiB peak'
+)
+
+
+def _measure(scale):
+    # The resources created and the MiB they retained and peaked at.
+    output = load.run_cli(scale)
+    resources = int(_RESOURCES.search(output).group(1))
+    retained, peak = [float(value) * resources / 1000.0 for value in
+                      _PER_THOUSAND.search(output).groups()]
+    return resources, retained, peak
+
+
+def test_memory_per_thousand_resources():
+    small, large = _measure(SMALL), _measure(LARGE)
+    added = large[0] - small[0]
+    retained = 1000.0 * (large[1] - small[1]) / added * 1048576
+    peak = 1000.0 * (large[2] - small[2]) / added * 1048576
+    report_memory('{0} to {1} resources'.format(small[0], large[0]),
+                  retained, peak)
+    assert retained <= RETAINED_BUDGET
+    assert peak <= PEAK_BUDGET
+
+
+@pytest.mark.skipif(not memory.available(), reason='needs tracemalloc')
+def test_snapshot_attributes_retained_memory(fake_bigip):
+    scale = SMALL._replace(pools=5, members=50, virtual_servers=5)
+    result = load.run([generator.generate(scale)], fake_bigip,
+                      snapshot=True)
+    assert result.failures == []
+    resource_types = set(resource_type
+                         for resource_type, _ in result.attribution)
+    assert 'F5::LTM::Pool' in resource_types
+    assert 'allocated by' in '\n'.join(load.summary(result))
@@ -0,0 +1,367 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''REST request budgets of every plugin's handlers.
+
+Each handler is run against a FakeBigIP at several input sizes, through
+the f5-sdk and through the REST fast path, and what it cost the device is
+checked against the budget declared for it below. A handler that starts
+sending a request per item where it used to send one, or reloading what it
+has just created, fails here first.
+
+No plugin implements handle_update: Heat replaces a resource whose
+properties change, so an update costs a delete and a create.
+'''
+
+import collections
+import json
+
+import eventlet
+import mock
+import pytest
+
+from f5_heat.resources import f5_cm_cluster
+
+from benchmark.fake_bigip import FakeBigIP
+from benchmark.harness import BenchmarkStack
+from benchmark.harness import clear_state
+from benchmark.harness import measure
+from benchmark.harness import report
+
+
+SIZES = (1, 10, 100)
+
+# Upper bounds on what one handler may cost the device, each a function of
+# the input size n: requests sent, logins, and bytes of request and
+# response bodies.
+Budget = collections.namedtuple('Budget', ['requests', 'logins', 'bytes'])
+
+
+def _budget(requests, bytes_base, bytes_per_item=0, logins=0):
+    return Budget(
+        requests=requests if callable(requests) else lambda n: requests,
+        logins=lambda n: logins,
+        bytes=lambda n: bytes_base + bytes_per_item * n
+    )
+
+
+# By resource type, handler and whether the fast path is on.
+BUDGETS = {
+    # POST the pool, load it once, POST each member.
+    ('F5::LTM::Pool', 'create', False): _budget(lambda n: n + 2, 450, 360),
+    # POST the pool with its members in the body.
+    ('F5::LTM::Pool', 'create', True): _budget(1, 300, 80),
+    # exists, load, DELETE; the members go with the pool.
+    ('F5::LTM::Pool', 'delete', False): _budget(3, 450),
+    ('F5::LTM::Pool', 'delete', True): _budget(1, 50),
+    ('F5::LTM::VirtualServer', 'create', False): _budget(1, 500),
+    ('F5::LTM::VirtualServer', 'create', True): _budget(1, 500),
+    ('F5::LTM::VirtualServer', 'delete', False): _budget(3, 650),
+    ('F5::LTM::VirtualServer', 'delete', True): _budget(1, 50),
+    ('F5::Sys::iAppFullTemplate', 'create', False): _budget(1, 700, 110),
+    ('F5::Sys::iAppFullTemplate', 'create', True): _budget(1, 700, 110),
+    ('F5::Sys::iAppFullTemplate', 'delete', False): _budget(3, 900, 110),
+    ('F5::Sys::iAppFullTemplate', 'delete', True): _budget(1, 50),
+    ('F5::Sys::iAppCompositeTemplate', 'create', False):
+        _budget(1, 520, 110),
+    ('F5::Sys::iAppCompositeTemplate', 'create', True):
+        _budget(1, 520, 110),
+    ('F5::Sys::iAppCompositeTemplate', 'delete', False):
+        _budget(3, 720, 110),
+    ('F5::Sys::iAppCompositeTemplate', 'delete', True): _budget(1, 50),
+    ('F5::Sys::iAppService', 'create', False): _budget(1, 520, 54),
+    ('F5::Sys::iAppService', 'create', True): _budget(1, 520, 54),
+    ('F5::Sys::iAppService', 'delete', False): _budget(3, 730, 54),
+    ('F5::Sys::iAppService', 'delete', True): _budget(1, 50),
+    ('F5::Sys::Partition', 'create', False): _budget(1, 250),
+    ('F5::Sys::Partition', 'delete', False): _budget(3, 400),
+    # Check the device group, run the sync, then poll until in sync.
+    ('F5::Cm::Sync', 'create', False): _budget(3, 700),
+    ('F5::Cm::Sync', 'delete', False): _budget(0, 0),
+    ('F5::Sys::Save', 'create', False): _budget(1, 100),
+    ('F5::Sys::Save', 'delete', False): _budget(0, 0),
+    # The device sessions are already open; the f5-sdk's ClusterManager,
+    # which sets up device trust, is outside what FakeBigIP models.
+    ('F5::Cm::Cluster', 'create', False): _budget(0, 0),
+    ('F5::Cm::Cluster', 'delete', False): _budget(0, 0),
+    # Log in, then learn the version and the provisioned modules.
+    ('F5::BigIP::Device', 'create', False): _budget(3, 850, logins=1),
+    ('F5::BigIP::Device', 'delete', False): _budget(0, 0)
+}
+
+
+FULL_TEMPLATE = '''sys application template full_template {{
+  actions replace-all-with {{
+    definition {{
+      html-help {{
+      }}
+      implementation {{
+{implementation}
+      }}
+      macro {{
+      }}
+      presentation {{
+        section vars {{
+          string string_input_one
+        }}
+      }}
+      role-acl none
+      run-as none
+    }}
+  }}
+  partition tenant
+  description none
+  requires-modules none
+}}
+'''
+
+
+def implementation(n):
+    return '\n'.join(
+        '        puts "line {0} = $::vars__string_input_one"'.format(line)
+        for line in range(n)
+    )
+
+
+def members(n):
+    return [
+        {'member_ip': '10.{0}.{1}.{2}'.format(i // 65536, i // 256 % 256,
+                                              i % 256),
+         'member_port': 80}
+        for i in range(n)
+    ]
+
+
+def service_tables(n):
+    return json.dumps([{
+        'name': 'vars__table',
+        'columnNames': ['name', 'value'],
+        'rows': [{'row': ['name{0}'.format(row), str(row)]}
+                 for row in range(n)]
+    }])
+
+
+@pytest.fixture
+def fake_bigips():
+    with FakeBigIP() as first, FakeBigIP() as second:
+        for device in (first, second):
+            device.create('sys/folder', name='tenant', subPath='/')
+            device.create('cm/device-group', name='cluster')
+        yield first, second
+    clear_state()
+
+
+def device_stack(fake, fast_path, token_auth=True):
+    '''A stack with a created device and partition on fake.'''
+
+    stack = BenchmarkStack()
+    stack.add_device('bigip', fake, rest_fast_path=fast_path,
+                     token_auth=token_auth)
+    stack.create('bigip')
+    stack.add('partition', 'F5::Sys::Partition',
+              {'name': 'tenant', 'bigip_server': 'bigip'})
+    stack.resources['partition'].action = 'CREATE'
+    return stack
+
+
+def check(resource_type, handler, fast_path, n, usage):
+    '''Assert usage is within budget, and report it.'''
+
+    budget = BUDGETS[(resource_type, handler, fast_path)]
+    report(resource_type, handler, 'fast path' if fast_path else 'f5-sdk',
+           n, usage)
+    assert usage.requests <= budget.requests(n)
+    assert usage.logins <= budget.logins(n)
+    assert usage.bytes <= budget.bytes(n)
+
+
+def run_budget(fake, stack, name, resource_type, properties, fast_path, n,
+               prerequisites=()):
+    '''Create and delete a resource, checking both against their budgets.'''
+
+    for prerequisite in prerequisites:
+        stack.add(*prerequisite)
+        stack.create(prerequisite[0])
+    stack.add(name, resource_type, properties)
+    with measure(fake) as usage:
+        stack.create(name)
+    check(resource_type, 'create', fast_path, n, usage)
+    with measure(fake) as usage:
+        stack.delete(name)
+    check(resource_type, 'delete', fast_path, n, usage)
+
+
+@pytest.mark.parametrize('fast_path', [False, True])
+@pytest.mark.parametrize('n', (0,) + SIZES)
+def test_pool(fake_bigips, fast_path, n):
+    fake = fake_bigips[0]
+    run_budget(
+        fake, device_stack(fake, fast_path), 'pool', 'F5::LTM::Pool',
+        {'name': 'pool', 'bigip_server': 'bigip', 'partition': 'partition',
+         'members': members(n)},
+        fast_path, n
+    )
+    assert fake.get('ltm/pool', '/tenant/pool') is None
+
+
+@pytest.mark.parametrize('fast_path', [False, True])
+def test_virtual_server(fake_bigips, fast_path):
+    fake = fake_bigips[0]
+    run_budget(
+        fake, device_stack(fake, fast_path), 'vs', 'F5::LTM::VirtualServer',
+        {'name': 'vs', 'bigip_server': 'bigip', 'partition': 'partition',
+         'ip': '10.1.0.1', 'port': 80, 'default_pool': 'pool'},
+        fast_path, 1,
+        prerequisites=[('pool', 'F5::LTM::Pool', {
+            'name': 'pool', 'bigip_server': 'bigip',
+            'partition': 'partition'
+        })]
+    )
+
+
+@pytest.mark.parametrize('fast_path', [False, True])
+@pytest.mark.parametrize('n', SIZES)
+def test_iapp_full_template(fake_bigips, fast_path, n):
+    fake = fake_bigips[0]
+    run_budget(
+        fake, device_stack(fake, fast_path), 'template',
+        'F5::Sys::iAppFullTemplate',
+        {'bigip_server': 'bigip', 'partition': 'partition',
+         'full_template': FULL_TEMPLATE.format(
+             implementation=implementation(n)
+         )},
+        fast_path, n
+    )
+
+
+@pytest.mark.parametrize('fast_path', [False, True])
+@pytest.mark.parametrize('n', SIZES)
+def test_iapp_composite_template(fake_bigips, fast_path, n):
+    fake = fake_bigips[0]
+    run_budget(
+        fake, device_stack(fake, fast_path), 'template',
+        'F5::Sys::iAppCompositeTemplate',
+        {'name': 'template', 'bigip_server': 'bigip',
+         'partition': 'partition', 'implementation': implementation(n),
+         'presentation': 'section vars {\n  string string_input_one\n}'},
+        fast_path, n
+    )
+
+
+@pytest.mark.parametrize('fast_path', [False, True])
+@pytest.mark.parametrize('n', SIZES)
+def test_iapp_service(fake_bigips, fast_path, n):
+    fake = fake_bigips[0]
+    run_budget(
+        fake, device_stack(fake, fast_path), 'service',
+        'F5::Sys::iAppService',
+        {'name': 'service', 'bigip_server': 'bigip',
+         'partition': 'partition', 'template_name': 'template',
+         'tables': service_tables(n)},
+        fast_path, n,
+        prerequisites=[('template', 'F5::Sys::iAppCompositeTemplate', {
+            'name': 'template', 'bigip_server': 'bigip',
+            'partition': 'partition', 'implementation': implementation(1),
+            'presentation': 'section vars {\n  string string_input_one\n}'
+        })]
+    )
+
+
+def test_partition(fake_bigips):
+    fake = fake_bigips[0]
+    stack = device_stack(fake, False)
+    run_budget(
+        fake, stack, 'new_partition', 'F5::Sys::Partition',
+        {'name': 'other', 'bigip_server': 'bigip'}, False, 1
+    )
+
+
+def test_cm_sync(fake_bigips):
+    fake = fake_bigips[0]
+    run_budget(
+        fake, device_stack(fake, False), 'sync', 'F5::Cm::Sync',
+        {'bigip_server': 'bigip', 'device_group': 'cluster',
+         'device_group_partition': 'Common'},
+        False, 1
+    )
+
+
+def test_sys_save(fake_bigips):
+    fake = fake_bigips[0]
+    run_budget(
+        fake, device_stack(fake, False), 'save', 'F5::Sys::Save',
+        {'bigip_server': 'bigip'}, False, 1
+    )
+    assert fake.saves == 1
+
+
+def test_device(fake_bigips):
+    fake = fake_bigips[0]
+    stack = BenchmarkStack()
+    stack.add_device('bigip', fake, token_auth=True)
+    with measure(fake) as usage:
+        stack.create('bigip')
+    check('F5::BigIP::Device', 'create', False, 1, usage)
+    with measure(fake) as usage:
+        stack.delete('bigip')
+    check('F5::BigIP::Device', 'delete', False, 1, usage)
+
+
+def test_cm_cluster(fake_bigips):
+    stack = BenchmarkStack()
+    for name, fake in zip(('bigip1', 'bigip2'), fake_bigips):
+        stack.add_device(name, fake, token_auth=True)
+        stack.create(name)
+    stack.add('cluster', 'F5::Cm::Cluster', {
+        'device_group_name': 'cluster', 'devices': ['bigip1', 'bigip2']
+    })
+    with mock.patch.object(f5_cm_cluster, 'ClusterManager'):
+        with measure(*fake_bigips) as usage:
+            stack.create('cluster')
+        check('F5::Cm::Cluster', 'create', False, 1, usage)
+        with measure(*fake_bigips) as usage:
+            stack.delete('cluster')
+        check('F5::Cm::Cluster', 'delete', False, 1, usage)
+
+
+@pytest.mark.parametrize('n', SIZES)
+def test_changes_to_cluster_share_one_sync(fake_bigips, n):
+    writer = fake_bigips[0]
+    stack = BenchmarkStack()
+    for name, fake in zip(('bigip1', 'bigip2'), fake_bigips):
+        stack.add_device(name, fake, token_auth=True)
+        stack.create(name)
+    stack.add('cluster', 'F5::Cm::Cluster', {
+        'device_group_name': 'cluster', 'devices': ['bigip1', 'bigip2']
+    })
+    stack.resources['cluster'].action = 'CREATE'
+    stack.add('partition', 'F5::Sys::Partition',
+              {'name': 'tenant', 'bigip_server': 'cluster'})
+    for pool in range(n):
+        stack.add('pool{0}'.format(pool), 'F5::LTM::Pool', {
+            'name': 'pool{0}'.format(pool), 'bigip_server': 'cluster',
+            'partition': 'partition'
+        })
+    with measure(*fake_bigips) as usage:
+        threads = [eventlet.spawn(stack.create, 'pool{0}'.format(pool))
+                   for pool in range(n)]
+        for thread in threads:
+            thread.wait()
+    report('F5::LTM::Pool on F5::Cm::Cluster', 'create', 'f5-sdk', n, usage)
+    assert writer.count('POST', 'tm/cm') == 1
+    assert fake_bigips[1].count('POST', 'tm/ltm/pool') == 0
+    assert usage.requests <= n + 2
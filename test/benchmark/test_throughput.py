@@ -0,0 +1,59 @@
+# coding=utf-8
+#
+# Copyright 2016 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''Pool members created serially and concurrently behind a WAN link.
+
+A pool assigns its members through a DeviceExecutor, as many at once as
+the device's max_concurrency allows. Each run is made by the load CLI in
+a fresh interpreter, monkey patched as heat-engine is, against a FakeBigIP
+50-150 ms away; at a max_concurrency of 1 every member waits for the one
+before it. The rate is taken over the pool's create handler alone, so the
+device and the deletes, the same either way, are left out of it.
+'''
+
+import re
+
+from benchmark import generator
+from benchmark.harness import report_throughput
+from benchmark import load
+
+
+SCALE = generator.Scale(partitions=1, pools=1, members=64, virtual_servers=0)
+
+# Measured at about five times the serial rate with 8 requests at once; 503s
+# and the pool's own requests, sent before its members, keep it from 8.
+MIN_SPEEDUP = 3
+
+_POOL_CREATE = re.compile(r'F5::LTM::Pool\s+create\s+1\s+([\d.]+)')
+_FAILURES = re.compile(r'(\d+) failures')
+
+
+def _members_per_second(max_concurrency):
+    output = load.run_cli(SCALE, '--wan',
+                          '--max-concurrency', str(max_concurrency))
+    assert _FAILURES.search(output).group(1) == '0'
+    return SCALE.members * 1000.0 / float(
+        _POOL_CREATE.search(output).group(1)
+    )
+
+
+def test_concurrent_member_assignment_beats_serial():
+    serial = _members_per_second(1)
+    concurrent = _members_per_second(8)
+    report_throughput('1 pool of {0} members'.format(SCALE.members),
+                      serial, concurrent)
+    assert concurrent >= MIN_SPEEDUP * serial